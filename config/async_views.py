@@ -0,0 +1,87 @@
+"""
+Async counterparts of the DRF views, for ASGI deployments.
+
+DRF's `APIView` is synchronous, so under ASGI every request holds a worker
+thread for its whole duration. `AsyncAPIView` is a plain Django async view
+that keeps the parts of DRF the endpoints rely on: JWT authentication
+through `CustomUserJWTAuthentication.aauthenticate()`, JSON and form
+bodies, DRF-rendered JSON, DRF's error bodies and, for `replica_reads`
+views, read-replica routing.
+
+`settings.ASYNC_VIEWS` makes the todo and user URLconfs serve these views;
+without it the DRF views are used, which is what WSGI deployments want.
+"""
+
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+
+
+from users.authentication import CustomUserJWTAuthentication
+from . import replicas
+from .metrics import timed
+
+
+def render(data, status=status.HTTP_200_OK):
+    with timed("render"):
+        content = JSONRenderer().render(data)
+    return HttpResponse(content, status=status, content_type="application/json")
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    authentication_class = CustomUserJWTAuthentication
+    # Safe requests may read from a replica, as with `ReplicaReadMixin`.
+    replica_reads = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        # What DRF's Request offers, for the pagination and filter code
+        # shared with the DRF views.
+        request.query_params = request.GET
+        token = None
+        try:
+            request.user, _ = await self.authentication_class().aauthenticate(request)
+            if (
+                self.replica_reads
+                and settings.DATABASE_REPLICAS
+                and request.method in SAFE_METHODS
+                and not await replicas.ais_sticky(request.user.id)
+            ):
+                token = replicas.read_alias.set(replicas.choose_replica())
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+        finally:
+            if token is not None:
+                replicas.read_alias.reset(token)
+
+    def handle_exception(self, exc):
+        # As DRF does for an authentication class without a WWW-Authenticate
+        # header.
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            exc.status_code = status.HTTP_403_FORBIDDEN
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        return render(data, status=exc.status_code)
+
+    def get_data(self, request):
+        """The request body, parsed like DRF's default JSON and form parsers."""
+        if request.content_type == "application/json":
+            if not request.body:
+                return {}
+            try:
+                return json.loads(request.body)
+            except ValueError as e:
+                raise exceptions.ParseError(f"JSON parse error - {e}")
+        return request.POST
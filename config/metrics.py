@@ -0,0 +1,349 @@
+"""
+Per-request performance metrics.
+
+`MetricsMiddleware` times every request and counts it by route, method and
+status, with a latency histogram per route. A `METRICS_SAMPLE_RATE` share of
+requests is also broken down into:
+
+- db: query count and SQL time, through a wrapper on every connection;
+- auth: `CustomUserJWTAuthentication`;
+- serialize: the row serializers of the read endpoints;
+- render: turning the response data into JSON.
+
+The code for each phase runs inside a `timed()` block, which does nothing
+outside a sampled request. Sampled responses carry the breakdown in a
+`Server-Timing` header, and it is added to per-route counters.
+
+`/metrics` serves everything in the Prometheus text format, along with the
+hit and miss counts of the in-process auth caches of `users.cache`. Each process
+aggregates under a lock. With `METRICS_DIR` set, every process also writes
+its aggregates there at most every `METRICS_FLUSH_INTERVAL` seconds, and
+`/metrics` adds up the files of all workers, so any of them can answer a
+scrape. Files of workers that exited are kept, so counters never go down.
+"""
+
+import bisect
+import collections
+import contextlib
+import contextvars
+import glob
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from users.cache import cache_stats
+
+
+PHASES = ("db", "auth", "serialize", "render")
+
+# The breakdown of the current request when it is sampled, else None.
+current_sample = contextvars.ContextVar("metrics_sample", default=None)
+
+
+class Sample:
+    __slots__ = ("queries", "timings")
+
+    def __init__(self):
+        self.queries = 0
+        self.timings = dict.fromkeys(PHASES, 0.0)
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """Adds the time spent in the block to `phase` of a sampled request."""
+    sample = current_sample.get()
+    if sample is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.timings[phase] += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.timings["db"] += time.perf_counter() - start
+
+
+def install_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class Registry:
+    """One process's aggregates. Every method is thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # A forked worker starts from zero instead of the parent's numbers.
+        self.pid = os.getpid()
+        self.requests = collections.Counter()
+        self.durations = {}
+        self.sampled = collections.Counter()
+        self.queries = collections.Counter()
+        self.phases = collections.Counter()
+        self.flushed_at = time.monotonic()
+
+    def observe(self, route, method, status, duration, sample=None):
+        buckets = settings.METRICS_BUCKETS
+        index = bisect.bisect_left(buckets, duration)
+        flush = False
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            self.requests[route, method, status] += 1
+            histogram = self.durations.get((route, method))
+            if histogram is None:
+                # Per bucket (not cumulative), one past the last, then the sum.
+                histogram = self.durations[route, method] = [0] * (len(buckets) + 2)
+            histogram[index] += 1
+            histogram[-1] += duration
+            if sample is not None:
+                self.sampled[route] += 1
+                self.queries[route] += sample.queries
+                for phase, seconds in sample.timings.items():
+                    self.phases[route, phase] += seconds
+            if settings.METRICS_DIR:
+                now = time.monotonic()
+                if now - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+                    self.flushed_at = now
+                    flush = True
+        if flush:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": [[*key, n] for key, n in self.requests.items()],
+                "durations": [[*key, list(h)] for key, h in self.durations.items()],
+                "sampled": [[key, n] for key, n in self.sampled.items()],
+                "queries": [[key, n] for key, n in self.queries.items()],
+                "phases": [[*key, s] for key, s in self.phases.items()],
+                # Gauges rather than counters: clear() resets them.
+                "caches": [
+                    [name, stats["hits"], stats["misses"], stats["size"]]
+                    for name, stats in cache_stats().items()
+                ],
+            }
+
+    def flush(self):
+        """Writes this process's aggregates to `METRICS_DIR`."""
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path, os.path.join(directory, f"metrics-{self.pid}.json"))
+
+
+registry = Registry()
+
+
+def merge(snapshots):
+    requests = collections.Counter()
+    durations = {}
+    sampled = collections.Counter()
+    queries = collections.Counter()
+    phases = collections.Counter()
+    caches = collections.defaultdict(lambda: [0, 0, 0])
+    for snapshot in snapshots:
+        for *key, n in snapshot["requests"]:
+            requests[tuple(key)] += n
+        for route, method, histogram in snapshot["durations"]:
+            total = durations.setdefault((route, method), [0] * len(histogram))
+            for index, value in enumerate(histogram):
+                total[index] += value
+        for route, n in snapshot["sampled"]:
+            sampled[route] += n
+        for route, n in snapshot["queries"]:
+            queries[route] += n
+        for route, phase, seconds in snapshot["phases"]:
+            phases[route, phase] += seconds
+        # Files written before the caches were reported lack them.
+        for name, *values in snapshot.get("caches", []):
+            for index, value in enumerate(values):
+                caches[name][index] += value
+    return requests, durations, sampled, queries, phases, caches
+
+
+def collect():
+    if not settings.METRICS_DIR:
+        return [registry.snapshot()]
+    registry.flush()
+    snapshots = []
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, "metrics-*.json")):
+        with open(path) as file:
+            snapshots.append(json.load(file))
+    return snapshots
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**values):
+    return ",".join(f'{name}="{escape(value)}"' for name, value in values.items())
+
+
+def exposition(snapshots):
+    """The merged snapshots in the Prometheus text format."""
+    requests, durations, sampled, queries, phases, caches = merge(snapshots)
+    lines = []
+
+    def family(name, kind, text):
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    family("http_requests_total", "counter", "Requests by route and status.")
+    for (route, method, status), n in sorted(requests.items()):
+        request_labels = labels(route=route, method=method, status=status)
+        lines.append(f"http_requests_total{{{request_labels}}} {n}")
+
+    family("http_request_duration_seconds", "histogram", "Request latency.")
+    bounds = [str(bound) for bound in settings.METRICS_BUCKETS] + ["+Inf"]
+    for (route, method), histogram in sorted(durations.items()):
+        route_labels = labels(route=route, method=method)
+        cumulative = 0
+        for bound, count in zip(bounds, histogram[:-1]):
+            cumulative += count
+            lines.append(
+                f"http_request_duration_seconds_bucket{{{route_labels},"
+                f'le="{bound}"}} {cumulative}'
+            )
+        lines.append(
+            f"http_request_duration_seconds_sum{{{route_labels}}} {histogram[-1]}"
+        )
+        lines.append(
+            f"http_request_duration_seconds_count{{{route_labels}}} {cumulative}"
+        )
+
+    family(
+        "http_requests_sampled_total",
+        "counter",
+        "Requests broken down into the phase and query metrics.",
+    )
+    for route, n in sorted(sampled.items()):
+        lines.append(f"http_requests_sampled_total{{{labels(route=route)}}} {n}")
+
+    family("http_request_queries_total", "counter", "SQL queries of sampled requests.")
+    for route, n in sorted(queries.items()):
+        lines.append(f"http_request_queries_total{{{labels(route=route)}}} {n}")
+
+    family(
+        "http_request_phase_seconds_total",
+        "counter",
+        "Time sampled requests spent in db, auth, serialize and render.",
+    )
+    for (route, phase), seconds in sorted(phases.items()):
+        lines.append(
+            f"http_request_phase_seconds_total{{{labels(route=route, phase=phase)}}}"
+            f" {seconds}"
+        )
+
+    for index, (name, text) in enumerate(
+        [
+            ("auth_cache_hits", "Lookups answered by the auth caches."),
+            ("auth_cache_misses", "Lookups the auth caches could not answer."),
+            ("auth_cache_entries", "Entries held by the auth caches."),
+        ]
+    ):
+        family(name, "gauge", text)
+        for cache, values in sorted(caches.items()):
+            lines.append(f"{name}{{{labels(cache=cache)}}} {values[index]}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(
+        exposition(collect()), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def server_timing(sample, total):
+    entries = []
+    for phase, seconds in sample.timings.items():
+        if phase == "db":
+            entries.append(
+                f'db;dur={seconds * 1000:.2f};desc="{sample.queries} queries"'
+            )
+        elif seconds:
+            entries.append(f"{phase};dur={seconds * 1000:.2f}")
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_wrapper)
+        # Connections opened before the middleware was loaded.
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        sample, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return self.finish(request, response, sample, start)
+
+    async def __acall__(self, request):
+        sample, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return self.finish(request, response, sample, start)
+
+    def start(self):
+        rate = settings.METRICS_SAMPLE_RATE
+        sample = Sample() if rate and random.random() < rate else None
+        return sample, current_sample.set(sample), time.perf_counter()
+
+    def finish(self, request, response, sample, start):
+        # Streaming responses are timed up to their first byte.
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        # Routes, not paths, keep the number of series bounded.
+        route = match.route if match is not None else "unmatched"
+        registry.observe(route, request.method, response.status_code, duration, sample)
+        if sample is not None:
+            response["Server-Timing"] = server_timing(sample, duration)
+        return response
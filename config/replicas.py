@@ -0,0 +1,165 @@
+"""
+Read-replica routing.
+
+Views that opt in with `ReplicaReadMixin` run their safe (GET/HEAD/OPTIONS)
+requests against one replica from `settings.DATABASE_REPLICAS`, chosen per
+request by `settings.DATABASE_REPLICA_SELECTION`. Everything else, including
+every write, stays on "default".
+
+A user who has just written is "sticky": their reads go to the primary for
+`settings.DATABASE_REPLICA_STICKY_SECONDS` so they always see their own
+writes even if the replicas lag. `mark_sticky()` is called from the
+existing write signals of the todos and users apps.
+
+For "least_latency", every query on a replica connection is timed, whether
+it comes from a sync or an async view. A replica whose average is older
+than `settings.DATABASE_REPLICA_LATENCY_MAX_AGE` seconds gets the next
+request as a probe, so one slow spike does not keep it out of rotation.
+"""
+
+import contextvars
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import SAFE_METHODS
+
+
+# Alias the current request reads from; None means the primary.
+read_alias = contextvars.ContextVar("read_alias", default=None)
+
+round_robin = itertools.count()
+# Alias -> (moving average in seconds, time.monotonic() of the last sample).
+latencies = {}
+latencies_lock = threading.Lock()
+
+
+def sticky_key(user_id):
+    return f"replicas:sticky:{user_id}"
+
+
+def get_cache():
+    return caches[settings.DATABASE_REPLICA_CACHE_ALIAS]
+
+
+def mark_sticky(user_id):
+    if settings.DATABASE_REPLICAS and user_id is not None:
+        get_cache().set(
+            sticky_key(user_id), True, settings.DATABASE_REPLICA_STICKY_SECONDS
+        )
+
+
+def is_sticky(user_id):
+    return get_cache().get(sticky_key(user_id)) is not None
+
+
+async def ais_sticky(user_id):
+    return await get_cache().aget(sticky_key(user_id)) is not None
+
+
+def record_latency(alias, seconds):
+    """Keeps an exponentially weighted moving average per replica."""
+    with latencies_lock:
+        previous = latencies.get(alias)
+        average = seconds if previous is None else 0.8 * previous[0] + 0.2 * seconds
+        latencies[alias] = (average, time.monotonic())
+
+
+def choose_replica():
+    replicas = settings.DATABASE_REPLICAS
+    if settings.DATABASE_REPLICA_SELECTION == "least_latency":
+        now = time.monotonic()
+        with latencies_lock:
+            # Replicas without a measurement, or with an old one, are tried
+            # first. The probe restarts the age, so only one request goes.
+            for alias in replicas:
+                average, measured_at = latencies.get(alias, (0, None))
+                if (
+                    measured_at is None
+                    or now - measured_at > settings.DATABASE_REPLICA_LATENCY_MAX_AGE
+                ):
+                    latencies[alias] = (average, now)
+                    return alias
+            return min(replicas, key=lambda alias: latencies[alias][0])
+    return replicas[next(round_robin) % len(replicas)]
+
+
+def time_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record_latency(context["connection"].alias, time.perf_counter() - start)
+
+
+def install_timer(connection, **kwargs):
+    # On connection creation, so queries of async views, which run on
+    # their own threads and connections, are timed as well.
+    if (
+        connection.alias in settings.DATABASE_REPLICAS
+        and time_query not in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_timer)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Never None: Django would fall back to the hinted instance's database,
+        # which for a todo's owner can be a todo shard.
+        return read_alias.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are full copies of the primary.
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    For DRF views: safe requests from users who have not written recently
+    read from a replica. The alias is chosen after authentication, so the
+    user lookup itself always hits the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and not is_sticky(request.user.id)
+        ):
+            self.replica_token = read_alias.set(choose_replica())
+
+    def dispatch(self, request, *args, **kwargs):
+        # Not finalize_response(): DRF skips it when an unhandled exception
+        # escapes, which would leave later requests on this thread routed.
+        self.replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.replica_token is not None:
+                read_alias.reset(self.replica_token)
+
+
+def sync_replicas():
+    """
+    Copies the primary onto every replica with SQLite's online backup API.
+
+    For tests and local setups where the replicas are plain SQLite files;
+    a real deployment replicates outside Django.
+    """
+    source = connections["default"]
+    source.ensure_connection()
+    for alias in settings.DATABASE_REPLICAS:
+        target = connections[alias]
+        target.ensure_connection()
+        source.connection.backup(target.connection)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import datetime
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,6 +37,12 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 
+# users.models.EmailOutboxModel delivery (manage.py send_outbox)
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BACKOFF = 60  # seconds, doubled after every failed attempt
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 300  # seconds before another run may retry a claim
+
 
 # Application definition
 
@@ -55,6 +62,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it times everything below it.
+    "config.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -66,6 +75,10 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "config.urls"
 
+# Serve the async versions of the todo CRUD and myinfo views (see
+# config/async_views.py). Meant for ASGI; WSGI deployments keep the DRF views.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "0") == "1"
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -86,14 +99,123 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# Every setting can be overridden from the environment. With SQLITE_TUNING=0
+# the database falls back to SQLite's defaults and a connection per request,
+# which is what bench_sqlite_concurrency compares against.
+
+SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "1") == "1"
+
+# Applied by Django on every new connection (OPTIONS["init_command"]).
+SQLITE_PRAGMAS = {
+    # Readers no longer block the writer, nor it them.
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    # Durable at checkpoints instead of every commit; safe with WAL.
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Wait this long for a lock instead of failing with "database is locked".
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 2**20)),
+    # Negative values are KiB rather than pages.
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_SIZE_KIB", 64 * 1024)),
+    "temp_store": "MEMORY",
+}
 
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
     }
 }
 
+if SQLITE_TUNING:
+    DATABASES["default"].update(
+        {
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 600)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "init_command": ";".join(
+                    f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+                ),
+                # Seconds; the Python-level twin of busy_timeout.
+                "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+                # Take the write lock at BEGIN: a deferred transaction that
+                # upgrades to a writer fails at once instead of waiting.
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+    )
+
+# Read replicas (config.replicas). SQLITE_REPLICA_PATHS is a comma-separated
+# list of SQLite files kept in sync with the primary; each becomes a
+# "replica_<n>" alias that todo list/detail and profile reads are spread over.
+SQLITE_REPLICA_PATHS = [
+    path for path in os.environ.get("SQLITE_REPLICA_PATHS", "").split(",") if path
+]
+for number, path in enumerate(SQLITE_REPLICA_PATHS, 1):
+    DATABASES[f"replica_{number}"] = {**DATABASES["default"], "NAME": path}
+
+DATABASE_REPLICAS = [f"replica_{n}" for n in range(1, len(SQLITE_REPLICA_PATHS) + 1)]
+# "round_robin" or "least_latency" (moving average of query time)
+DATABASE_REPLICA_SELECTION = os.environ.get("DATABASE_REPLICA_SELECTION", "round_robin")
+# With "least_latency", a replica not measured for this many seconds gets
+# the next read, so its average catches up after a slow spike.
+DATABASE_REPLICA_LATENCY_MAX_AGE = 10
+# After a write the user reads from the primary for this long. Kept in the
+# "todos" cache, which must be shared by all workers (TODOS_CACHE_BACKEND).
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.environ.get("DATABASE_REPLICA_STICKY_SECONDS", 5)
+)
+DATABASE_REPLICA_CACHE_ALIAS = "todos"
+
+# Todo shards (todos.shards). "default" is shard 0; SQLITE_SHARD_PATHS adds
+# "shard_<n>" aliases. Users are placed by a stable hash of their id unless
+# they have a todo_shards row (written by `manage.py rebalance_todos`), so
+# pin everyone with `rebalance_todos --pin-all` before changing this list.
+SQLITE_SHARD_PATHS = [
+    path for path in os.environ.get("SQLITE_SHARD_PATHS", "").split(",") if path
+]
+for number, path in enumerate(SQLITE_SHARD_PATHS, 1):
+    DATABASES[f"shard_{number}"] = {**DATABASES["default"], "NAME": path}
+TODO_SHARDS = ["default"] + [
+    f"shard_{n}" for n in range(1, len(SQLITE_SHARD_PATHS) + 1)
+]
+
+DATABASE_ROUTERS = ["todos.shards.TodoShardRouter", "config.replicas.ReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# The "todos" alias holds the per-user versioned responses of todos.cache.
+# Set TODOS_CACHE_BACKEND to "file" or "db" to share it between worker
+# processes ("db" needs `manage.py createcachetable`).
+
+TODOS_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "todos",
+        "OPTIONS": {"MAX_ENTRIES": 10_000},
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("TODOS_CACHE_LOCATION", BASE_DIR / "cache/todos"),
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": os.environ.get("TODOS_CACHE_LOCATION", "todos_cache"),
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "todos": TODOS_CACHE_BACKENDS[os.environ.get("TODOS_CACHE_BACKEND", "locmem")],
+}
+
+TODO_CACHE_ALIAS = "todos"
+TODO_RESPONSE_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -117,10 +239,82 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        # JSONRenderer that reports its time to config.metrics.
+        "config.metrics.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
 }
 
+# Request metrics (config.metrics), served at /metrics. The share of requests
+# broken down into SQL, auth, serialization and render time; every request is
+# still counted and timed.
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", "0.1"))
+# With several worker processes, a directory they all write their metrics to.
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = 5
+# Latency histogram bucket bounds, in seconds.
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Keyset pagination of the todo list (todos.pagination.KeysetPagination)
+TODO_PAGE_SIZE = 50
+TODO_MAX_PAGE_SIZE = 500
+# Rows fetched and serialized per step by ?stream=true on the todo list
+TODO_STREAM_CHUNK_SIZE = 500
+
+# Background exports (todos.exports, manage.py run_exports). Kept outside
+# MEDIA_ROOT so files are only reachable through the authenticated endpoint.
+TODO_EXPORT_ROOT = BASE_DIR / "exports"
+TODO_EXPORT_CHUNK_SIZE = 1000
+# Running jobs without a heartbeat for this long are requeued by run_exports.
+TODO_EXPORT_STALE_SECONDS = 600
+
+# Batch todo creation (todos.views.TodoBulkCreateView)
+TODO_BULK_MAX_ITEMS = 1000
+TODO_BULK_CREATE_BATCH_SIZE = 500
+
+# Streaming NDJSON import (todos.imports). Each chunk is its own transaction.
+TODO_IMPORT_CHUNK_SIZE = 500
+TODO_IMPORT_MAX_LINE_BYTES = 64 * 1024
+TODO_IMPORT_MAX_ERRORS = 100
+
+# Change feed served at /todos/events/ (todos.events). LocalBroker keeps the
+# event log in memory and only reaches this process's connections; use
+# todos.events.DatabaseBroker when running several workers.
+TODO_EVENTS_BROKER = os.environ.get("TODO_EVENTS_BROKER", "todos.events.LocalBroker")
+# Events a reconnecting client can catch up on with Last-Event-ID.
+TODO_EVENTS_LOG_SIZE = 10_000
+# DatabaseBroker: seconds between polls, and how long events are kept.
+TODO_EVENTS_POLL_INTERVAL = 0.5
+TODO_EVENTS_RETENTION = 3600
+# Seconds between keep-alive comments on an idle connection.
+TODO_EVENTS_HEARTBEAT = 15
+# Undelivered events per connection before the client is told to reload.
+TODO_EVENTS_QUEUE_SIZE = 1000
+
+# In-process caches used by users.authentication.CustomUserJWTAuthentication
+AUTH_TOKEN_CACHE_SIZE = 10_000
+AUTH_USER_CACHE_SIZE = 10_000
+# Upper bound on how stale a cached user can be when it was changed without
+# save()/delete() or in another worker process.
+AUTH_USER_CACHE_TTL = 300
+# Cache holding users' current token_version. Only a shared backend (see
+# TODOS_CACHE_BACKEND) shows a revocation to every worker at once; with the
+# default per-process locmem, other workers see it when their entry expires,
+# so entries are kept briefly.
+AUTH_TOKEN_VERSION_CACHE_ALIAS = "todos"
+AUTH_TOKEN_VERSION_CACHE_TIMEOUT = (
+    10
+    if CACHES[AUTH_TOKEN_VERSION_CACHE_ALIAS]["BACKEND"].endswith("LocMemCache")
+    else 3600
+)
+
 SIMPLE_JWT = {
-    "ACCESS_TOKEN_LIFETIME": datetime.timedelta(days=15),
+    # Access tokens carry the user's claims, so they are kept short-lived and
+    # renewed through /users/token/refresh/.
+    "ACCESS_TOKEN_LIFETIME": datetime.timedelta(
+        minutes=int(os.environ.get("JWT_ACCESS_TOKEN_MINUTES", "5"))
+    ),
     "REFRESH_TOKEN_LIFETIME": datetime.timedelta(days=30),
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_HEADER_NAME": "HTTPS_AUTHORIZATION",
@@ -23,6 +23,8 @@ from rest_framework import permissions
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -44,6 +46,7 @@ urlpatterns = [
     ),
     path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view),
     path("todos/", include("todos.urls")),
     path("users/", include("users.urls")),
 ]
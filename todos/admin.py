@@ -1,11 +1,54 @@
 from django.contrib import admin
 
 
-from .models import TodoModel
+from .models import TodoModel, TodoExportModel, TodoShardModel
+from .signals import send_todos_changed
 
 
 class TodoModelAdmin(admin.ModelAdmin):
     list_display = ["title", "user_id", "deadline", "id", "is_finished"]
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            send_todos_changed(obj.user_id_id, "create", [obj.pk])
+            return
+        previous_owner = form.initial.get("user_id")
+        if previous_owner is not None and previous_owner != obj.user_id_id:
+            # Moving a todo to another user is a delete for the old owner.
+            send_todos_changed(previous_owner, "delete", [obj.pk])
+            send_todos_changed(obj.user_id_id, "create", [obj.pk])
+        else:
+            send_todos_changed(obj.user_id_id, "edit", [obj.pk])
+
+    def delete_model(self, request, obj):
+        user_id, pk = obj.user_id_id, obj.pk
+        super().delete_model(request, obj)
+        send_todos_changed(user_id, "delete", [pk])
+
+    def delete_queryset(self, request, queryset):
+        deleted = {}
+        for pk, user_id in queryset.values_list("pk", "user_id"):
+            deleted.setdefault(user_id, []).append(pk)
+        super().delete_queryset(request, queryset)
+        for user_id, ids in deleted.items():
+            send_todos_changed(user_id, "delete", ids)
+
 
 admin.site.register(TodoModel, TodoModelAdmin)
+
+
+class TodoExportModelAdmin(admin.ModelAdmin):
+    list_display = ["id", "user_id", "format", "gzip", "status", "rows", "created_at"]
+    list_filter = ["status", "format"]
+
+
+admin.site.register(TodoExportModel, TodoExportModelAdmin)
+
+
+class TodoShardModelAdmin(admin.ModelAdmin):
+    list_display = ["user_id", "alias", "moving", "updated_at"]
+    list_filter = ["alias", "moving"]
+
+
+admin.site.register(TodoShardModel, TodoShardModelAdmin)
@@ -0,0 +1,287 @@
+"""
+Async versions of the todo list, retrieve, create, finish, edit and delete
+views, served instead of the DRF views when `settings.ASYNC_VIEWS` is set.
+They return the same bodies and status codes; see `config.async_views`.
+
+`TodoEventsView`, the Server-Sent Events change feed, is always async and
+needs an ASGI server.
+"""
+
+import asyncio
+import json
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+
+
+from config.async_views import AsyncAPIView, render
+from .conditional import ConditionalGetMixin, make_etag
+from .events import get_broker
+from .fast_serializers import (
+    TodoCompactRowSerializer,
+    TodoRowSerializer,
+    UserProfileRowSerializer,
+)
+from .models import TodoModel
+from .pagination import KeysetPagination
+from .serializers import (
+    TodoCreateSerizalizer,
+    TodoEditSerializer,
+    TodoFilterSerializer,
+    TodoRertrieveSerializer,
+)
+from .signals import send_todos_changed
+from .streaming import AsyncJSONArrayStream
+from .views import TodoListView
+
+
+# Runs the on_commit receivers on the thread that owns the connection.
+asend_todos_changed = sync_to_async(send_todos_changed)
+
+NOT_FOUND = {"error": "Does not exist or the object does not belong to the user"}
+
+
+class AsyncTodoListView(ConditionalGetMixin, AsyncAPIView):
+    replica_reads = True
+    honor_if_modified_since = False
+
+    async def get(self, request):
+        stream = request.GET.get("stream", "").lower() in ("1", "true")
+        if stream and isinstance(request, WSGIRequest):
+            # A WSGI server would read an async stream to the end first.
+            return await sync_to_async(TodoListView.as_view())(request)
+
+        user = request.user
+        compact = request.GET.get("compact", "").lower() in ("1", "true")
+        filters = TodoFilterSerializer(data=request.GET.dict())
+        if not filters.is_valid():
+            return render(
+                {"error": "Mistake on serializer", "details": filters.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        todos = filters.filter_queryset(await TodoModel.objects.afor_user(user.id))
+
+        summary = await todos.aaggregate(
+            last_modified=Max("updated_at"), count=Count("id")
+        )
+        etag = make_etag(
+            user.id,
+            user.name,
+            user.surname,
+            summary["count"],
+            summary["last_modified"],
+            "application/json",
+            request.get_full_path(),
+        )
+        response = self.not_modified(request, etag, summary["last_modified"])
+        if response is None:
+            if compact:
+                serializer_class = TodoCompactRowSerializer
+            else:
+                serializer_class = partial(TodoRowSerializer, owner=user)
+            todos = todos.values_list(
+                *TodoCompactRowSerializer.values_fields(), named=True
+            )
+            paginator = KeysetPagination()
+            extra = {}
+            if compact:
+                extra["user"] = UserProfileRowSerializer(
+                    (user.id, user.name, user.surname)
+                ).data
+            if stream:
+                return self.stream(request, paginator, todos, serializer_class, extra)
+            page = await paginator.apaginate_queryset(todos, request, view=self)
+            data = serializer_class(page, many=True).data
+            response = render(paginator.get_paginated_data(data, **extra))
+        self.set_validators(response)
+        return response
+
+    def stream(self, request, paginator, todos, serializer_class, extra):
+        todos = paginator.order_queryset(todos, paginator.get_ordering(request))
+        # Pinned like in TodoListView.stream(): the rows are read later.
+        todos = todos.using(todos.db)
+        stream = AsyncJSONArrayStream(
+            todos,
+            serializer_class,
+            chunk_size=settings.TODO_STREAM_CHUNK_SIZE,
+            envelope={"next": None, **extra},
+        )
+        return StreamingHttpResponse(stream, content_type="application/json")
+
+
+class AsyncTodoRetrieveView(ConditionalGetMixin, AsyncAPIView):
+    replica_reads = True
+
+    async def get(self, request, pk):
+        todos = await TodoModel.objects.afor_user(request.user.id)
+        try:
+            todo = await todos.aget(pk=pk)
+        except TodoModel.DoesNotExist:
+            return render(
+                {"error": "Does not exist or not authenticated"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        etag = make_etag(todo.pk, todo.updated_at, "application/json")
+        response = self.not_modified(request, etag, todo.updated_at)
+        if response is None:
+            response = render(TodoRertrieveSerializer(todo).data)
+        self.set_validators(response)
+        return response
+
+
+class AsyncTodoCreateView(AsyncAPIView):
+    async def post(self, request):
+        user = request.user
+        serializer = TodoCreateSerizalizer(
+            data=self.get_data(request), context={"request": request}
+        )
+        if not serializer.is_valid():
+            return render(
+                {"error": "Mistake on serializer", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        todos = await TodoModel.objects.afor_user(user.id)
+        serializer.instance = await todos.acreate(
+            user_id=user, **serializer.validated_data
+        )
+        await asend_todos_changed(user.id, "create", [serializer.instance.pk])
+        return render(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncIsFinishedSetTrueView(AsyncAPIView):
+    async def patch(self, request, pk):
+        user_id = request.user.id
+        todos = (await TodoModel.objects.afor_user(user_id)).filter(pk=pk)
+        updated = await todos.aupdate(is_finished=True, updated_at=timezone.now())
+        if not updated:
+            return render(
+                {"error": "Todo does not exist or unauthorized"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        await asend_todos_changed(user_id, "finish", [pk], using=todos.db)
+        return render({"message": "Todo is finished"})
+
+
+class AsyncDeleteView(AsyncAPIView):
+    async def delete(self, request, pk):
+        user_id = request.user.id
+        todos = (await TodoModel.objects.afor_user(user_id)).filter(pk=pk)
+        deleted, _ = await todos.adelete()
+        if not deleted:
+            return render(NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+        await asend_todos_changed(user_id, "delete", [pk], using=todos.db)
+        return render({"message": "Deleted successfully"})
+
+
+class AsyncEditTodoView(AsyncAPIView):
+    async def put(self, request, pk):
+        user_id = request.user.id
+        todos = (await TodoModel.objects.afor_user(user_id)).filter(pk=pk)
+        serializer = TodoEditSerializer(data=self.get_data(request), partial=True)
+
+        if not serializer.is_valid():
+            # A missing todo still wins over a bad body, as in EditTodoApiView.
+            if not await todos.aexists():
+                return render(NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+            return render(
+                {"error": "Mistake on serializer", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if serializer.validated_data:
+            found = await todos.aupdate(
+                **serializer.validated_data, updated_at=timezone.now()
+            )
+        else:
+            found = await todos.aexists()
+        if not found:
+            return render(NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+        await asend_todos_changed(user_id, "edit", [pk], using=todos.db)
+        return render({"message": "Edited"})
+
+
+def format_event(broker, event):
+    data = json.dumps({"action": event.action, "ids": event.ids})
+    return f"id: {broker.event_id(event)}\nevent: {event.action}\ndata: {data}\n\n"
+
+
+# An empty id clears the client's Last-Event-ID, so it does not ask for the
+# same lost events again when it reconnects.
+RESET_EVENT = "id\nevent: reset\ndata: {}\n\n"
+
+
+class TodoEventsView(AsyncAPIView):
+    """
+    GET todos/events/: a text/event-stream of the user's todo writes.
+
+    Each event is named after the action ("create", "finish", "edit" or
+    "delete") and carries the todo ids. A client that reconnects with a
+    Last-Event-ID header is first sent what it missed, or a "reset" event
+    when that is no longer known and it should reload its todos.
+    """
+
+    async def get(self, request):
+        if isinstance(request, WSGIRequest):
+            # A WSGI server would buffer the endless response.
+            return render(
+                {"error": "The event stream needs an ASGI server"},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        last_event_id = request.headers.get("Last-Event-ID")
+        broker = get_broker()
+        # Subscribed before the replay, so nothing falls in between.
+        subscription = broker.subscribe(request.user.id)
+        response = StreamingHttpResponse(
+            self.stream(broker, subscription, last_event_id),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Stops nginx from buffering the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, broker, subscription, last_event_id):
+        try:
+            sent = 0
+            if last_event_id:
+                # None for ids of another epoch, e.g. from before a restart.
+                after = broker.parse_event_id(last_event_id)
+                events = None
+                if after is not None:
+                    events = await sync_to_async(broker.replay)(
+                        subscription.user_id, after
+                    )
+                if events is None:
+                    yield RESET_EVENT
+                else:
+                    sent = after
+                    for event in events:
+                        yield format_event(broker, event)
+                        sent = event.id
+            else:
+                # Starts the response, so the client sees it is connected.
+                yield ": connected\n\n"
+
+            while True:
+                try:
+                    event = await subscription.get(settings.TODO_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    # The client fell too far behind.
+                    yield RESET_EVENT
+                    return
+                if event.id <= sent:
+                    # Already sent by the replay.
+                    continue
+                sent = event.id
+                yield format_event(broker, event)
+        finally:
+            broker.unsubscribe(subscription)
@@ -0,0 +1,107 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+
+def get_cache():
+    return caches[settings.TODO_CACHE_ALIAS]
+
+
+def version_key(user_id):
+    return f"todos:version:{user_id}"
+
+
+def get_version(user_id):
+    """
+    Returns the user's current response-cache version.
+
+    A missing counter is seeded from the clock rather than 1, so a counter
+    evicted from the cache can never come back at a version whose entries
+    are still stored.
+    """
+    cache = get_cache()
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(user_id):
+    cache = get_cache()
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.add(version_key(user_id), time.time_ns(), timeout=None)
+
+
+def response_key(request):
+    path = request.get_full_path()
+    digest = hashlib.sha256(
+        f"{request.accepted_media_type}|{path}".encode()
+    ).hexdigest()
+    version = get_version(request.user.id)
+    return f"todos:response:{request.user.id}:{version}:{digest}"
+
+
+class PerUserCacheMixin:
+    """
+    Serves GET responses from a cache keyed by user and a per-user version.
+
+    Handlers call `get_cached_response()` first and return its result on a
+    hit. Successful responses are rendered once and stored as bytes, so a hit
+    skips both the ORM and serialization. Writes never delete entries; they
+    bump the version through `todos.signals.todos_changed` and old entries
+    simply expire.
+    """
+
+    response_cache_key = None
+
+    cached_headers = ("ETag", "Last-Modified")
+
+    def get_cached_response(self, request):
+        self.response_cache_key = response_key(request)
+        cached = get_cache().get(self.response_cache_key)
+        if cached is None:
+            return None
+        content, content_type, headers = cached
+        response = HttpResponse(content, content_type=content_type, headers=headers)
+        if "ETag" not in headers:
+            return response
+        # Revalidation against a cached entry needs no database access at all.
+        last_modified = None
+        if getattr(self, "honor_if_modified_since", False):
+            last_modified = parse_http_date_safe(headers.get("Last-Modified"))
+        return get_conditional_response(
+            request,
+            etag=headers["ETag"],
+            last_modified=last_modified,
+            response=response,
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            self.response_cache_key is not None
+            and isinstance(response, Response)
+            and response.status_code == 200
+        ):
+            response.render()
+            headers = {
+                header: response[header]
+                for header in self.cached_headers
+                if header in response
+            }
+            get_cache().set(
+                self.response_cache_key,
+                (response.content, response["Content-Type"], headers),
+                timeout=settings.TODO_RESPONSE_CACHE_TIMEOUT,
+            )
+        return response
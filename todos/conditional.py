@@ -0,0 +1,48 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest())
+
+
+class ConditionalGetMixin:
+    """
+    Answers `If-None-Match` / `If-Modified-Since` before any row is serialized.
+
+    Handlers compute cheap validators (an aggregate or a single timestamp),
+    pass them to `not_modified()` and return its result when it is not None.
+    Both validators are then attached to the final 200 or 304 response.
+
+    `If-Modified-Since` is only honoured when `last_modified` alone proves
+    the representation unchanged; list views cannot, because deleting a
+    row does not move `MAX(updated_at)` forward.
+    """
+
+    honor_if_modified_since = True
+    etag = None
+    last_modified = None
+
+    def not_modified(self, request, etag, last_modified):
+        self.etag = etag
+        self.last_modified = int(last_modified.timestamp()) if last_modified else None
+        return get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=(
+                self.last_modified if self.honor_if_modified_since else None
+            ),
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        self.set_validators(response)
+        return response
+
+    def set_validators(self, response):
+        if self.etag is not None and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            if self.last_modified is not None:
+                response["Last-Modified"] = http_date(self.last_modified)
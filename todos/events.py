@@ -0,0 +1,225 @@
+"""
+Change feed of a user's todos for the Server-Sent Events endpoint.
+
+Every committed write reaches `todos.signals.todos_changed`, whose receiver
+hands it to the broker named by `settings.TODO_EVENTS_BROKER`:
+
+- `LocalBroker` fans events out to the SSE connections of this process and
+  keeps the last `TODO_EVENTS_LOG_SIZE` of them in memory. It is enough for
+  a single worker.
+- `DatabaseBroker` writes events to the `todo_events` table instead. Each
+  process with open connections polls the table and fans out what any
+  worker wrote, so it works with several workers sharing a database. Rows
+  older than `TODO_EVENTS_RETENTION` seconds are removed.
+
+Event ids only grow, so a client reconnecting with `Last-Event-ID` is sent
+what it missed. If some of that has left the log, it is sent a single
+`reset` event and should reload its todos. The ids a client sees start with
+the broker's epoch: `LocalBroker` counts from 1 again after a restart, and
+an id from before it must not be mistaken for one of the new events.
+"""
+
+import asyncio
+import collections
+import datetime
+import itertools
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class Event:
+    __slots__ = ("id", "user_id", "action", "ids")
+
+    def __init__(self, id, user_id, action, ids):
+        self.id = id
+        self.user_id = user_id
+        self.action = action
+        self.ids = ids
+
+
+class Subscription:
+    """One SSE connection: a bounded queue living on the connection's loop."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.TODO_EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Thread-safe. A client too slow to keep up is told to reload."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop is closed; its connection is being torn down.
+            pass
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout):
+        """The next event, `None` after an overflow, or raises TimeoutError."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LocalBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = collections.defaultdict(set)
+        self.log = collections.deque(maxlen=settings.TODO_EVENTS_LOG_SIZE)
+        self.counter = itertools.count(1)
+        # Tells this process's ids from those of earlier or other processes.
+        self.epoch = secrets.token_hex(4)
+
+    def event_id(self, event):
+        """The id sent to clients, as `<epoch>-<n>`."""
+        return f"{self.epoch}-{event.id}"
+
+    def parse_event_id(self, value):
+        """The event number of a client's Last-Event-ID, or None if unknown."""
+        epoch, _, number = value.partition("-")
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def publish(self, user_id, action, ids):
+        with self.lock:
+            event = Event(next(self.counter), user_id, action, list(ids))
+            self.log.append(event)
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(event.user_id, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def subscribe(self, user_id):
+        """Must be called from the connection's event loop."""
+        subscription = Subscription(user_id)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+    def replay(self, user_id, after):
+        """
+        The user's events after id `after`, or None when some may be gone:
+        older than the log, or from before this process started.
+        """
+        with self.lock:
+            events = list(self.log)
+        oldest = events[0].id if events else None
+        newest = events[-1].id if events else 0
+        if after > newest or (oldest is not None and after + 1 < oldest):
+            return None
+        return [
+            event for event in events if event.id > after and event.user_id == user_id
+        ]
+
+
+class DatabaseBroker(LocalBroker):
+    def __init__(self):
+        super().__init__()
+        # Row ids survive restarts and are shared by every worker.
+        self.epoch = "db"
+        self.poller = None
+        self.published = 0
+
+    @property
+    def model(self):
+        from .models import TodoEventModel
+
+        return TodoEventModel
+
+    def publish(self, user_id, action, ids):
+        # Delivered by the poller of every process, this one included.
+        self.model.objects.using("default").create(
+            user_id_id=user_id, action=action, ids=list(ids)
+        )
+        self.published += 1
+        if self.published % 100 == 0:
+            self.trim()
+
+    def trim(self):
+        cutoff = timezone.now() - datetime.timedelta(
+            seconds=settings.TODO_EVENTS_RETENTION
+        )
+        self.model.objects.using("default").filter(created_at__lt=cutoff).delete()
+
+    def subscribe(self, user_id):
+        with self.lock:
+            if self.poller is None:
+                self.poller = threading.Thread(target=self.poll, daemon=True)
+                self.poller.start()
+        return super().subscribe(user_id)
+
+    def poll(self):
+        events = self.model.objects.using("default").order_by("id")
+        last_id = events.values_list("id", flat=True).last() or 0
+        while True:
+            close_old_connections()
+            rows = list(
+                events.filter(id__gt=last_id).values_list(
+                    "id", "user_id", "action", "ids"
+                )[:500]
+            )
+            for row in rows:
+                self.dispatch(Event(*row))
+            if rows:
+                last_id = rows[-1][0]
+            else:
+                time.sleep(settings.TODO_EVENTS_POLL_INTERVAL)
+
+    def replay(self, user_id, after):
+        events = self.model.objects.using("default")
+        ids = events.values_list("id", flat=True)
+        oldest = ids.order_by("id").first()
+        newest = ids.order_by("-id").first() or 0
+        if after > newest or (oldest is not None and after + 1 < oldest):
+            return None
+        rows = (
+            events.filter(user_id=user_id, id__gt=after)
+            .order_by("id")
+            .values_list("id", "user_id", "action", "ids")
+        )
+        return [Event(*row) for row in rows]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.TODO_EVENTS_BROKER)()
+        return _broker
+
+
+def reset_broker():
+    """Drops the broker, e.g. after the setting changed in tests."""
+    global _broker
+    with _broker_lock:
+        _broker = None
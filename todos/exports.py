@@ -0,0 +1,191 @@
+import csv
+import gzip
+import json
+import os
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .conditional import make_etag
+from .models import TodoExportModel, TodoModel
+
+
+EXPORT_FIELDS = [
+    "id",
+    "title",
+    "created_at",
+    "updated_at",
+    "deadline",
+    "is_finished",
+    "is_urgent",
+]
+
+CONTENT_TYPES = {
+    TodoExportModel.CSV: "text/csv",
+    TodoExportModel.NDJSON: "application/x-ndjson",
+}
+
+
+def export_path(export):
+    return os.path.join(settings.TODO_EXPORT_ROOT, export.file)
+
+
+def export_filename(export):
+    name = f"todos-{export.pk}.{export.format}"
+    return name + ".gz" if export.gzip else name
+
+
+def iter_todo_chunks(user_id, chunk_size):
+    """
+    Yields the user's todos as lists of value tuples, `chunk_size` at a time.
+
+    Each chunk is its own keyset query on `id`, so only one chunk is ever in
+    memory and no read transaction stays open for the whole export.
+    """
+    todos = TodoModel.objects.for_user(user_id).order_by("id")
+    last_id = 0
+    while True:
+        chunk = list(
+            todos.filter(id__gt=last_id).values_list(*EXPORT_FIELDS)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def format_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def write_chunk(stream, export_format, chunk, writer):
+    if export_format == TodoExportModel.CSV:
+        writer.writerows([format_value(v) for v in row] for row in chunk)
+    else:
+        for row in chunk:
+            record = dict(zip(EXPORT_FIELDS, map(format_value, row)))
+            stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def run_export(export, chunk_size):
+    """Writes the export file and marks the job done; raises on failure."""
+    export.file = os.path.join(str(export.user_id_id), export_filename(export))
+    path = export_path(export)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + ".part"
+
+    if export.gzip:
+        stream = gzip.open(partial, "wt", encoding="utf-8", newline="")
+    else:
+        stream = open(partial, "w", encoding="utf-8", newline="")
+    rows = 0
+    try:
+        with stream:
+            writer = csv.writer(stream)
+            if export.format == TodoExportModel.CSV:
+                writer.writerow(EXPORT_FIELDS)
+            for chunk in iter_todo_chunks(export.user_id_id, chunk_size):
+                write_chunk(stream, export.format, chunk, writer)
+                rows += len(chunk)
+                # Tells run_exports this job is still alive.
+                TodoExportModel.objects.filter(pk=export.pk).update(
+                    heartbeat_at=timezone.now()
+                )
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+    export.rows = rows
+    export.size = os.path.getsize(path)
+    export.status = TodoExportModel.DONE
+    export.finished_at = timezone.now()
+    export.save(update_fields=["file", "rows", "size", "status", "finished_at"])
+
+
+range_re = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """
+    Returns `(start, end)` for a single-range `Range` header, `None` when the
+    header should be ignored, or raises ValueError when it is unsatisfiable.
+    """
+    match = range_re.match(header.strip())
+    if not match:
+        # Multiple or non-byte ranges: serving the whole file is allowed.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # No byte of an empty file can be addressed.
+        raise ValueError("Range not satisfiable")
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def read_file(path, start, length, block_size=64 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(block_size, length))
+            if not block:
+                return
+            length -= len(block)
+            yield block
+
+
+def download_response(request, export):
+    """
+    Serves a finished export, honouring a single `Range` (and `If-Range`).
+    """
+    path = export_path(export)
+    size = os.path.getsize(path)
+    etag = make_etag(export.pk, export.size, export.finished_at)
+
+    start, end = 0, size - 1
+    status = 200
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            requested = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        if requested is not None:
+            start, end = requested
+            status = 206
+
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(
+        read_file(path, start, length),
+        status=status,
+        content_type=(
+            "application/gzip" if export.gzip else CONTENT_TYPES[export.format]
+        ),
+    )
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Content-Disposition"] = (
+        f'attachment; filename="{export_filename(export)}"'
+    )
+    if status == 206:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
@@ -0,0 +1,132 @@
+import gzip
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import TodoModel
+from .serializers import TodoCreateSerizalizer
+from .signals import send_todos_changed
+
+
+def iter_lines(stream, max_length):
+    """
+    Yields `(line_number, line)` from a binary stream, reading one line at a
+    time. Lines longer than `max_length` bytes are skipped and yielded as
+    `None` so a single huge line cannot be buffered in memory.
+    """
+    number = 0
+    while True:
+        line = stream.readline(max_length + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_length and not line.endswith(b"\n"):
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_length + 1)
+            yield number, None
+            continue
+        yield number, line
+
+
+class TodoImport:
+    """
+    Validates NDJSON lines with `TodoCreateSerizalizer` and saves the valid
+    ones with `bulk_create`, one transaction per `chunk_size` todos.
+
+    Only the current chunk and the first `max_errors` errors are kept, so
+    memory does not grow with the size of the upload.
+    """
+
+    def __init__(self, user, chunk_size=None, max_errors=None):
+        self.user = user
+        self.chunk_size = chunk_size or settings.TODO_IMPORT_CHUNK_SIZE
+        self.max_errors = max_errors or settings.TODO_IMPORT_MAX_ERRORS
+        self.lines = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.pending = []
+
+    def add_error(self, number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": number, "errors": errors})
+
+    def add_line(self, number, line):
+        self.lines = number
+        if line is None:
+            self.add_error(
+                number,
+                {
+                    "non_field_errors": [
+                        f"Line is longer than "
+                        f"{settings.TODO_IMPORT_MAX_LINE_BYTES} bytes."
+                    ]
+                },
+            )
+            return
+        if not line.strip():
+            return
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            self.add_error(number, {"non_field_errors": [f"Invalid JSON: {e}"]})
+            return
+
+        serializer = TodoCreateSerizalizer(data=data)
+        if not serializer.is_valid():
+            self.add_error(number, serializer.errors)
+            return
+        self.pending.append(TodoModel(user_id=self.user, **serializer.validated_data))
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        queryset = TodoModel.objects.for_user(self.user.id)
+        with transaction.atomic(using=queryset.db):
+            todos = queryset.bulk_create(self.pending)
+            send_todos_changed(
+                self.user.id, "create", [todo.pk for todo in todos], using=queryset.db
+            )
+        self.created += len(todos)
+        self.pending = []
+
+    def run(self, stream):
+        for number, line in iter_lines(stream, settings.TODO_IMPORT_MAX_LINE_BYTES):
+            self.add_line(number, line)
+        self.flush()
+
+    def summary(self):
+        return {
+            "lines": self.lines,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+def import_todos(request):
+    """
+    Imports the NDJSON request body for `request.user`.
+
+    The body is read straight from the request stream (and decompressed on
+    the fly for `Content-Encoding: gzip`) instead of through `request.data`,
+    which would load the whole upload first. Returns `(summary, error)`;
+    chunks committed before a broken gzip stream are kept and reported.
+    """
+    todo_import = TodoImport(request.user)
+    stream = request.stream
+    if stream is None:
+        return todo_import.summary(), None
+    if request.headers.get("Content-Encoding", "").lower() == "gzip":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    try:
+        todo_import.run(stream)
+    except (OSError, EOFError, zlib.error) as e:
+        todo_import.flush()
+        return todo_import.summary(), f"Invalid gzip body: {e}"
+    return todo_import.summary(), None
@@ -0,0 +1,217 @@
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+
+from todos.models import TodoModel
+from users.models import UserModel
+from users.tokens import UserRefreshToken
+
+
+MODES = {
+    # name: (server, ASYNC_VIEWS)
+    "wsgi-sync": ("wsgi", "0"),
+    "asgi-sync": ("asgi", "0"),
+    "asgi-async": ("asgi", "1"),
+}
+
+PATHS = ("/todos/todolist/", "/users/myinfo/")
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the todo list and myinfo endpoints with --concurrency clients "
+        "for --seconds, in-process through the WSGI handler with the DRF "
+        "views and through the ASGI handler with the DRF and the async views, "
+        "each in its own process and database file, and compare requests/s "
+        "and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--todos", type=int, default=200)
+        parser.add_argument("--mode", choices=MODES, action="append")
+        parser.add_argument(
+            "--run",
+            choices=MODES,
+            help="Benchmark one mode in this process and print a JSON result.",
+        )
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+
+        self.stdout.write(
+            f"{'mode':<11} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for mode in options["mode"] or MODES:
+            result = self.run_isolated(options, mode)
+            self.stdout.write(
+                f"{mode:<11} {result['requests'] / options['seconds']:>8.0f} "
+                f"{result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} "
+                f"{result['errors']:>7}"
+            )
+
+    def run_isolated(self, options, mode):
+        # The URLconf picks its views at import, so each mode gets a process.
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "ASYNC_VIEWS": MODES[mode][1],
+                "SQLITE_PATH": os.path.join(directory, "bench.sqlite3"),
+            }
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    sys.argv[0],
+                    "bench_async_views",
+                    f"--run={mode}",
+                    f"--concurrency={options['concurrency']}",
+                    f"--seconds={options['seconds']}",
+                    f"--todos={options['todos']}",
+                ],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def run(self, options):
+        call_command("migrate", run_syncdb=True, verbosity=0)
+        user = UserModel.objects.create(
+            name="Bench", surname="User", email="bench@example.com"
+        )
+        TodoModel.objects.bulk_create(
+            TodoModel(title=f"Todo {i}", user_id=user) for i in range(options["todos"])
+        )
+        token = str(UserRefreshToken.for_user(user).access_token)
+        connections.close_all()
+
+        # A unique query string per request keeps the DRF list view's
+        # response cache out of the comparison.
+        counter = itertools.count()
+
+        def next_path():
+            number = next(counter)
+            return f"{PATHS[number % len(PATHS)]}?page_size=20&n={number}"
+
+        if MODES[options["run"]][0] == "wsgi":
+            latencies, errors = self.run_wsgi(options, token, next_path)
+        else:
+            latencies, errors = asyncio.run(self.run_asgi(options, token, next_path))
+
+        return {
+            "requests": len(latencies),
+            "p50": statistics.median(latencies) if latencies else 0,
+            "p99": (
+                statistics.quantiles(latencies, n=100)[-1] if len(latencies) > 1 else 0
+            ),
+            "errors": errors,
+        }
+
+    def run_wsgi(self, options, token, next_path):
+        handler = WSGIHandler()
+        factory = RequestFactory(
+            HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        deadline = time.perf_counter() + options["seconds"]
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            while time.perf_counter() < deadline:
+                request = factory.get(next_path())
+                status = []
+                start = time.perf_counter()
+                response = handler(
+                    request.environ, lambda s, headers: status.append(int(s[:3]))
+                )
+                b"".join(response)
+                response.close()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if status[0] >= 400:
+                        errors.append(status[0])
+                    else:
+                        latencies.append(elapsed)
+            connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(options["concurrency"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, len(errors)
+
+    async def run_asgi(self, options, token, next_path):
+        handler = ASGIHandler()
+        deadline = time.perf_counter() + options["seconds"]
+        latencies = []
+        errors = []
+
+        async def request(path):
+            route, _, query = path.partition("?")
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": route,
+                "raw_path": route.encode(),
+                "query_string": query.encode(),
+                "root_path": "",
+                "headers": [
+                    (b"host", b"localhost"),
+                    (b"authorization", f"Bearer {token}".encode()),
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": ("localhost", 80),
+            }
+            messages = [{"type": "http.request", "body": b"", "more_body": False}]
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # The client never disconnects; Django cancels this wait.
+                await asyncio.Future()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            await handler(scope, receive, send)
+            return status[0]
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                status = await request(next_path())
+                elapsed = time.perf_counter() - start
+                if status >= 400:
+                    errors.append(status)
+                else:
+                    latencies.append(elapsed)
+
+        await asyncio.gather(*(worker() for _ in range(options["concurrency"])))
+        return latencies, len(errors)
@@ -0,0 +1,494 @@
+import asyncio
+import datetime
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory, override_settings
+
+from todos import urls as todo_urls
+from todos.exports import run_export
+from todos.models import TodoExportModel, TodoModel, TodoStatsModel
+from users import urls as user_urls
+from users.models import UserModel
+from users.tokens import UserRefreshToken
+
+
+DEFAULT_SIZES = ["100x20", "1000x100"]
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+# Routes left out of the benchmark, and why.
+SKIPPED = {
+    "users/login/": (
+        "LoginView calls UserModel.check_password, which does not exist, "
+        "so every login is a 500"
+    ),
+}
+
+
+def parse_size(value):
+    users, _, todos = value.partition("x")
+    try:
+        return int(users), int(todos)
+    except ValueError:
+        raise CommandError(f"Sizes look like 1000x100 (users x todos), not {value}")
+
+
+def routes():
+    """Every route of the todo and user URLconfs."""
+    return [
+        f"{prefix}{pattern.pattern}"
+        for prefix, module in (("todos/", todo_urls), ("users/", user_urls))
+        for pattern in module.urlpatterns
+    ]
+
+
+def summarize(latencies, statuses, queries):
+    """Only 2xx responses are samples; the rest are counted as errors."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": sum(not 200 <= status < 300 for status in statuses),
+        "rps": len(latencies) / sum(latencies) if latencies else 0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p99_ms": (
+            statistics.quantiles(latencies, n=100)[-1] * 1000
+            if len(latencies) > 1
+            else sum(latencies) * 1000
+        ),
+        "queries": statistics.mean(queries) if queries else 0,
+        "statuses": {
+            str(status): statuses.count(status) for status in sorted(set(statuses))
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a fresh database for each --size (users x mean todos per user), "
+        "send --requests requests to every todo and user endpoint in-process, "
+        "and report requests/s, p50/p99 latency and queries per request of the "
+        "2xx responses. Results are written to --output as JSON; the command "
+        "fails if any request was not a 2xx. With --baseline, endpoints "
+        "slower than the baseline by more than --tolerance, or issuing more "
+        "queries, are reported and the command fails."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            action="append",
+            help=f"USERSxTODOS; may be repeated. Default: {' '.join(DEFAULT_SIZES)}.",
+        )
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--output", default="bench-results.json")
+        parser.add_argument("--baseline", help="A results file to compare with.")
+        parser.add_argument("--tolerance", type=float, default=0.25)
+        parser.add_argument(
+            "--run", help="Benchmark one size in this process and print JSON."
+        )
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            self.stdout.write(json.dumps(self.run(options, options["run"])))
+            return
+
+        sizes = options["size"] or DEFAULT_SIZES
+        for size in sizes:
+            parse_size(size)
+        results = {}
+        for size in sizes:
+            self.stdout.write(f"Seeding and benchmarking {size} ...")
+            results[size] = self.run_isolated(options, size)
+            self.print_results(size, results[size])
+
+        report = {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "requests": options["requests"],
+            "sizes": results,
+        }
+        with open(options["output"], "w") as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        failing = [
+            f"{size} {route}"
+            for size, result in results.items()
+            for route, row in result["endpoints"].items()
+            if row["errors"]
+        ]
+        if failing:
+            raise CommandError(f"Non-2xx responses from {', '.join(failing)}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            regressions = self.compare(report, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError(f"{regressions} regressions against the baseline")
+            self.stdout.write("No regressions against the baseline")
+
+    def print_results(self, size, result):
+        self.stdout.write(
+            f"{size}: {result['users']} users, {result['todos']} todos, "
+            f"benchmark user has {result['user_todos']}"
+        )
+        self.stdout.write(
+            f"  {'route':<34} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8}  statuses"
+        )
+        for route, row in result["endpoints"].items():
+            statuses = " ".join(f"{k}x{v}" for k, v in row["statuses"].items())
+            self.stdout.write(
+                f"  {route:<34} {row['rps']:>8.0f} {row['p50_ms']:>8.1f} "
+                f"{row['p99_ms']:>8.1f} {row['queries']:>8.1f}  {statuses}"
+            )
+        for route, reason in SKIPPED.items():
+            self.stdout.write(f"  {route:<34} skipped: {reason}")
+
+    def compare(self, report, baseline, tolerance):
+        regressions = 0
+        for size, result in report["sizes"].items():
+            base_result = baseline.get("sizes", {}).get(size)
+            if base_result is None:
+                self.stdout.write(f"{size}: not in the baseline")
+                continue
+            for route, row in result["endpoints"].items():
+                base = base_result["endpoints"].get(route)
+                if base is None:
+                    continue
+                problems = [
+                    f"{key} {base[key]:.1f} -> {row[key]:.1f}"
+                    for key in ("p50_ms", "p99_ms")
+                    if row[key] > base[key] * (1 + tolerance)
+                ]
+                if row["queries"] > base["queries"]:
+                    problems.append(
+                        f"queries {base['queries']:.1f} -> {row['queries']:.1f}"
+                    )
+                if problems:
+                    regressions += 1
+                    self.stdout.write(
+                        f"REGRESSION {size} {route}: {'; '.join(problems)}"
+                    )
+        return regressions
+
+    def run_isolated(self, options, size):
+        # Each size gets a fresh database file, hence its own process.
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "SQLITE_PATH": os.path.join(directory, "bench.sqlite3"),
+                "ASYNC_VIEWS": "0",
+                "METRICS_DIR": "",
+            }
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    sys.argv[0],
+                    "bench_endpoints",
+                    f"--run={size}",
+                    f"--requests={options['requests']}",
+                ],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def run(self, options, size):
+        users, todos = parse_size(size)
+        call_command("migrate", run_syncdb=True, verbosity=0)
+        call_command("seed", users=users, todos=todos, stdout=StringIO())
+        # The heaviest user, so per-user endpoints see the most data.
+        user = UserModel.objects.get(
+            pk=TodoStatsModel.objects.order_by("-total").values_list("pk", flat=True)[0]
+        )
+        result = {
+            "users": UserModel.objects.count(),
+            "todos": TodoModel.objects.count(),
+            "user_todos": TodoModel.objects.for_user(user.pk).count(),
+        }
+        self.count = options["requests"]
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            # Every request reports its queries in Server-Timing.
+            METRICS_SAMPLE_RATE=1.0,
+            METRICS_DIR=None,
+            TODO_EXPORT_ROOT=directory,
+        ):
+            scenarios = self.scenarios(user)
+            missing = set(routes()) - set(scenarios) - set(SKIPPED)
+            if missing:
+                raise CommandError(f"No benchmark for {', '.join(sorted(missing))}")
+            connections.close_all()
+            self.wsgi = WSGIHandler()
+            self.asgi = ASGIHandler()
+            self.factory = RequestFactory(HTTP_HOST="localhost")
+            result["endpoints"] = {
+                route: self.measure(scenarios[route])
+                for route in routes()
+                if route not in SKIPPED
+            }
+        return result
+
+    def scenarios(self, user):
+        """
+        Maps each route to a function returning the i-th request's
+        `(method, path, body, content_type, token)`. Writes that use up what
+        they touch (deletes, logout, verify) get their own todos and users,
+        prepared here so only the request itself is timed. Refresh tokens are
+        single use, so each refresh mints its own before the timer starts.
+        """
+        count = self.count
+        token = str(UserRefreshToken.for_user(user).access_token)
+        ids = list(
+            TodoModel.objects.for_user(user.pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[: count * 20]
+        )
+
+        def spare_todos(number):
+            todos = TodoModel.objects.for_user(user.pk)
+            created = todos.bulk_create(
+                TodoModel(title=f"Spare {n}", user_id=user) for n in range(number)
+            )
+            return [todo.pk for todo in created]
+
+        def spare_users(prefix, otp=""):
+            created = UserModel.objects.bulk_create(
+                UserModel(
+                    name="Spare",
+                    email=f"{prefix}{n}@example.com",
+                    password="password1",
+                    otp=otp,
+                    is_active=True,
+                )
+                for n in range(count)
+            )
+            return [str(UserRefreshToken.for_user(u).access_token) for u in created]
+
+        deletes = spare_todos(count)
+        bulk_deletes = spare_todos(count * 20)
+        logout_tokens = spare_users("logout")
+        verify_tokens = spare_users("verify", otp="12345")
+
+        exports = [
+            TodoExportModel.objects.create(user_id=user, format=TodoExportModel.CSV)
+            for _ in range(2)
+        ]
+        run_export(exports[1], 1000)
+
+        def get(path, who=token):
+            def scenario(i):
+                # A unique query string keeps the response cache out of it.
+                separator = "&" if "?" in path else "?"
+                return ("get", f"{path}{separator}_bench={i}", None, None, who)
+
+            return scenario
+
+        def write(method, path, body, who=token, content_type="application/json"):
+            def scenario(i):
+                value = body(i) if callable(body) else body
+                if content_type == "application/json":
+                    value = json.dumps(value)
+                return (method, path(i), value, content_type, who)
+
+            return scenario
+
+        def todo(i):
+            return ids[i % len(ids)]
+
+        def chunk(values, i, size=20):
+            # Wraps around, so small users still get full chunks.
+            return [values[(i * size + n) % len(values)] for n in range(size)]
+
+        ndjson = "\n".join(
+            json.dumps({"title": f"Imported {n}"}) for n in range(20)
+        ).encode()
+
+        return {
+            "todos/todolist/": get("/todos/todolist/?page_size=50"),
+            "todos/todolist/<int:pk>/": lambda i: get(f"/todos/todolist/{todo(i)}/")(i),
+            "todos/search/": get("/todos/search/?q=report"),
+            "todos/stats/": get("/todos/stats/"),
+            "todos/events/": lambda i: ("sse", "/todos/events/", None, None, token),
+            "todos/sync/": get("/todos/sync/?page_size=100"),
+            "todos/<int:pk>/finish/": write(
+                "patch", lambda i: f"/todos/{todo(i)}/finish/", {}
+            ),
+            "todos/create/": write(
+                "post", lambda i: "/todos/create/", lambda i: {"title": f"New {i}"}
+            ),
+            "todos/create/bulk/": write(
+                "post",
+                lambda i: "/todos/create/bulk/",
+                [{"title": f"Bulk {n}"} for n in range(20)],
+            ),
+            "todos/create/import/": write(
+                "post",
+                lambda i: "/todos/create/import/",
+                ndjson,
+                content_type="application/x-ndjson",
+            ),
+            "todos/<int:pk>/delete/": write(
+                "delete", lambda i: f"/todos/{deletes[i]}/delete/", {}
+            ),
+            "todos/<int:pk>/edit/": write(
+                "put",
+                lambda i: f"/todos/{todo(i)}/edit/",
+                lambda i: {"title": f"Edited {i}"},
+            ),
+            "todos/bulk/finish/": write(
+                "patch",
+                lambda i: "/todos/bulk/finish/",
+                lambda i: {"ids": chunk(ids, i)},
+            ),
+            "todos/bulk/delete/": write(
+                "post",
+                lambda i: "/todos/bulk/delete/",
+                lambda i: {"ids": chunk(bulk_deletes, i)},
+            ),
+            "todos/bulk/edit/": write(
+                "put",
+                lambda i: "/todos/bulk/edit/",
+                lambda i: {"ids": chunk(ids, i), "title": f"Bulk edited {i}"},
+            ),
+            "todos/exports/": write(
+                "post", lambda i: "/todos/exports/", {"format": "csv"}
+            ),
+            "todos/exports/<int:pk>/": get(f"/todos/exports/{exports[0].pk}/"),
+            "todos/exports/<int:pk>/download/": get(
+                f"/todos/exports/{exports[1].pk}/download/"
+            ),
+            "users/logout/": lambda i: write(
+                "post", lambda i: "/users/logout/", {}, who=logout_tokens[i]
+            )(i),
+            "users/token/refresh/": write(
+                "post",
+                lambda i: "/users/token/refresh/",
+                lambda i: {"refresh_token": str(UserRefreshToken.for_user(user))},
+            ),
+            "users/myinfo/": get("/users/myinfo/"),
+            "users/create/": write(
+                "post",
+                lambda i: "/users/create/",
+                lambda i: {
+                    "name": "New",
+                    "surname": "User",
+                    "age": 30,
+                    "email": f"new{i}@example.com",
+                    "password": "password1",
+                },
+                who=None,
+            ),
+            "users/verify/": lambda i: write(
+                "post",
+                lambda i: "/users/verify/",
+                {"otp": "12345"},
+                who=verify_tokens[i],
+            )(i),
+        }
+
+    def measure(self, scenario):
+        latencies, statuses, queries = [], [], []
+        for i in range(self.count):
+            method, path, body, content_type, token = scenario(i)
+            headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+            if method == "sse":
+                status, elapsed, timing = self.first_event(path, token)
+            else:
+                if body is None:
+                    request = getattr(self.factory, method)(path, **headers)
+                else:
+                    request = getattr(self.factory, method)(
+                        path, body, content_type=content_type, **headers
+                    )
+                status, elapsed, timing = self.call(request)
+            statuses.append(status)
+            if not 200 <= status < 300:
+                continue
+            latencies.append(elapsed)
+            match = QUERIES_RE.search(timing)
+            if match:
+                queries.append(int(match.group(1)))
+        return summarize(latencies, statuses, queries)
+
+    def call(self, request):
+        start_response = []
+        start = time.perf_counter()
+        response = self.wsgi(
+            request.environ,
+            lambda status, headers: start_response.append((status, headers)),
+        )
+        b"".join(response)
+        response.close()
+        elapsed = time.perf_counter() - start
+        status, headers = start_response[0]
+        return int(status[:3]), elapsed, dict(headers).get("Server-Timing", "")
+
+    def first_event(self, path, token):
+        """Opens the event stream through ASGI and times its first bytes."""
+
+        async def open_stream():
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [
+                    (b"host", b"localhost"),
+                    (b"authorization", f"Bearer {token}".encode()),
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": ("localhost", 80),
+            }
+            started = asyncio.Event()
+            result = {}
+            sent_request = False
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    sent_request = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await started.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    result["status"] = message["status"]
+                    headers = dict(message["headers"])
+                    result["timing"] = headers.get(b"server-timing", b"").decode()
+                elif (
+                    message["type"] == "http.response.body" and "elapsed" not in result
+                ):
+                    result["elapsed"] = time.perf_counter() - start
+                    started.set()
+
+            start = time.perf_counter()
+            await self.asgi(scope, receive, send)
+            return result
+
+        result = asyncio.run(open_stream())
+        return result["status"], result["elapsed"], result.get("timing", "")
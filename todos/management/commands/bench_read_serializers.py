@@ -0,0 +1,99 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from todos.fast_serializers import TodoCompactRowSerializer, TodoRowSerializer
+from todos.models import TodoModel
+from todos.serializers import TodoCompactSerializer, TodoModelSerializer
+from users.models import UserModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/s of the ModelSerializer and fast-path (values_list) "
+        "read serializers, including the query and JSON rendering, for each "
+        "of --rows. Checks the output is byte-identical. Runs inside a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        with transaction.atomic():
+            user = UserModel.objects.create(
+                name="Bench", surname="User", email="bench@example.com"
+            )
+            self.stdout.write(
+                f"{'rows':>8} {'mode':<8} {'model rows/s':>14} "
+                f"{'fast rows/s':>14} {'speedup':>8}"
+            )
+            created = 0
+            for rows in sorted(options["rows"]):
+                self.create_todos(user, rows - created)
+                created = rows
+                todos = TodoModel.objects.filter(user_id=user).order_by("id")
+                fields = TodoCompactRowSerializer.values_fields()
+
+                for mode, model_run, fast_run in (
+                    (
+                        "full",
+                        lambda: TodoModelSerializer(
+                            todos.select_related("user_id"), many=True
+                        ).data,
+                        lambda: TodoRowSerializer(
+                            todos.values_list(*fields), many=True, owner=user
+                        ).data,
+                    ),
+                    (
+                        "compact",
+                        lambda: TodoCompactSerializer(todos, many=True).data,
+                        lambda: TodoCompactRowSerializer(
+                            todos.values_list(*fields), many=True
+                        ).data,
+                    ),
+                ):
+                    model_time, model_body = self.measure(
+                        model_run, renderer, options["repeat"]
+                    )
+                    fast_time, fast_body = self.measure(
+                        fast_run, renderer, options["repeat"]
+                    )
+                    if model_body != fast_body:
+                        raise CommandError(f"{mode} output differs at {rows} rows")
+                    self.stdout.write(
+                        f"{rows:>8} {mode:<8} {rows / model_time:>14,.0f} "
+                        f"{rows / fast_time:>14,.0f} "
+                        f"{model_time / fast_time:>7.1f}x"
+                    )
+            transaction.set_rollback(True)
+
+    def create_todos(self, user, count):
+        now = timezone.now()
+        TodoModel.objects.bulk_create(
+            (
+                TodoModel(
+                    title=f"Benchmark todo {i}",
+                    deadline=now + datetime.timedelta(minutes=i),
+                    user_id=user,
+                )
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+
+    def measure(self, run, renderer, repeat):
+        """Best of `repeat` runs of query + serialize + render."""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = renderer.render(run())
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, body
@@ -0,0 +1,122 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from todos.models import TodoModel
+from todos.search import TERM_RE, TodoSearch
+from users.models import UserModel
+
+
+WORDS = (
+    "buy milk bread eggs cheese call mom dad doctor dentist pay rent bills "
+    "invoice tax report meeting review code deploy server backup email reply "
+    "book flight hotel train tickets clean kitchen garage car wash fix bike "
+    "water plants walk dog gym run read chapter write essay plan trip birthday "
+    "gift party order pizza"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the FTS5 search index with LIKE scanning for one user's first "
+        "page of matches, with --rows todos spread over --users users. Runs "
+        "inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=1,
+            help="The measured user owns rows / users todos.",
+        )
+        parser.add_argument(
+            "--query",
+            action="append",
+            help="Search text; may be repeated.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=20_000,
+            help="Todos built in memory and inserted at a time.",
+        )
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        queries = options["query"] or ["milk", "pay tax", "birthday gift party", "zzz"]
+        with transaction.atomic():
+            start = time.perf_counter()
+            users = self.create_data(
+                options["rows"], options["users"], options["chunk_size"]
+            )
+            self.stdout.write(
+                f"Loaded {options['rows']:,} todos for {len(users)} users in "
+                f"{time.perf_counter() - start:.1f}s (index kept by triggers)"
+            )
+            user = users[0]
+            todos = TodoModel.objects.for_user(user.id)
+            self.stdout.write(
+                f"{'query':<22} {'matches':>9} {'fts ms':>9} {'like ms':>9} "
+                f"{'speedup':>8}"
+            )
+            for query in queries:
+                search = TodoSearch(user.id, query, todos.db)
+                like = todos
+                for term in TERM_RE.findall(query):
+                    like = like.filter(title__icontains=term)
+                like = like.order_by("id")
+
+                fts_time = self.measure(
+                    lambda: search.page(None, options["page_size"]), options["repeat"]
+                )
+                like_time = self.measure(
+                    lambda: list(like.values_list("id")[: options["page_size"]]),
+                    options["repeat"],
+                )
+                self.stdout.write(
+                    f"{query:<22} {like.count():>9,} {fts_time * 1000:>9.2f} "
+                    f"{like_time * 1000:>9.2f} {like_time / fts_time:>7.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def create_data(self, rows, users, chunk_size):
+        rng = random.Random(42)
+        users = [
+            UserModel.objects.create(
+                name="Bench", surname=str(n), email=f"bench{n}@example.com"
+            )
+            for n in range(users)
+        ]
+        now = timezone.now()
+        # bulk_create() turns its argument into a list, so it is fed one
+        # chunk at a time to keep memory flat.
+        for chunk_start in range(0, rows, chunk_size):
+            TodoModel.objects.bulk_create(
+                [
+                    TodoModel(
+                        title=" ".join(rng.choices(WORDS, k=rng.randint(2, 6))),
+                        deadline=now + datetime.timedelta(minutes=i),
+                        user_id=users[i % len(users)],
+                    )
+                    for i in range(chunk_start, min(chunk_start + chunk_size, rows))
+                ],
+                batch_size=1000,
+            )
+        return users
+
+    def measure(self, run, repeat):
+        """Best of `repeat` runs."""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,145 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import UserModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Run --writers threads creating todos and --readers threads listing "
+        "them through the WSGI handler, once with SQLite's defaults "
+        "(SQLITE_TUNING=0) and once with the tuned settings, each against a "
+        "fresh database file, and compare throughput, latency and errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument(
+            "--run",
+            action="store_true",
+            help="Benchmark the current settings only and print a JSON result.",
+        )
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+
+        self.stdout.write(
+            f"{'config':<8} {'writes/s':>9} {'reads/s':>9} {'write p99 ms':>13} "
+            f"{'read p99 ms':>12} {'errors':>7}"
+        )
+        for name, tuning in (("default", "0"), ("tuned", "1")):
+            result = self.run_isolated(options, tuning)
+            self.stdout.write(
+                f"{name:<8} {result['writes'] / options['seconds']:>9.0f} "
+                f"{result['reads'] / options['seconds']:>9.0f} "
+                f"{result['write_p99'] * 1000:>13.1f} "
+                f"{result['read_p99'] * 1000:>12.1f} {result['errors']:>7}"
+            )
+
+    def run_isolated(self, options, tuning):
+        # Settings are read at start-up, so each configuration gets its own
+        # process and database file.
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "SQLITE_TUNING": tuning,
+                "SQLITE_PATH": os.path.join(directory, "bench.sqlite3"),
+            }
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    sys.argv[0],
+                    "bench_sqlite_concurrency",
+                    "--run",
+                    f"--writers={options['writers']}",
+                    f"--readers={options['readers']}",
+                    f"--seconds={options['seconds']}",
+                ],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def run(self, options):
+        call_command("migrate", run_syncdb=True, verbosity=0)
+        user = UserModel.objects.create(name="Bench", email="bench@example.com")
+        token = str(RefreshToken.for_user(user).access_token)
+        connections.close_all()
+
+        handler = WSGIHandler()
+        factory = RequestFactory(
+            HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        deadline = time.perf_counter() + options["seconds"]
+        latencies = {"write": [], "read": []}
+        errors = []
+        lock = threading.Lock()
+
+        def worker(kind):
+            number = 0
+            while time.perf_counter() < deadline:
+                number += 1
+                if kind == "write":
+                    request = factory.post(
+                        "/todos/create/",
+                        {"title": f"Todo {number}"},
+                        content_type="application/json",
+                    )
+                else:
+                    request = factory.get("/todos/todolist/?page_size=20")
+                status = []
+                start = time.perf_counter()
+                response = handler(
+                    request.environ, lambda s, headers: status.append(int(s[:3]))
+                )
+                b"".join(response)
+                response.close()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if status[0] >= 400:
+                        errors.append(status[0])
+                    else:
+                        latencies[kind].append(elapsed)
+            connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker, args=("write",))
+            for _ in range(options["writers"])
+        ] + [
+            threading.Thread(target=worker, args=("read",))
+            for _ in range(options["readers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        def p99(values):
+            return statistics.quantiles(values, n=100)[-1] if len(values) > 1 else 0
+
+        return {
+            "writes": len(latencies["write"]),
+            "reads": len(latencies["read"]),
+            "write_p99": p99(latencies["write"]),
+            "read_p99": p99(latencies["read"]),
+            "errors": len(errors),
+        }
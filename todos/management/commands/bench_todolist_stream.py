@@ -0,0 +1,87 @@
+import datetime
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from todos.cache import get_cache
+from todos.models import TodoModel
+from todos.views import TodoListView
+from users.models import UserModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak Python memory and time-to-first-byte of the paginated and "
+        "streamed todo list for one user with --rows todos. Runs inside a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20_000)
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        with transaction.atomic():
+            user = UserModel.objects.create(name="Bench", email="bench@example.com")
+            now = timezone.now()
+            TodoModel.objects.bulk_create(
+                (
+                    TodoModel(
+                        title=f"Benchmark todo {i}",
+                        deadline=now + datetime.timedelta(minutes=i),
+                        user_id=user,
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=1000,
+            )
+            token = RefreshToken.for_user(user).access_token
+
+            self.stdout.write(
+                f"{'mode':<10} {'peak MiB':>10} {'TTFB ms':>10} "
+                f"{'total ms':>10} {'bytes':>12}"
+            )
+            with override_settings(
+                TODO_MAX_PAGE_SIZE=rows, TODO_STREAM_CHUNK_SIZE=options["chunk_size"]
+            ):
+                for mode, query in (
+                    ("paginated", f"?page_size={rows}"),
+                    ("streamed", "?stream=true"),
+                ):
+                    peak, ttfb, total, size = self.measure(query, token)
+                    self.stdout.write(
+                        f"{mode:<10} {peak / 2**20:>10.1f} {ttfb * 1000:>10.1f} "
+                        f"{total * 1000:>10.1f} {size:>12}"
+                    )
+            transaction.set_rollback(True)
+
+    def measure(self, query, token):
+        get_cache().clear()
+        view = TodoListView.as_view()
+        request = APIRequestFactory().get(
+            f"/todos/todolist/{query}", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = view(request)
+        if response.streaming:
+            chunks = iter(response.streaming_content)
+            size = len(next(chunks))
+            ttfb = time.perf_counter() - start
+            size += sum(len(chunk) for chunk in chunks)
+        else:
+            response.render()
+            ttfb = time.perf_counter() - start
+            size = len(response.content)
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak, ttfb, total, size
@@ -0,0 +1,24 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todos.sync import compact_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove the delta sync tombstones of todos deleted more than --days "
+        "ago on every todo database. Clients whose sync cursor is older start "
+        "over with a full sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=30)
+
+    def handle(self, *args, **options):
+        before = timezone.now() - datetime.timedelta(days=options["days"])
+        for alias in settings.TODO_SHARDS:
+            removed = compact_tombstones(alias, before)
+            self.stdout.write(f"{alias}: removed {removed} tombstones")
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todos.models import TodoShardModel
+from todos.shards import get_placement, hashed_shard, move_user
+from users.models import UserModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a user's todos to another shard while they stay readable, or "
+        "pin every user to their current shard with --pin-all."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Id of the user to move.")
+        parser.add_argument("--to", choices=settings.TODO_SHARDS, help="Target shard.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--pin-all",
+            action="store_true",
+            help=(
+                "Write a lookup row for every user placed by hash, so changing "
+                "TODO_SHARDS does not move them."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["pin_all"]:
+            self.pin_all()
+            return
+        if options["user"] is None or options["to"] is None:
+            raise CommandError("--user and --to are required unless --pin-all")
+
+        user_id = options["user"]
+        if not UserModel.objects.filter(pk=user_id).exists():
+            raise CommandError(f"User {user_id} does not exist")
+        source, moving = get_placement(user_id)
+        if moving:
+            raise CommandError(f"User {user_id} is already being moved")
+
+        rows = move_user(user_id, options["to"], chunk_size=options["chunk_size"])
+        self.stdout.write(f"User {user_id}: {source} -> {options['to']}, {rows} todos")
+
+    def pin_all(self):
+        pinned = set(TodoShardModel.objects.values_list("user_id", flat=True))
+        rows = [
+            TodoShardModel(user_id_id=user_id, alias=hashed_shard(user_id))
+            for user_id in UserModel.objects.values_list("pk", flat=True)
+            if user_id not in pinned
+        ]
+        TodoShardModel.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        self.stdout.write(f"Pinned {len(rows)} users")
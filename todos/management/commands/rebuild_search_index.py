@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from todos.search import rebuild_index, search_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the todo title search index where it is missing and rebuild it "
+        "from the todos table, on every todo database or on --database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            action="append",
+            choices=search_aliases(),
+            help="Only rebuild this database; may be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        for alias in options["database"] or search_aliases():
+            rebuild_index(alias)
+            self.stdout.write(f"{alias}: search index rebuilt")
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from todos.stats import reconcile
+from users.models import UserModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's todo counters and deadline buckets from their "
+        "todos, --batch-size users per transaction, and report any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drift, do not fix it.",
+        )
+
+    def handle(self, *args, **options):
+        users = UserModel.objects.order_by("pk").values_list("pk", flat=True)
+        checked = drifted = 0
+        last_id = 0
+        while True:
+            user_ids = list(users.filter(pk__gt=last_id)[: options["batch_size"]])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            checked += len(user_ids)
+            # Users being moved between shards have todos on both sides.
+            for alias in settings.TODO_SHARDS:
+                drift = reconcile(alias, user_ids, fix=not options["dry_run"])
+                for user_id, problems in drift.items():
+                    drifted += 1
+                    self.stdout.write(f"{alias} user {user_id}: {'; '.join(problems)}")
+
+        action = "found" if options["dry_run"] else "fixed"
+        self.stdout.write(f"Checked {checked} users, {action} drift in {drifted}")
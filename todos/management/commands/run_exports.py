@@ -0,0 +1,81 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from todos.exports import run_export
+from todos.models import TodoExportModel
+
+
+class Command(BaseCommand):
+    help = "Write queued TodoExportModel jobs to CSV/NDJSON files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=settings.TODO_EXPORT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new jobs instead of exiting when idle.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls when --loop is set.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.requeue_stale()
+            while self.run_next(options["chunk_size"]):
+                pass
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def requeue_stale(self):
+        """Queues the jobs of workers that died mid-export again."""
+        cutoff = timezone.now() - datetime.timedelta(
+            seconds=settings.TODO_EXPORT_STALE_SECONDS
+        )
+        requeued = TodoExportModel.objects.filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True),
+            status=TodoExportModel.RUNNING,
+        ).update(status=TodoExportModel.QUEUED)
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale export(s)")
+
+    def run_next(self, chunk_size):
+        export = (
+            TodoExportModel.objects.filter(status=TodoExportModel.QUEUED)
+            .order_by("created_at", "id")
+            .first()
+        )
+        if export is None:
+            return False
+
+        # Claiming is a conditional UPDATE, so concurrent workers never run
+        # the same job twice.
+        claimed = TodoExportModel.objects.filter(
+            pk=export.pk, status=TodoExportModel.QUEUED
+        ).update(status=TodoExportModel.RUNNING, heartbeat_at=timezone.now())
+        if not claimed:
+            return True
+
+        try:
+            run_export(export, chunk_size)
+        except Exception as e:
+            TodoExportModel.objects.filter(pk=export.pk).update(
+                status=TodoExportModel.FAILED,
+                error=f"{type(e).__name__}: {e}",
+                finished_at=timezone.now(),
+            )
+            self.stderr.write(f"Export {export.pk} failed: {e}")
+        else:
+            self.stdout.write(f"Export {export.pk}: {export.rows} row(s)")
+        return True
@@ -0,0 +1,179 @@
+import datetime
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+
+from todos import shards
+from todos.models import TodoModel
+from users.models import UserModel
+
+
+NAMES = [
+    "Ali", "Aziz", "Bobur", "Dilshod", "Jasur", "Laylo", "Madina", "Nodira",
+    "Otabek", "Sardor", "Shahzoda", "Umid", "Zarina", "Kamola", "Rustam",
+]  # fmt: skip
+SURNAMES = [
+    "Valiyev", "Karimov", "Toshmatov", "Rahimova", "Yusupov", "Aliyeva",
+    "Qodirov", "Ergasheva", "Nazarov", "Saidova", "Xolmatov", "Ismoilova",
+]  # fmt: skip
+WORDS = [
+    "buy", "call", "email", "fix", "write", "review", "plan", "book", "pay",
+    "clean", "read", "prepare", "send", "update", "meeting", "report",
+    "groceries", "invoice", "dentist", "tickets", "presentation", "bug",
+    "release", "taxes", "car", "birthday", "gift", "homework", "project",
+    "budget", "flight", "hotel", "doctor", "bank", "rent", "notes", "slides",
+    "kitob", "uy", "ish", "bozor", "hisobot", "dars", "vazifa", "uchrashuv",
+]  # fmt: skip
+
+
+# Fields written for every todo, in this order.
+TODO_FIELDS = [
+    "title",
+    "created_at",
+    "updated_at",
+    "deadline",
+    "is_finished",
+    "is_urgent",
+    "user_id",
+    "change_seq",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Create --users users with about --todos todos each, in chunks of "
+        "--chunk-size rows per transaction. Todo counts per user follow a "
+        "long-tailed (log-normal) distribution, creation dates lean towards "
+        "the recent past, and older todos are more often finished. The "
+        "search, stats and sync triggers run as for any other write."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--todos", type=int, default=100, help="Mean number of todos per user."
+        )
+        parser.add_argument("--chunk-size", type=int, default=20_000)
+        parser.add_argument(
+            "--days", type=int, default=365, help="How far back todos go."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        # Stored the way Django stores datetimes in SQLite: naive UTC.
+        self.now = timezone.now().astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        self.days = options["days"]
+        self.titles = [
+            " ".join(
+                self.random.choices(WORDS, k=self.random.randint(2, 6))
+            ).capitalize()
+            for _ in range(10_000)
+        ]
+        chunk_size = options["chunk_size"]
+        start = time.perf_counter()
+
+        user_ids = self.create_users(options["users"], chunk_size)
+        self.stdout.write(
+            f"Created {len(user_ids)} users in {time.perf_counter() - start:.1f}s"
+        )
+
+        # A log-normal with this mu has mean --todos.
+        mean = options["todos"]
+        sigma = 1.0
+        mu = math.log(max(mean, 1)) - sigma**2 / 2
+        buffers = {alias: [] for alias in settings.TODO_SHARDS}
+        created = 0
+        for user_id in user_ids:
+            count = round(self.random.lognormvariate(mu, sigma)) if mean else 0
+            # Fresh users have no pinned shard, so the hash decides.
+            alias = shards.hashed_shard(user_id) if shards.is_sharded() else "default"
+            buffer = buffers[alias]
+            buffer.extend(self.make_todo(user_id) for _ in range(count))
+            if len(buffer) >= chunk_size:
+                created += self.flush(alias, buffer)
+                self.report(created, start)
+        for alias, buffer in buffers.items():
+            created += self.flush(alias, buffer)
+        self.stdout.write("")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Created {created} todos in {elapsed:.1f}s "
+            f"({created / max(elapsed, 1e-9):.0f} rows/s)"
+        )
+
+    def report(self, created, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"  {created} todos, {created / max(elapsed, 1e-9):.0f} rows/s",
+            ending="\r",
+        )
+        self.stdout.flush()
+
+    def flush(self, alias, buffer):
+        """
+        Inserts the buffered rows with one executemany(). bulk_create()
+        prepares every field of every instance in Python, which caps it at a
+        few thousand rows a second; the rows here are already in the format
+        the database stores.
+        """
+        if not buffer:
+            return 0
+        meta = TodoModel._meta
+        columns = ", ".join(meta.get_field(name).column for name in TODO_FIELDS)
+        placeholders = ", ".join(["%s"] * len(TODO_FIELDS))
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {meta.db_table} ({columns}) VALUES ({placeholders})",
+                    buffer,
+                )
+        count = len(buffer)
+        buffer.clear()
+        return count
+
+    def create_users(self, count, chunk_size):
+        first = UserModel.objects.order_by("-pk").values_list("pk", flat=True).first()
+        offset = (first or 0) + 1
+        user_ids = []
+        for chunk_start in range(0, count, chunk_size):
+            users = [
+                UserModel(
+                    name=self.random.choice(NAMES),
+                    surname=self.random.choice(SURNAMES),
+                    age=self.random.randint(16, 70),
+                    email=f"seed{offset + number}@example.com",
+                    password="password1",
+                    otp="",
+                    is_active=self.random.random() < 0.9,
+                )
+                for number in range(chunk_start, min(chunk_start + chunk_size, count))
+            ]
+            with transaction.atomic():
+                user_ids.extend(
+                    user.pk for user in UserModel.objects.bulk_create(users)
+                )
+        return user_ids
+
+    def make_todo(self, user_id):
+        rand = self.random.random
+        # Squaring a uniform value puts more todos in the recent past.
+        created_at = self.now - datetime.timedelta(days=self.days * rand() ** 2)
+        updated_at = created_at + (self.now - created_at) * rand() ** 3
+        deadline = created_at + datetime.timedelta(days=self.random.expovariate(1 / 7))
+        return (
+            self.titles[int(rand() * len(self.titles))],
+            str(created_at),
+            str(updated_at),
+            str(deadline),
+            rand() < (0.8 if deadline < self.now else 0.2),
+            rand() < 0.15,
+            user_id,
+            0,
+        )
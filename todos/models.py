@@ -3,20 +3,210 @@ from django.db import models
 
 
 from users.models import UserModel
+from .shards import TodoManager
 
 
 class TodoModel(models.Model):
     title = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     deadline = models.DateTimeField(default=datetime.datetime.now)
     is_finished = models.BooleanField(default=False)
     is_urgent = models.BooleanField(default=False)
-    user_id = models.ForeignKey(UserModel, on_delete=models.CASCADE)
+    # No database constraint: with sharding the owner lives on another database.
+    user_id = models.ForeignKey(
+        UserModel, on_delete=models.CASCADE, db_constraint=False
+    )
+    # Position in the database's change clock, set by triggers (todos.sync).
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = TodoManager()
 
     class Meta:
         db_table = "todos"
         verbose_name = "Todo"
         verbose_name_plural = "Todolar"
+        indexes = [
+            models.Index(
+                fields=["user_id", "created_at", "id"], name="todos_user_created_idx"
+            ),
+            models.Index(
+                fields=["user_id", "deadline", "id"], name="todos_user_deadline_idx"
+            ),
+            models.Index(
+                fields=["user_id", "updated_at"], name="todos_user_updated_idx"
+            ),
+            models.Index(
+                fields=["user_id", "change_seq"], name="todos_user_change_idx"
+            ),
+            models.Index(
+                fields=["user_id", "is_finished", "deadline"],
+                name="todos_user_finished_idx",
+            ),
+            models.Index(
+                fields=["user_id", "is_urgent", "deadline"],
+                name="todos_user_urgent_idx",
+            ),
+            models.Index(
+                fields=["user_id", "is_finished", "is_urgent", "deadline"],
+                name="todos_user_fin_urgent_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class TodoExportModel(models.Model):
+    """A queued dump of one user's todos, written by `manage.py run_exports`."""
+
+    CSV = "csv"
+    NDJSON = "ndjson"
+    FORMAT_CHOICES = [(CSV, "CSV"), (NDJSON, "NDJSON")]
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    user_id = models.ForeignKey(UserModel, on_delete=models.CASCADE)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default=CSV)
+    gzip = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    file = models.CharField(max_length=255, blank=True, default="")
+    rows = models.PositiveIntegerField(default=0)
+    size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Refreshed by the worker while the job runs; a stale one means it died.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "todo_exports"
+        verbose_name = "Eksport"
+        verbose_name_plural = "Eksportlar"
+        indexes = [
+            models.Index(
+                fields=["status", "created_at"], name="todo_exports_queue_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.format} ({self.status})"
+
+
+class TodoShardModel(models.Model):
+    """Pins a user's todos to a shard; without a row a hash decides."""
+
+    user_id = models.OneToOneField(
+        UserModel, on_delete=models.CASCADE, primary_key=True
+    )
+    alias = models.CharField(max_length=64)
+    # Set by `manage.py rebalance_todos` while the final copy runs.
+    moving = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "todo_shards"
+        verbose_name = "Shard"
+        verbose_name_plural = "Shardlar"
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.alias}"
+
+
+class TodoStatsModel(models.Model):
+    """
+    A user's todo counters, kept by triggers on `todos` (see `todos.stats`)
+    on the database that holds the todos.
+    """
+
+    user_id = models.OneToOneField(
+        UserModel, on_delete=models.CASCADE, primary_key=True, db_constraint=False
+    )
+    total = models.IntegerField(default=0)
+    finished = models.IntegerField(default=0)
+    urgent = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "todo_stats"
+        verbose_name = "Statistika"
+        verbose_name_plural = "Statistikalar"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.total}"
+
+
+class TodoDeadlineBucketModel(models.Model):
+    """Number of a user's unfinished todos due on each (UTC) day."""
+
+    user_id = models.ForeignKey(
+        UserModel, on_delete=models.CASCADE, db_constraint=False
+    )
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "todo_deadline_buckets"
+        verbose_name = "Muddat kuni"
+        verbose_name_plural = "Muddat kunlari"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user_id", "day"], name="todo_deadline_buckets_user_day_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.count}"
+
+
+class TodoEventModel(models.Model):
+    """A committed todo write, kept for the change feed (see `todos.events`)."""
+
+    user_id = models.ForeignKey(
+        UserModel, on_delete=models.CASCADE, db_constraint=False
+    )
+    action = models.CharField(max_length=16)
+    ids = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = "todo_events"
+        verbose_name = "Hodisa"
+        verbose_name_plural = "Hodisalar"
+        indexes = [
+            models.Index(fields=["user_id", "id"], name="todo_events_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.action} {self.ids}"
+
+
+class TodoTombstoneModel(models.Model):
+    """A deleted todo, kept for delta sync until compacted (see `todos.sync`)."""
+
+    user_id = models.ForeignKey(
+        UserModel, on_delete=models.CASCADE, db_constraint=False
+    )
+    todo_id = models.BigIntegerField()
+    seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "todo_tombstones"
+        verbose_name = "O‘chirilgan todo"
+        verbose_name_plural = "O‘chirilgan todolar"
+        indexes = [
+            models.Index(fields=["user_id", "seq"], name="todo_tombstones_user_idx"),
+            models.Index(fields=["seq"], name="todo_tombstones_seq_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.todo_id} @{self.seq}"
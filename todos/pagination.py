@@ -0,0 +1,174 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a `(field, id)` key.
+
+    Pages are fetched with
+    `WHERE field >= ? AND (field > ? OR (field = ? AND id > ?)) ORDER BY field,
+    id LIMIT n`. The leading `field >= ?` lets the database seek into the
+    `(user_id, field)` index instead of walking it from the start, so every
+    page costs the same regardless of how deep the client has gone.
+    The cursor is an opaque base64 token carrying the ordering and the key of
+    the last row on the previous page.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering_query_param = "ordering"
+    orderings = ("created_at", "-created_at", "deadline", "-deadline")
+    default_ordering = "created_at"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        max_page_size = settings.TODO_MAX_PAGE_SIZE
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return min(settings.TODO_PAGE_SIZE, max_page_size)
+        try:
+            page_size = int(value)
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "Must be an integer"})
+        if page_size < 1:
+            raise ValidationError({self.page_size_query_param: "Must be positive"})
+        return min(page_size, max_page_size)
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(
+            self.ordering_query_param, self.default_ordering
+        )
+        if ordering not in self.orderings:
+            raise ValidationError(
+                {self.ordering_query_param: f"Must be one of {list(self.orderings)}"}
+            )
+        return ordering
+
+    def encode_cursor(self, ordering, value, pk):
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        raw = json.dumps([ordering, value, pk], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor, ordering):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            cursor_ordering, value, pk = json.loads(base64.urlsafe_b64decode(padded))
+            value = self.parse_cursor_value(value)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor_ordering != ordering:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def parse_cursor_value(self, value):
+        return datetime.datetime.fromisoformat(value)
+
+    def order_queryset(self, queryset, ordering):
+        field = ordering.lstrip("-")
+        if ordering.startswith("-"):
+            return queryset.order_by(f"-{field}", "-id")
+        return queryset.order_by(field, "id")
+
+    def page_queryset(self, queryset, request):
+        """The queryset of the requested page, with one extra row."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+
+        field = self.ordering.lstrip("-")
+        descending = self.ordering.startswith("-")
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor, self.ordering)
+            lookup = "lt" if descending else "gt"
+            # The OR alone cannot be used as an index range; the bound can.
+            queryset = queryset.filter(
+                Q(**{f"{field}__{lookup}e": value}),
+                Q(**{f"{field}__{lookup}": value})
+                | Q(**{field: value, f"id__{lookup}": pk}),
+            )
+
+        queryset = self.order_queryset(queryset, self.ordering)
+
+        # One extra row tells us whether there is a next page without a COUNT.
+        return queryset[: self.page_size + 1]
+
+    def finish_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        page = rows[: self.page_size]
+
+        self.next_cursor = None
+        if self.has_next:
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(
+                self.ordering, getattr(last, self.ordering.lstrip("-")), last.id
+            )
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        rows = self.page_queryset(queryset, request)
+        return self.finish_page([row async for row in rows])
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data, **extra):
+        return {
+            "next": self.get_next_link(),
+            **extra,
+            "results": data,
+        }
+
+    def get_paginated_response(self, data, **extra):
+        return Response(self.get_paginated_data(data, **extra))
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Keyset pagination of a `todos.search.TodoSearch` over its `(rank, id)`
+    key, best matches first.
+    """
+
+    orderings = ("rank",)
+    default_ordering = "rank"
+
+    def parse_cursor_value(self, value):
+        return float(value)
+
+    def paginate_queryset(self, search, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.default_ordering
+
+        after = None
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            after = self.decode_cursor(cursor, self.ordering)
+
+        rows = search.page(after, self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        page = rows[: self.page_size]
+
+        self.next_cursor = None
+        if self.has_next:
+            pk, rank = page[-1]
+            self.next_cursor = self.encode_cursor(self.ordering, rank, pk)
+        return page
@@ -0,0 +1,126 @@
+"""
+Full-text search over todo titles with an SQLite FTS5 index.
+
+`todos_fts` is an external-content FTS5 table: it stores only the index, and
+reads titles from the `todos_fts_source` view over `todos`. Triggers on
+`todos` keep it in sync, so every write path (the ORM, `queryset.update()`,
+raw SQL, shard moves) is covered. The owner is indexed as an extra `owner`
+column holding a `u<user_id>` token, which lets FTS5 itself restrict matches
+to one user instead of filtering every user's matches afterwards.
+
+The schema is created on each todo database by `post_migrate`; `manage.py
+rebuild_search_index` creates it on existing databases and rebuilds it.
+"""
+
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+
+FTS_TABLE = "todos_fts"
+SOURCE_VIEW = "todos_fts_source"
+
+# `title` is ranked, `owner` only narrows the match.
+RANK = f"bm25({FTS_TABLE}, 1.0, 0.0)"
+
+TERM_RE = re.compile(r"\w+")
+
+
+def schema():
+    table = apps.get_model("todos", "TodoModel")._meta.db_table
+    row = "'u' || {0}.user_id_id"
+    insert = (
+        f"INSERT INTO {FTS_TABLE} (rowid, title, owner) "
+        f"VALUES (new.id, new.title, {row.format('new')});"
+    )
+    delete = (
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, owner) "
+        f"VALUES ('delete', old.id, old.title, {row.format('old')});"
+    )
+    return [
+        f"CREATE VIEW IF NOT EXISTS {SOURCE_VIEW} AS "
+        f"SELECT id, title, 'u' || user_id_id AS owner FROM {table}",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"title, owner, content='{SOURCE_VIEW}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert "
+        f"AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete "
+        f"AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update "
+        f"AFTER UPDATE OF title, user_id_id ON {table} "
+        f"WHEN old.title IS NOT new.title OR old.user_id_id IS NOT new.user_id_id "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def create_index(alias):
+    """Creates the FTS table, its source view and the triggers on `alias`."""
+    connection = connections[alias]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in schema():
+            cursor.execute(statement)
+
+
+def rebuild_index(alias):
+    """Re-reads every title into the index and merges its segments."""
+    create_index(alias)
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+def search_aliases():
+    return [
+        alias for alias in settings.TODO_SHARDS if connections[alias].vendor == "sqlite"
+    ]
+
+
+def build_match(user_id, query):
+    """
+    Turns free text into an FTS5 query: every word must prefix-match a word
+    of the title. Words are quoted, so the text cannot inject FTS5 syntax.
+    Returns None when the text has no words.
+    """
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return None
+    words = " AND ".join(f'title:"{term}"*' for term in terms)
+    return f'owner:"u{user_id}" AND {words}'
+
+
+class TodoSearch:
+    """
+    Ranked matches of one user's todos on `alias`, read a page at a time by
+    `SearchPagination` with a keyset on `(rank, id)`.
+    """
+
+    def __init__(self, user_id, query, alias):
+        self.user_id = user_id
+        self.match = build_match(user_id, query)
+        self.alias = alias
+
+    def page(self, after, limit):
+        """Returns up to `limit` `(id, rank)` pairs after the `(rank, id)` key."""
+        # No join back to `todos`: the owner token already scopes the match,
+        # and the callers read the rows through `for_user()`.
+        sql = (
+            f"SELECT rowid, rank FROM ("
+            f"SELECT rowid, {RANK} AS rank FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s)"
+        )
+        params = [self.match]
+        if after is not None:
+            # The leading bound lets the rows before the cursor be dropped
+            # on `rank` alone, without evaluating the OR.
+            sql += " WHERE rank >= %s AND (rank > %s OR (rank = %s AND rowid > %s))"
+            params += [after[0], after[0], after[0], after[1]]
+        sql += " ORDER BY rank, rowid LIMIT %s"
+        params.append(limit)
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
@@ -1,7 +1,20 @@
-from rest_framework.serializers import ModelSerializer
+from django.conf import settings
+from django.db import transaction
+from rest_framework.serializers import (
+    BooleanField,
+    CharField,
+    DateTimeField,
+    IntegerField,
+    ListField,
+    ListSerializer,
+    ModelSerializer,
+    Serializer,
+    ValidationError,
+)
 
 
-from .models import TodoModel
+from .models import TodoModel, TodoExportModel
+from .search import TERM_RE
 from users.serializers import UserProfileSerializer
 
 
@@ -13,23 +26,138 @@ class TodoModelSerializer(ModelSerializer):
         fields = ["id", "title", "created_at", "deadline", "user_id"]
 
 
+class TodoCompactSerializer(ModelSerializer):
+    class Meta:
+        model = TodoModel
+        fields = ["id", "title", "created_at", "deadline"]
+
+
 class TodoRertrieveSerializer(ModelSerializer):
     class Meta:
         model = TodoModel
-        fields = "__all__"
+        exclude = ["change_seq"]
+
+
+class TodoBulkCreateListSerializer(ListSerializer):
+    def create(self, validated_data):
+        user = self.context["request"].user
+        todos = [TodoModel(user_id=user, **item) for item in validated_data]
+        queryset = TodoModel.objects.for_user(user.id)
+        with transaction.atomic(using=queryset.db):
+            queryset.bulk_create(todos, batch_size=settings.TODO_BULK_CREATE_BATCH_SIZE)
+        return todos
 
 
 class TodoCreateSerizalizer(ModelSerializer):
     class Meta:
         model = TodoModel
         fields = ["title", "deadline", "is_urgent"]
+        list_serializer_class = TodoBulkCreateListSerializer
 
     def create(self, validated_data):
         user = self.context["request"].user
-        return TodoModel.objects.create(user_id=user, **validated_data)
+        return TodoModel.objects.for_user(user.id).create(
+            user_id=user, **validated_data
+        )
 
 
 class TodoEditSerializer(ModelSerializer):
     class Meta:
         model = TodoModel
         fields = ["title", "deadline"]
+
+
+class TodoFilterSerializer(Serializer):
+    is_finished = BooleanField(required=False)
+    is_urgent = BooleanField(required=False)
+    deadline_after = DateTimeField(required=False)
+    deadline_before = DateTimeField(required=False)
+
+    def filter_queryset(self, queryset):
+        data = self.validated_data
+        # `__in` instead of `=`: Django renders a boolean `=` as a bare column
+        # test, which SQLite cannot match against the composite indexes.
+        if "is_finished" in data:
+            queryset = queryset.filter(is_finished__in=[data["is_finished"]])
+        if "is_urgent" in data:
+            queryset = queryset.filter(is_urgent__in=[data["is_urgent"]])
+        if "deadline_after" in data:
+            queryset = queryset.filter(deadline__gte=data["deadline_after"])
+        if "deadline_before" in data:
+            queryset = queryset.filter(deadline__lt=data["deadline_before"])
+        return queryset
+
+
+class TodoSearchSerializer(Serializer):
+    q = CharField(max_length=200)
+
+    def validate_q(self, value):
+        if not TERM_RE.search(value):
+            raise ValidationError("Must contain at least one word")
+        return value
+
+
+class TodoBulkActionSerializer(TodoFilterSerializer):
+    """Selects todos either by an explicit `ids` list or by filter fields."""
+
+    ids = ListField(child=IntegerField(), required=False, allow_empty=False)
+    selectors = ("ids", "is_finished", "is_urgent", "deadline_after", "deadline_before")
+
+    def validate_ids(self, value):
+        if len(value) > settings.TODO_BULK_MAX_ITEMS:
+            raise ValidationError(
+                f"Ensure this field has no more than "
+                f"{settings.TODO_BULK_MAX_ITEMS} elements."
+            )
+        return value
+
+    def validate(self, attrs):
+        if not any(field in attrs for field in self.selectors):
+            raise ValidationError("Either `ids` or at least one filter is required")
+        return attrs
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if "ids" in self.validated_data:
+            queryset = queryset.filter(pk__in=self.validated_data["ids"])
+        return queryset
+
+
+class TodoBulkEditSerializer(TodoBulkActionSerializer):
+    title = CharField(required=False)
+    deadline = DateTimeField(required=False)
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if "title" not in attrs and "deadline" not in attrs:
+            raise ValidationError("Either `title` or `deadline` is required")
+        return attrs
+
+    def get_changes(self):
+        return {
+            field: self.validated_data[field]
+            for field in ("title", "deadline")
+            if field in self.validated_data
+        }
+
+
+class TodoExportCreateSerializer(ModelSerializer):
+    class Meta:
+        model = TodoExportModel
+        fields = ["format", "gzip"]
+
+
+class TodoExportSerializer(ModelSerializer):
+    class Meta:
+        model = TodoExportModel
+        fields = [
+            "id",
+            "format",
+            "gzip",
+            "status",
+            "rows",
+            "size",
+            "error",
+            "created_at",
+            "finished_at",
+        ]
@@ -0,0 +1,298 @@
+"""
+Horizontal sharding of todos by owner.
+
+`settings.TODO_SHARDS` lists the database aliases that hold todos; "default"
+is always shard 0 and also keeps everything else (users, exports, the
+`todo_shards` lookup table). A user's todos live on one shard: the one in
+their `todo_shards` row if they have one, otherwise the one picked by a
+stable hash of their id.
+
+Queries reach the owning shard through `TodoModel.objects.for_user()`, and
+writes made through it re-check ownership inside their own transaction so a
+concurrent `manage.py rebalance_todos` can never lose them.
+"""
+
+import contextlib
+import datetime
+import zlib
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+
+# Each shard allocates todo ids from its own range, so rows keep their ids
+# when a user is moved to another shard.
+ID_RANGE_BITS = 40
+
+
+class ShardMoving(APIException):
+    status_code = 503
+    default_detail = "Todos are being moved between databases, retry shortly."
+    default_code = "shard_moving"
+
+
+def is_sharded():
+    return len(settings.TODO_SHARDS) > 1
+
+
+def hashed_shard(user_id):
+    shards = settings.TODO_SHARDS
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def get_placement(user_id):
+    """Returns `(alias, moving)` for the user's todos."""
+    if not is_sharded():
+        return "default", False
+    lookup = apps.get_model("todos", "TodoShardModel")
+    row = (
+        lookup.objects.using("default")
+        .filter(user_id=user_id)
+        .values_list("alias", "moving")
+        .first()
+    )
+    return row or (hashed_shard(user_id), False)
+
+
+async def aget_placement(user_id):
+    if not is_sharded():
+        return "default", False
+    lookup = apps.get_model("todos", "TodoShardModel")
+    row = await (
+        lookup.objects.using("default")
+        .filter(user_id=user_id)
+        .values_list("alias", "moving")
+        .afirst()
+    )
+    return row or (hashed_shard(user_id), False)
+
+
+def shard_for(user_id):
+    return get_placement(user_id)[0]
+
+
+def check_shard(user_id, alias):
+    alias_now, moving = get_placement(user_id)
+    if moving or alias_now != alias:
+        raise ShardMoving()
+
+
+@contextlib.contextmanager
+def guard(user_id, alias):
+    """
+    Runs a write to `user_id`'s todos on `alias` and verifies afterwards,
+    still inside the transaction, that the user was not being moved. The
+    write holds the shard's write lock by then, which is what the final
+    phase of `move_user()` waits on.
+    """
+    with transaction.atomic(using=alias):
+        yield
+        check_shard(user_id, alias)
+
+
+class TodoQuerySet(models.QuerySet):
+    def guarded(self):
+        user_id = self._hints.get("user_id")
+        if user_id is None or not is_sharded():
+            return contextlib.nullcontext()
+        return guard(user_id, self.db)
+
+    def create(self, **kwargs):
+        with self.guarded():
+            return super().create(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with self.guarded():
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def update(self, **kwargs):
+        with self.guarded():
+            return super().update(**kwargs)
+
+    def delete(self):
+        with self.guarded():
+            return super().delete()
+
+
+class TodoManager(models.Manager.from_queryset(TodoQuerySet)):
+    def for_user(self, user_id):
+        """The user's todos, on the shard that owns them."""
+        user_id = getattr(user_id, "pk", user_id)
+        # Without sharding the routers still decide (e.g. read replicas).
+        using = shard_for(user_id) if is_sharded() else None
+        return self.db_manager(using, hints={"user_id": user_id}).filter(
+            user_id=user_id
+        )
+
+    async def afor_user(self, user_id):
+        """`for_user()` for async views, without a blocking shard lookup."""
+        user_id = getattr(user_id, "pk", user_id)
+        using = (await aget_placement(user_id))[0] if is_sharded() else None
+        return self.db_manager(using, hints={"user_id": user_id}).filter(
+            user_id=user_id
+        )
+
+
+class TodoShardRouter:
+    """
+    Sends todo queries that know their owner (through `for_user()` or an
+    instance hint) to the owner's shard, and the lookup table to "default".
+    """
+
+    def route(self, model, hints):
+        label = model._meta.label
+        if label == "todos.TodoShardModel":
+            return "default"
+        if label != "todos.TodoModel" or not is_sharded():
+            return None
+        user_id = hints.get("user_id")
+        instance = hints.get("instance")
+        if user_id is None and instance is not None:
+            if instance._meta.label == "todos.TodoModel":
+                user_id = instance.user_id_id
+            else:
+                # A related manager or assignment from the owning user.
+                user_id = instance.pk
+        return None if user_id is None else shard_for(user_id)
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints)
+
+
+def reserve_id_range(alias):
+    """Starts the todo id sequence of shard `n` at `n << ID_RANGE_BITS`."""
+    if alias not in settings.TODO_SHARDS:
+        return
+    start = settings.TODO_SHARDS.index(alias) << ID_RANGE_BITS
+    if not start:
+        return
+    table = apps.get_model("todos", "TodoModel")._meta.db_table
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s",
+            [start, table],
+        )
+        if not cursor.rowcount:
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                [table, start],
+            )
+
+
+def copy_rows(queryset, target, chunk_size):
+    """
+    Upserts the rows of `queryset` into the same table on `target`, keyset
+    chunk by chunk. Goes through SQL rather than `bulk_create()` so that
+    `created_at`/`updated_at` are copied instead of being reset to now.
+    """
+    model = queryset.model
+    fields = model._meta.concrete_fields
+    columns = [field.column for field in fields]
+    table = model._meta.db_table
+    connection = connections[target]
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({}) ON CONFLICT ({}) DO UPDATE SET {}".format(
+        quote(table),
+        ", ".join(map(quote, columns)),
+        ", ".join(["%s"] * len(columns)),
+        quote(model._meta.pk.column),
+        ", ".join(f"{quote(c)} = excluded.{quote(c)}" for c in columns),
+    )
+
+    copied = 0
+    last_id = 0
+    queryset = queryset.order_by("pk").values_list(*[f.attname for f in fields])
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_id)[:chunk_size])
+        if not chunk:
+            return copied
+        params = [
+            [
+                field.get_db_prep_save(value, connection=connection)
+                for field, value in zip(fields, row)
+            ]
+            for row in chunk
+        ]
+        with transaction.atomic(using=target), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        copied += len(chunk)
+        last_id = chunk[-1][0]
+
+
+def lock_for_writes(alias):
+    """Takes `alias`'s write lock for the rest of the current transaction."""
+    table = apps.get_model("todos", "TodoModel")._meta.db_table
+    with connections[alias].cursor() as cursor:
+        # Matches nothing, but any UPDATE takes SQLite's write lock.
+        cursor.execute(
+            f"UPDATE {connections[alias].ops.quote_name(table)} SET id = id WHERE 0"
+        )
+
+
+def move_user(user_id, target, chunk_size=1000, catch_up_passes=5, margin=1):
+    """
+    Moves `user_id`'s todos to the `target` shard while they stay readable.
+
+    1. Copies every row while the user keeps writing to the source.
+    2. Copies rows changed since (by `updated_at`, minus `margin` seconds
+       for clock skew) until a pass is smaller than a chunk.
+    3. Marks the user as moving, so their writes fail with `ShardMoving`;
+       takes the source's write lock, which waits out writes already past
+       their check; copies the last changes and deletions; points the
+       lookup at the target and removes the rows from the source.
+
+    Returns the number of rows the user has on the target.
+    """
+    todo_model = apps.get_model("todos", "TodoModel")
+    lookup = apps.get_model("todos", "TodoShardModel")
+    source = shard_for(user_id)
+    if source == target:
+        return todo_model.objects.using(target).filter(user_id=user_id).count()
+
+    rows = todo_model.objects.using(source).filter(user_id=user_id)
+    overlap = datetime.timedelta(seconds=margin)
+    since = timezone.now()
+    copy_rows(rows, target, chunk_size)
+    for _ in range(catch_up_passes):
+        mark = timezone.now()
+        copied = copy_rows(
+            rows.filter(updated_at__gte=since - overlap),
+            target,
+            chunk_size,
+        )
+        since = mark
+        if copied < chunk_size:
+            break
+
+    lookup.objects.update_or_create(
+        user_id_id=user_id, defaults={"alias": source, "moving": True}
+    )
+    try:
+        with transaction.atomic(using=source):
+            lock_for_writes(source)
+            copy_rows(
+                rows.filter(updated_at__gte=since - overlap),
+                target,
+                chunk_size,
+            )
+            kept = set(rows.values_list("pk", flat=True))
+            target_rows = todo_model.objects.using(target).filter(user_id=user_id)
+            removed = [
+                pk for pk in target_rows.values_list("pk", flat=True) if pk not in kept
+            ]
+            for start in range(0, len(removed), chunk_size):
+                target_rows.filter(pk__in=removed[start : start + chunk_size]).delete()
+            lookup.objects.filter(user_id=user_id).update(alias=target, moving=False)
+            rows.delete()
+    except BaseException:
+        lookup.objects.filter(user_id=user_id, moving=True).update(
+            alias=source, moving=False
+        )
+        raise
+    return len(kept)
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_migrate, pre_delete
+from django.dispatch import Signal, receiver
+
+
+from config import replicas
+from users.models import UserModel
+from .models import TodoModel
+from . import cache, events, search, shards, stats, sync
+
+
+# Sent once a write to a user's todos has been committed.
+# Arguments: user_id, action ("create", "finish", "edit" or "delete"), ids.
+todos_changed = Signal()
+
+
+def send_todos_changed(user_id, action, ids, using=None):
+    """
+    Announces a write to `user_id`'s todos once the current transaction commits.
+
+    Set-based writes (`update()`, `bulk_create()`, fast `delete()`) fire no
+    model signals, so every write path calls this explicitly instead. `using`
+    is the database the write went to (the user's shard).
+    """
+    ids = list(ids)
+    transaction.on_commit(
+        lambda: todos_changed.send(
+            sender=TodoModel, user_id=user_id, action=action, ids=ids
+        ),
+        using=using,
+    )
+
+
+@receiver(todos_changed)
+def invalidate_cached_responses(sender, user_id, **kwargs):
+    cache.bump_version(user_id)
+
+
+@receiver(todos_changed)
+def stick_to_primary(sender, user_id, **kwargs):
+    replicas.mark_sticky(user_id)
+
+
+@receiver(todos_changed)
+def publish_todo_event(sender, user_id, action, ids, **kwargs):
+    events.get_broker().publish(user_id, action, ids)
+
+
+@receiver(post_migrate)
+def reserve_shard_id_range(sender, using, **kwargs):
+    if sender.label == "todos":
+        shards.reserve_id_range(using)
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    if sender.label == "todos" and using in settings.TODO_SHARDS:
+        search.create_index(using)
+
+
+@receiver(post_migrate)
+def create_stats_triggers(sender, using, **kwargs):
+    if sender.label == "todos" and using in settings.TODO_SHARDS:
+        stats.create_triggers(using)
+
+
+@receiver(post_migrate)
+def create_sync_triggers(sender, using, **kwargs):
+    if sender.label == "todos" and using in settings.TODO_SHARDS:
+        sync.create_triggers(using)
+
+
+@receiver(pre_delete, sender=UserModel)
+def delete_sharded_todos(sender, instance, **kwargs):
+    # The ORM cascade only reaches the user's own database.
+    if shards.is_sharded():
+        TodoModel.objects.for_user(instance.pk).delete()
@@ -0,0 +1,182 @@
+"""
+Per-user todo counters maintained incrementally.
+
+Triggers on `todos` update `todo_stats` (total, finished, urgent) and
+`todo_deadline_buckets` (unfinished todos per deadline day) in the same
+statement as the write, so every write path, including `queryset.update()`,
+the admin, imports and shard moves, keeps them exact without extra queries
+in the views.
+
+Overdue todos are not counted by the triggers because they change with time
+alone. `get_stats()` sums the buckets of the days before today and counts
+today's overdue todos through the `(user_id, is_finished, deadline)` index.
+
+`manage.py reconcile_todo_stats` recomputes the counters and reports drift.
+"""
+
+import datetime
+
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def schema():
+    todos = apps.get_model("todos", "TodoModel")._meta.db_table
+    stats = apps.get_model("todos", "TodoStatsModel")._meta.db_table
+    buckets = apps.get_model("todos", "TodoDeadlineBucketModel")._meta.db_table
+
+    def add(row):
+        return (
+            f"INSERT INTO {stats} (user_id_id, total, finished, urgent) "
+            f"VALUES ({row}.user_id_id, 1, {row}.is_finished, {row}.is_urgent) "
+            f"ON CONFLICT (user_id_id) DO UPDATE SET total = total + 1, "
+            f"finished = finished + excluded.finished, "
+            f"urgent = urgent + excluded.urgent; "
+            f"INSERT INTO {buckets} (user_id_id, day, count) "
+            f"SELECT {row}.user_id_id, date({row}.deadline), 1 "
+            f"WHERE NOT {row}.is_finished "
+            f"ON CONFLICT (user_id_id, day) DO UPDATE SET count = count + 1;"
+        )
+
+    def remove(row):
+        bucket = f"user_id_id = {row}.user_id_id AND day = date({row}.deadline)"
+        return (
+            f"UPDATE {stats} SET total = total - 1, "
+            f"finished = finished - {row}.is_finished, "
+            f"urgent = urgent - {row}.is_urgent "
+            f"WHERE user_id_id = {row}.user_id_id; "
+            f"UPDATE {buckets} SET count = count - 1 "
+            f"WHERE {bucket} AND NOT {row}.is_finished; "
+            f"DELETE FROM {buckets} WHERE {bucket} AND count <= 0;"
+        )
+
+    changed = " OR ".join(
+        f"old.{column} IS NOT new.{column}"
+        for column in ("user_id_id", "is_finished", "is_urgent", "deadline")
+    )
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS todo_stats_insert "
+        f"AFTER INSERT ON {todos} BEGIN {add('new')} END",
+        f"CREATE TRIGGER IF NOT EXISTS todo_stats_delete "
+        f"AFTER DELETE ON {todos} BEGIN {remove('old')} END",
+        f"CREATE TRIGGER IF NOT EXISTS todo_stats_update "
+        f"AFTER UPDATE OF user_id_id, is_finished, is_urgent, deadline ON {todos} "
+        f"WHEN {changed} BEGIN {remove('old')} {add('new')} END",
+    ]
+
+
+def create_triggers(alias):
+    connection = connections[alias]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in schema():
+            cursor.execute(statement)
+
+
+def get_stats(user_id):
+    """Returns the user's total, finished, urgent and overdue todo counts."""
+    todo_model = apps.get_model("todos", "TodoModel")
+    stats_model = apps.get_model("todos", "TodoStatsModel")
+    bucket_model = apps.get_model("todos", "TodoDeadlineBucketModel")
+
+    todos = todo_model.objects.for_user(user_id)
+    alias = todos.db
+    row = (
+        stats_model.objects.using(alias)
+        .filter(user_id=user_id)
+        .values_list("total", "finished", "urgent")
+        .first()
+    )
+    total, finished, urgent = row or (0, 0, 0)
+
+    # Buckets are UTC days, like the deadlines stored by SQLite.
+    now = timezone.now()
+    today = datetime.datetime.combine(
+        now.astimezone(datetime.timezone.utc).date(),
+        datetime.time(),
+        tzinfo=datetime.timezone.utc,
+    )
+    before_today = (
+        bucket_model.objects.using(alias)
+        .filter(user_id=user_id, day__lt=today.date())
+        .aggregate(overdue=Sum("count"))["overdue"]
+    )
+    overdue_today = todos.filter(
+        is_finished__in=[False], deadline__gte=today, deadline__lt=now
+    ).count()
+    return {
+        "total": total,
+        "finished": finished,
+        "urgent": urgent,
+        "overdue": (before_today or 0) + overdue_today,
+    }
+
+
+def reconcile(alias, user_ids, fix=True):
+    """
+    Recomputes the counters of `user_ids` on `alias` from their todos and
+    returns `{user_id: [description, ...]}` for the users that drifted.
+
+    Runs in one transaction per call, so concurrent writes cannot slip in
+    between the count and the fix.
+    """
+    todo_model = apps.get_model("todos", "TodoModel")
+    stats_model = apps.get_model("todos", "TodoStatsModel")
+    bucket_model = apps.get_model("todos", "TodoDeadlineBucketModel")
+    fields = ("total", "finished", "urgent")
+    drift = {}
+
+    with transaction.atomic(using=alias):
+        todos = todo_model.objects.using(alias).filter(user_id__in=user_ids)
+        actual = {
+            row["user_id"]: tuple(row[field] for field in fields)
+            for row in todos.values("user_id").annotate(
+                total=Count("id"),
+                finished=Count("id", filter=Q(is_finished=True)),
+                urgent=Count("id", filter=Q(is_urgent=True)),
+            )
+        }
+        stored = {
+            row[0]: tuple(row[1:])
+            for row in stats_model.objects.using(alias)
+            .filter(user_id__in=user_ids)
+            .values_list("user_id", *fields)
+        }
+
+        actual_days = {}
+        days = (
+            todos.filter(is_finished__in=[False])
+            .annotate(day=TruncDate("deadline", tzinfo=datetime.timezone.utc))
+            .values_list("user_id", "day")
+            .annotate(count=Count("id"))
+        )
+        for user_id, day, count in days:
+            actual_days.setdefault(user_id, {})[day] = count
+        stored_days = {}
+        buckets = bucket_model.objects.using(alias).filter(user_id__in=user_ids)
+        for user_id, day, count in buckets.values_list("user_id", "day", "count"):
+            stored_days.setdefault(user_id, {})[day] = count
+
+        for user_id in user_ids:
+            counts = actual.get(user_id, (0, 0, 0))
+            if stored.get(user_id, (0, 0, 0)) != counts:
+                drift.setdefault(user_id, []).append(
+                    f"counters {stored.get(user_id)} != {counts}"
+                )
+                if fix:
+                    stats_model.objects.using(alias).update_or_create(
+                        user_id_id=user_id, defaults=dict(zip(fields, counts))
+                    )
+            if stored_days.get(user_id, {}) != actual_days.get(user_id, {}):
+                drift.setdefault(user_id, []).append("deadline buckets")
+                if fix:
+                    buckets.filter(user_id=user_id).delete()
+                    bucket_model.objects.using(alias).bulk_create(
+                        bucket_model(user_id_id=user_id, day=day, count=count)
+                        for day, count in actual_days.get(user_id, {}).items()
+                    )
+    return drift
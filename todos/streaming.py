@@ -0,0 +1,70 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class JSONArrayStream:
+    """
+    Serializes a queryset into a JSON document one chunk of rows at a time.
+
+    Rows are read with `.iterator(chunk_size=...)` and each chunk is rendered
+    with DRF's JSONRenderer, so the bytes match the non-streaming response
+    while peak memory is bounded by the chunk size instead of the row count.
+    The array is emitted as the `results` member of `envelope`.
+    """
+
+    def __init__(self, queryset, serializer_class, chunk_size, envelope=None):
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.chunk_size = chunk_size
+        self.envelope = envelope or {}
+        self.renderer = JSONRenderer()
+
+    def render_chunk(self, rows):
+        data = self.serializer_class(rows, many=True).data
+        return self.renderer.render(data)[1:-1]
+
+    def __iter__(self):
+        # `{..., "results": []}` is split between its brackets.
+        document = self.renderer.render({**self.envelope, "results": []})
+        yield document[:-2]
+
+        separator = b""
+        rows = []
+        for row in self.queryset.iterator(chunk_size=self.chunk_size):
+            rows.append(row)
+            if len(rows) == self.chunk_size:
+                yield separator + self.render_chunk(rows)
+                separator = b","
+                rows = []
+        if rows:
+            yield separator + self.render_chunk(rows)
+        yield document[-2:]
+
+
+class AsyncJSONArrayStream:
+    """
+    `JSONArrayStream` for async views. Rows are read with `.aiterator()`, so
+    an ASGI server sends each chunk as it is rendered; given a sync iterator,
+    Django would read all of it before sending anything.
+    """
+
+    def __init__(self, queryset, serializer_class, chunk_size, envelope=None):
+        self.stream = JSONArrayStream(
+            queryset, serializer_class, chunk_size, envelope=envelope
+        )
+
+    async def __aiter__(self):
+        stream = self.stream
+        document = stream.renderer.render({**stream.envelope, "results": []})
+        yield document[:-2]
+
+        separator = b""
+        rows = []
+        async for row in stream.queryset.aiterator(chunk_size=stream.chunk_size):
+            rows.append(row)
+            if len(rows) == stream.chunk_size:
+                yield separator + stream.render_chunk(rows)
+                separator = b","
+                rows = []
+        if rows:
+            yield separator + stream.render_chunk(rows)
+        yield document[-2:]
@@ -0,0 +1,185 @@
+"""
+Delta sync for offline clients.
+
+Every todo database keeps a change clock in `todo_sync_clock`. Triggers on
+`todos` advance it on every insert and update and stamp the row's
+`change_seq` with the new value; deletes leave a tombstone in
+`todo_tombstones` stamped the same way. SQLite runs one write transaction
+at a time, so sequence numbers become visible in increasing order and a
+reader can never see a change below one it has already seen.
+
+"What changed for this user since N" is then two range scans, over the
+`(user_id, change_seq)` index of `todos` and the `(user_id, seq)` index of
+`todo_tombstones`, and costs in proportion to the number of changes.
+
+Sync cursors carry the user's shard with the sequence number, since clocks
+are per database. A cursor from another shard, or older than the tombstones
+removed by `manage.py compact_tombstones`, makes the client start over.
+"""
+
+import base64
+import json
+
+from django.apps import apps
+from django.db import connections, transaction
+from rest_framework.exceptions import NotFound
+
+from .shards import shard_for
+
+
+CLOCK_TABLE = "todo_sync_clock"
+
+invalid_cursor_message = "Invalid cursor"
+
+
+def schema():
+    todos = apps.get_model("todos", "TodoModel")._meta.db_table
+    tombstones = apps.get_model("todos", "TodoTombstoneModel")._meta.db_table
+    tick = f"UPDATE {CLOCK_TABLE} SET seq = seq + 1 WHERE id = 1;"
+    now = f"(SELECT seq FROM {CLOCK_TABLE} WHERE id = 1)"
+    stamp = f"UPDATE {todos} SET change_seq = {now} WHERE id = new.id;"
+    return [
+        f"CREATE TABLE IF NOT EXISTS {CLOCK_TABLE} ("
+        f"id INTEGER PRIMARY KEY CHECK (id = 1), "
+        f"seq INTEGER NOT NULL, "
+        # Tombstones up to here have been removed.
+        f"compacted INTEGER NOT NULL)",
+        f"INSERT OR IGNORE INTO {CLOCK_TABLE} (id, seq, compacted) VALUES (1, 0, 0)",
+        f"CREATE TRIGGER IF NOT EXISTS todo_sync_insert "
+        f"AFTER INSERT ON {todos} BEGIN {tick} {stamp} END",
+        # The stamping update is the only one that raises change_seq, so it
+        # is skipped. Any other update, including a save() writing back a
+        # stale change_seq, gets a new number. Dropped first so databases
+        # with an older version of the trigger pick this one up.
+        "DROP TRIGGER IF EXISTS todo_sync_update",
+        f"CREATE TRIGGER todo_sync_update "
+        f"AFTER UPDATE ON {todos} "
+        f"WHEN new.change_seq <= old.change_seq "
+        f"BEGIN {tick} {stamp} END",
+        f"CREATE TRIGGER IF NOT EXISTS todo_sync_delete "
+        f"AFTER DELETE ON {todos} BEGIN {tick} "
+        f"INSERT INTO {tombstones} (user_id_id, todo_id, seq, deleted_at) "
+        f"VALUES (old.user_id_id, old.id, {now}, "
+        f"strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+        # Rows written before the triggers existed.
+        f"UPDATE {todos} SET change_seq = 0 WHERE change_seq = 0",
+    ]
+
+
+def create_triggers(alias):
+    connection = connections[alias]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in schema():
+            cursor.execute(statement)
+
+
+def get_clock(alias):
+    """Returns `(seq, compacted)` of the database's change clock."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f"SELECT seq, compacted FROM {CLOCK_TABLE} WHERE id = 1")
+        return cursor.fetchone()
+
+
+def encode_cursor(shard, seq):
+    raw = json.dumps([shard, seq], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns `(shard, seq)`, or raises NotFound."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        shard, seq = json.loads(base64.urlsafe_b64decode(padded))
+        seq = int(seq)
+    except (TypeError, ValueError):
+        raise NotFound(invalid_cursor_message)
+    if not isinstance(shard, str) or seq < 0:
+        raise NotFound(invalid_cursor_message)
+    return shard, seq
+
+
+def changes_since(user_id, cursor, limit, fields):
+    """
+    The user's changes after `cursor` (None for everything), oldest first.
+
+    Returns a dict with `todos` (named `values_list` rows of `fields`, which
+    must include "change_seq"), `deleted` (todo ids), the `cursor` to resume
+    from, `has_more` and `reset`. `reset` means the cursor could not be
+    honoured and the changes start from scratch, so the client must drop
+    what it has.
+    """
+    todo_model = apps.get_model("todos", "TodoModel")
+    tombstone_model = apps.get_model("todos", "TodoTombstoneModel")
+
+    todos = todo_model.objects.for_user(user_id)
+    shard = shard_for(user_id)
+    alias = todos.db
+
+    reset = False
+    seq = 0
+    if cursor is not None:
+        cursor_shard, seq = decode_cursor(cursor)
+
+    # Read everything in one snapshot, or a write in between could be missed.
+    with transaction.atomic(using=alias):
+        clock, compacted = get_clock(alias)
+        if cursor is not None and (cursor_shard != shard or seq < compacted):
+            reset, seq = True, 0
+        rows = list(
+            todos.filter(change_seq__gt=seq)
+            .order_by("change_seq")
+            .values_list(*fields, named=True)[: limit + 1]
+        )
+        # A client starting over has no use for old deletes.
+        tombstones = []
+        if seq:
+            tombstones = list(
+                tombstone_model.objects.db_manager(alias)
+                .filter(user_id=user_id, seq__gt=seq)
+                .order_by("seq")
+                .values_list("seq", "todo_id")[: limit + 1]
+            )
+
+    changes = sorted(
+        [(row.change_seq, row, None) for row in rows]
+        + [(tomb_seq, None, todo_id) for tomb_seq, todo_id in tombstones],
+        key=lambda change: change[0],
+    )
+    page = changes[:limit]
+    has_more = len(changes) > limit
+    # Once caught up, the whole clock has been seen, which also keeps the
+    # cursor ahead of future compactions when nothing changes.
+    seq = page[-1][0] if has_more else clock
+    return {
+        "todos": [row for _, row, _ in page if row is not None],
+        "deleted": [todo_id for _, row, todo_id in page if row is None],
+        "cursor": encode_cursor(shard, seq),
+        "has_more": has_more,
+        "reset": reset,
+    }
+
+
+def compact_tombstones(alias, before):
+    """
+    Removes the tombstones of todos deleted before `before` on `alias` and
+    returns how many went. Cursors older than the newest of them reset.
+    """
+    tombstone_model = apps.get_model("todos", "TodoTombstoneModel")
+    tombstones = tombstone_model.objects.using(alias)
+    with transaction.atomic(using=alias):
+        old = tombstones.filter(deleted_at__lt=before)
+        newest = old.order_by("-seq").values_list("seq", flat=True).first()
+        if newest is None:
+            return 0
+        # Sequence numbers follow deletion times, so this removes exactly
+        # the tombstones up to `newest`.
+        deleted, _ = tombstones.filter(seq__lte=newest).delete()
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {CLOCK_TABLE} SET compacted = MAX(compacted, %s) "
+                f"WHERE id = 1",
+                [newest],
+            )
+    return deleted
@@ -0,0 +1,1309 @@
+import asyncio
+import datetime
+import gzip
+import itertools
+import json
+import re
+import tempfile
+import time
+import unittest
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import (
+    AsyncRequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config import metrics, replicas
+from users.models import UserModel
+from users.serializers import UserProfileSerializer
+from . import async_views, events, shards
+from .cache import bump_version, get_cache
+from .fast_serializers import (
+    TodoCompactRowSerializer,
+    TodoRowSerializer,
+    UserProfileRowSerializer,
+)
+from .models import (
+    TodoDeadlineBucketModel,
+    TodoEventModel,
+    TodoExportModel,
+    TodoModel,
+    TodoShardModel,
+    TodoStatsModel,
+    TodoTombstoneModel,
+)
+from .pagination import KeysetPagination
+from .serializers import TodoCompactSerializer, TodoModelSerializer
+
+
+# Replicas and shards have their own tests; these use the primary only.
+@override_settings(DATABASE_REPLICAS=[], TODO_SHARDS=["default"])
+class TodoApiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserModel.objects.create(
+            name="Ali", surname="Valiyev", email="ali@example.com"
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    def create_todos(self, count, user=None):
+        now = timezone.now()
+        bump_version((user or self.user).id)
+        return TodoModel.objects.bulk_create(
+            TodoModel(
+                title=f"Todo {i}",
+                deadline=now + datetime.timedelta(hours=count - i),
+                user_id=user or self.user,
+            )
+            for i in range(count)
+        )
+
+
+@override_settings(TODO_PAGE_SIZE=3, TODO_MAX_PAGE_SIZE=4)
+class TodoListPaginationTests(TodoApiTestCase):
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(todo["id"] for todo in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_walks_every_row_once(self):
+        todos = self.create_todos(10)
+        self.create_todos(2, user=UserModel.objects.create(email="x@example.com"))
+
+        ids = self.collect("/todos/todolist/")
+        self.assertEqual(ids, [todo.id for todo in todos])
+
+        ids = self.collect("/todos/todolist/?ordering=-deadline")
+        self.assertEqual(ids, [todo.id for todo in todos])
+
+    def test_page_size_is_capped(self):
+        self.create_todos(10)
+        response = self.client.get("/todos/todolist/?page_size=100")
+        self.assertEqual(len(response.data["results"]), 4)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/todos/todolist/?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_seeks_into_index(self):
+        self.create_todos(10)
+        todos = TodoModel.objects.filter(user_id=self.user)
+        for ordering, bound in (("created_at", ">"), ("-deadline", "<")):
+            with self.subTest(ordering=ordering):
+                url = f"/todos/todolist/?ordering={ordering}"
+                url = self.client.get(url).data["next"]
+                request = Request(APIRequestFactory().get(url))
+                page = KeysetPagination().page_queryset(todos, request)
+                sql, params = page.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                    plan = " ".join(row[-1] for row in cursor.fetchall())
+                # A range seek, not a walk over the user's whole index.
+                self.assertIn(f"{ordering.lstrip('-')}{bound}?", plan)
+
+
+@override_settings(TODO_MAX_PAGE_SIZE=10_000)
+class TodoListQueryCountTests(TodoApiTestCase):
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_is_flat(self):
+        for compact in ("false", "true"):
+            with self.subTest(compact=compact):
+                TodoModel.objects.all().delete()
+                url = f"/todos/todolist/?page_size=10000&compact={compact}"
+
+                self.create_todos(10)
+                small, response = self.count_queries(url)
+                self.assertEqual(len(response.data["results"]), 10)
+
+                self.create_todos(9_990)
+                large, response = self.count_queries(url)
+                self.assertEqual(len(response.data["results"]), 10_000)
+                self.assertEqual(small, large)
+
+    def test_compact_sends_owner_once(self):
+        self.create_todos(2)
+        response = self.client.get("/todos/todolist/?compact=true")
+        self.assertEqual(
+            response.data["user"],
+            {"id": self.user.id, "name": "Ali", "surname": "Valiyev"},
+        )
+        self.assertNotIn("user_id", response.data["results"][0])
+
+
+class TodoRowSerializerParityTests(TodoApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.name = "Ali \"O'g'li\" ☃"
+        self.user.save()
+        todos = self.create_todos(4)
+        # Microseconds, a shared timestamp and non-ASCII titles.
+        todos[1].title = "Sut va non — 2 ta"
+        todos[1].deadline = todos[2].deadline = datetime.datetime(
+            2030, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc
+        )
+        TodoModel.objects.bulk_update(todos, ["title", "deadline"])
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def assertParity(self):
+        todos = TodoModel.objects.select_related("user_id").order_by("id")
+        rows = todos.values_list(*TodoCompactRowSerializer.values_fields())
+        self.assertEqual(
+            self.render(TodoRowSerializer(rows, many=True, owner=self.user).data),
+            self.render(TodoModelSerializer(todos, many=True).data),
+        )
+        self.assertEqual(
+            self.render(TodoCompactRowSerializer(rows, many=True).data),
+            self.render(TodoCompactSerializer(todos, many=True).data),
+        )
+        self.assertEqual(
+            self.render(
+                UserProfileRowSerializer(
+                    (self.user.id, self.user.name, self.user.surname)
+                ).data
+            ),
+            self.render(UserProfileSerializer(self.user).data),
+        )
+
+    def test_output_is_byte_identical(self):
+        self.assertParity()
+
+    def test_output_is_byte_identical_in_utc(self):
+        with timezone.override(datetime.timezone.utc):
+            self.assertParity()
+
+    def test_list_endpoint_is_unchanged(self):
+        response = self.client.get("/todos/todolist/")
+        todos = TodoModel.objects.select_related("user_id").order_by("created_at", "id")
+        expected = {
+            "next": None,
+            "results": TodoModelSerializer(todos, many=True).data,
+        }
+        self.assertEqual(response.content, self.render(expected))
+
+
+class TodoListFilterTests(TodoApiTestCase):
+    filters = {
+        "is_finished": ["true", "false"],
+        "is_urgent": ["true", "false"],
+        "deadline_after": ["2024-01-01T00:00:00Z"],
+        "deadline_before": ["2030-01-01T00:00:00Z"],
+    }
+    orderings = ["created_at", "-created_at", "deadline", "-deadline"]
+
+    def combinations(self):
+        names = list(self.filters)
+        for size in range(len(names) + 1):
+            for subset in itertools.combinations(names, size):
+                for values in itertools.product(*(self.filters[n] for n in subset)):
+                    for ordering in self.orderings:
+                        yield {**dict(zip(subset, values)), "ordering": ordering}
+
+    def test_filters(self):
+        todos = self.create_todos(4)
+        TodoModel.objects.filter(pk=todos[0].pk).update(is_finished=True)
+        TodoModel.objects.filter(pk=todos[1].pk).update(is_urgent=True)
+
+        response = self.client.get("/todos/todolist/?is_finished=true")
+        self.assertEqual([t["id"] for t in response.data["results"]], [todos[0].pk])
+
+        response = self.client.get("/todos/todolist/?is_urgent=false&is_finished=0")
+        self.assertEqual(
+            [t["id"] for t in response.data["results"]], [todos[2].pk, todos[3].pk]
+        )
+
+        response = self.client.get(
+            "/todos/todolist/",
+            {"deadline_before": todos[1].deadline.isoformat()},
+        )
+        self.assertEqual(
+            [t["id"] for t in response.data["results"]], [todos[2].pk, todos[3].pk]
+        )
+
+        response = self.client.get("/todos/todolist/?is_urgent=maybe")
+        self.assertEqual(response.status_code, 400)
+
+    def test_no_full_table_scan(self):
+        self.create_todos(20)
+        for params in self.combinations():
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get("/todos/todolist/", params)
+                self.assertEqual(response.status_code, 200)
+
+                todo_queries = [q["sql"] for q in queries if '"todos"' in q["sql"]]
+                self.assertEqual(len(todo_queries), 2)
+                for sql in todo_queries:
+                    with connection.cursor() as cursor:
+                        cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                        plan = [row[-1] for row in cursor.fetchall()]
+                    self.assertTrue(
+                        any(
+                            re.match(r"SEARCH todos USING (COVERING )?INDEX", p)
+                            for p in plan
+                        ),
+                        plan,
+                    )
+                    self.assertFalse(
+                        any(re.match(r"SCAN todos\b", p) for p in plan), plan
+                    )
+                    if "ORDER BY" in sql and "deadline" in params["ordering"]:
+                        # Flag filters must be part of the index seek.
+                        search = next(p for p in plan if p.startswith("SEARCH todos"))
+                        for flag in ("is_finished", "is_urgent"):
+                            if flag in params:
+                                self.assertIn(f"{flag}=?", search)
+
+
+class TodoWriteTests(TodoApiTestCase):
+    def todo_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(
+                url, data, content_type="application/json"
+            )
+        return response, [q["sql"] for q in queries if '"todos"' in q["sql"]]
+
+    def test_single_statement_writes(self):
+        todo = self.create_todos(1)[0]
+
+        response, sql = self.todo_queries("patch", f"/todos/{todo.pk}/finish/")
+        self.assertEqual(response.data, {"message": "Todo is finished"})
+        self.assertEqual(len(sql), 1)
+        self.assertTrue(sql[0].startswith("UPDATE"))
+
+        response, sql = self.todo_queries(
+            "put", f"/todos/{todo.pk}/edit/", {"title": "New"}
+        )
+        self.assertEqual(response.data, {"message": "Edited"})
+        self.assertEqual(len(sql), 1)
+        todo.refresh_from_db()
+        self.assertEqual((todo.title, todo.is_finished), ("New", True))
+
+        response, sql = self.todo_queries("delete", f"/todos/{todo.pk}/delete/")
+        self.assertEqual(response.data, {"message": "Deleted successfully"})
+        self.assertEqual(len(sql), 1)
+        self.assertTrue(sql[0].startswith("DELETE"))
+
+    def test_missing_or_foreign_todo_is_404(self):
+        other = UserModel.objects.create(email="other@example.com")
+        todo = self.create_todos(1, user=other)[0]
+        for method, url in [
+            ("patch", f"/todos/{todo.pk}/finish/"),
+            ("put", f"/todos/{todo.pk}/edit/"),
+            ("put", f"/todos/{todo.pk}/edit/?bad"),
+            ("delete", f"/todos/{todo.pk}/delete/"),
+        ]:
+            with self.subTest(method=method, url=url):
+                data = {"deadline": "bad"} if url.endswith("?bad") else {}
+                response, _ = self.todo_queries(method, url, data)
+                self.assertEqual(response.status_code, 404)
+        self.assertTrue(TodoModel.objects.filter(pk=todo.pk, title="Todo 0").exists())
+
+
+class TodoBulkCreateTests(TodoApiTestCase):
+    url = "/todos/create/bulk/"
+
+    @override_settings(TODO_BULK_CREATE_BATCH_SIZE=2)
+    def test_creates_in_input_order(self):
+        items = [{"title": f"Offline {i}", "is_urgent": i % 2 == 0} for i in range(5)]
+        response = self.client.post(self.url, items, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        titles = dict(TodoModel.objects.values_list("id", "title"))
+        self.assertEqual(
+            [titles[pk] for pk in response.data["ids"]], [i["title"] for i in items]
+        )
+        self.assertTrue(
+            TodoModel.objects.filter(
+                user_id=self.user, title="Offline 0", is_urgent=True
+            )
+        )
+
+    def test_reports_errors_per_item(self):
+        items = [{"title": "Ok"}, {"deadline": "soon"}]
+        response = self.client.post(self.url, items, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["details"][0], {})
+        self.assertEqual(set(response.data["details"][1]), {"title", "deadline"})
+        self.assertFalse(TodoModel.objects.exists())
+
+    @override_settings(TODO_BULK_MAX_ITEMS=2)
+    def test_rejects_oversized_batches(self):
+        items = [{"title": "x"}] * 3
+        response = self.client.post(self.url, items, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class TodoImportTests(TodoApiTestCase):
+    url = "/todos/create/import/"
+
+    def post(self, body, **extra):
+        return self.client.post(
+            self.url, body, content_type="application/x-ndjson", **extra
+        )
+
+    @override_settings(TODO_IMPORT_CHUNK_SIZE=2)
+    def test_imports_valid_lines_and_numbers_errors(self):
+        lines = [
+            json.dumps({"title": "One", "is_urgent": True}),
+            "",
+            "{not json",
+            json.dumps({"title": "Two"}),
+            json.dumps({"deadline": "soon"}),
+            json.dumps({"title": "Three"}),
+        ]
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.post("\n".join(lines) + "\n")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [response.data[key] for key in ("lines", "created", "failed")], [6, 3, 2]
+        )
+        self.assertEqual([e["line"] for e in response.data["errors"]], [3, 5])
+        self.assertEqual(
+            set(response.data["errors"][1]["errors"]), {"title", "deadline"}
+        )
+        self.assertEqual(
+            list(TodoModel.objects.order_by("id").values_list("title", flat=True)),
+            ["One", "Two", "Three"],
+        )
+        # One commit, and so one cache invalidation, per chunk.
+        self.assertEqual(len(callbacks), 2)
+
+    def test_gzip_body(self):
+        body = "".join(json.dumps({"title": f"T{i}"}) + "\n" for i in range(10))
+        response = self.post(gzip.compress(body.encode()), HTTP_CONTENT_ENCODING="gzip")
+        self.assertEqual(response.data["created"], 10)
+
+        response = self.post(b"not gzip", HTTP_CONTENT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["details"]["created"], 0)
+
+    @override_settings(TODO_IMPORT_MAX_LINE_BYTES=32, TODO_IMPORT_MAX_ERRORS=1)
+    def test_long_lines_are_skipped_and_errors_capped(self):
+        body = "\n".join(
+            [json.dumps({"title": "x" * 100}), "[]", json.dumps({"title": "Ok"})]
+        )
+        response = self.post(body)
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 2))
+        self.assertEqual([e["line"] for e in response.data["errors"]], [1])
+
+
+class TodoBulkActionTests(TodoApiTestCase):
+    def request(self, method, url, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(
+                url, data, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data, [q["sql"] for q in queries if '"todos"' in q["sql"]]
+
+    def test_by_ids(self):
+        todos = self.create_todos(3)
+        foreign = self.create_todos(1, UserModel.objects.create(email="o@example.com"))
+        ids = [todos[0].pk, todos[2].pk, foreign[0].pk, 999_999]
+
+        data, sql = self.request("patch", "/todos/bulk/finish/", {"ids": ids})
+        self.assertEqual(data["affected"], [todos[0].pk, todos[2].pk])
+        self.assertEqual(data["not_found"], [foreign[0].pk, 999_999])
+        self.assertEqual(len(sql), 2)
+        self.assertEqual(TodoModel.objects.filter(is_finished=True).count(), 2)
+
+        data, sql = self.request(
+            "put", "/todos/bulk/edit/", {"ids": ids[:2], "title": "Same"}
+        )
+        self.assertEqual(data["affected"], ids[:2])
+        self.assertEqual(TodoModel.objects.filter(title="Same").count(), 2)
+
+        data, sql = self.request("post", "/todos/bulk/delete/", {"ids": ids})
+        self.assertEqual(data["affected"], ids[:2])
+        self.assertEqual(len(sql), 2)
+        self.assertEqual(TodoModel.objects.count(), 2)
+
+    def test_by_filter(self):
+        todos = self.create_todos(3)
+        TodoModel.objects.filter(pk__in=[todos[0].pk, todos[2].pk]).update(
+            is_finished=True
+        )
+        data, _ = self.request(
+            "post",
+            "/todos/bulk/delete/",
+            {"is_finished": True, "deadline_before": todos[1].deadline.isoformat()},
+        )
+        self.assertEqual(data, {"affected": [todos[2].pk], "not_found": []})
+
+    def test_requires_a_selection(self):
+        response = self.client.post(
+            "/todos/bulk/delete/", {}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.put(
+            "/todos/bulk/edit/", {"ids": [1]}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TodoResponseCacheTests(TodoApiTestCase):
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [q for q in queries if '"todos"' in q["sql"]]
+
+    def test_hits_until_a_write(self):
+        todo = self.create_todos(2)[0]
+        first, queries = self.get("/todos/todolist/")
+        self.assertEqual(len(queries), 2)
+        second, queries = self.get("/todos/todolist/")
+        self.assertEqual((second, queries), (first, []))
+
+        detail, _ = self.get(f"/todos/todolist/{todo.pk}/")
+        self.assertEqual(self.get(f"/todos/todolist/{todo.pk}/")[1], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/todos/{todo.pk}/finish/")
+        detail_after, queries = self.get(f"/todos/todolist/{todo.pk}/")
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            (detail["is_finished"], detail_after["is_finished"]), (False, True)
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/todos/{todo.pk}/delete/")
+        after, _ = self.get("/todos/todolist/")
+        self.assertEqual(len(after["results"]), 1)
+
+    def test_entries_are_per_user(self):
+        self.create_todos(1)
+        self.get("/todos/todolist/")
+        other = UserModel.objects.create(email="o@example.com")
+        token = RefreshToken.for_user(other).access_token
+        response = self.client.get(
+            "/todos/todolist/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.json()["results"], [])
+
+
+class TodoConditionalGetTests(TodoApiTestCase):
+    def test_list_revalidates_with_one_aggregate(self):
+        todos = self.create_todos(3)
+        response = self.client.get("/todos/todolist/")
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        get_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/todos/todolist/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        todo_queries = [q["sql"] for q in queries if '"todos"' in q["sql"]]
+        self.assertEqual(len(todo_queries), 1)
+        self.assertIn("MAX", todo_queries[0])
+
+        # Served from the response cache: no query at all.
+        self.client.get("/todos/todolist/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/todos/todolist/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/todos/{todos[1].pk}/delete/")
+        response = self.client.get(
+            "/todos/todolist/",
+            HTTP_IF_NONE_MATCH=etag,
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_retrieve_honours_both_validators(self):
+        todo = self.create_todos(1)[0]
+        url = f"/todos/todolist/{todo.pk}/"
+        response = self.client.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+
+        get_cache().clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                f"/todos/{todo.pk}/edit/", {"title": "New"}, "application/json"
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["title"], "New")
+
+
+@override_settings(TODO_STREAM_CHUNK_SIZE=2, TODO_MAX_PAGE_SIZE=100)
+class TodoListStreamingTests(TodoApiTestCase):
+    def test_matches_paginated_body(self):
+        self.create_todos(5)
+        for query in ("", "&compact=true", "&ordering=-deadline&is_finished=false"):
+            with self.subTest(query=query):
+                paged = self.client.get(f"/todos/todolist/?page_size=100{query}")
+                streamed = self.client.get(f"/todos/todolist/?stream=true{query}")
+                self.assertTrue(streamed.streaming)
+                self.assertEqual(b"".join(streamed.streaming_content), paged.content)
+
+    def test_empty(self):
+        response = self.client.get("/todos/todolist/?stream=1")
+        self.assertEqual(
+            b"".join(response.streaming_content), b'{"next":null,"results":[]}'
+        )
+
+
+class TodoExportTests(TodoApiTestCase):
+    def setUp(self):
+        super().setUp()
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        self.enterContext(override_settings(TODO_EXPORT_ROOT=export_root.name))
+
+    def export(self, **options):
+        response = self.client.post("/todos/exports/", options)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "queued")
+        call_command("run_exports", "--chunk-size=2", stdout=StringIO())
+        return response.data["id"]
+
+    def test_csv_export_with_ranges(self):
+        self.create_todos(5)
+        pk = self.export(format="csv")
+        status = self.client.get(f"/todos/exports/{pk}/").data
+        self.assertEqual((status["status"], status["rows"]), ("done", 5))
+
+        url = f"/todos/exports/{pk}/download/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        body = b"".join(response.streaming_content)
+        self.assertEqual(len(body), status["size"])
+        self.assertEqual(body.decode().splitlines()[0].split(",")[:2], ["id", "title"])
+        self.assertEqual(len(body.decode().splitlines()), 6)
+
+        response = self.client.get(url, HTTP_RANGE="bytes=10-")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), body[10:])
+        self.assertEqual(
+            response["Content-Range"], f"bytes 10-{len(body) - 1}/{len(body)}"
+        )
+
+        response = self.client.get(url, HTTP_RANGE="bytes=-4")
+        self.assertEqual(b"".join(response.streaming_content), body[-4:])
+
+        response = self.client.get(url, HTTP_RANGE=f"bytes={len(body)}-")
+        self.assertEqual(response.status_code, 416)
+
+        response = self.client.get(url, HTTP_RANGE="bytes=0-3", HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_empty_file_ranges(self):
+        # A user without todos gets an empty NDJSON file.
+        pk = self.export(format="ndjson")
+        url = f"/todos/exports/{pk}/download/"
+        self.assertEqual(b"".join(self.client.get(url).streaming_content), b"")
+        for header in ("bytes=-4", "bytes=0-"):
+            with self.subTest(header=header):
+                response = self.client.get(url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response["Content-Range"], "bytes */0")
+
+    def test_stale_running_jobs_are_requeued(self):
+        self.create_todos(2)
+        response = self.client.post("/todos/exports/", {"format": "csv"})
+        export = TodoExportModel.objects.get(pk=response.data["id"])
+        # Claimed by a worker that died an hour ago.
+        TodoExportModel.objects.filter(pk=export.pk).update(
+            status=TodoExportModel.RUNNING,
+            heartbeat_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        out = StringIO()
+        call_command("run_exports", stdout=out)
+        self.assertIn("Requeued 1 stale export(s)", out.getvalue())
+        export.refresh_from_db()
+        self.assertEqual((export.status, export.rows), (TodoExportModel.DONE, 2))
+
+    def test_gzipped_ndjson_export(self):
+        todos = self.create_todos(3)
+        pk = self.export(format="ndjson", gzip=True)
+        response = self.client.get(f"/todos/exports/{pk}/download/")
+        lines = gzip.decompress(b"".join(response.streaming_content)).splitlines()
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines], [t.pk for t in todos]
+        )
+
+    def test_exports_are_private(self):
+        pk = self.export()
+        other = UserModel.objects.create(email="o@example.com")
+        token = RefreshToken.for_user(other).access_token
+        response = self.client.get(
+            f"/todos/exports/{pk}/download/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TodoSearchTests(TodoApiTestCase):
+    def search(self, query, **params):
+        response = self.client.get("/todos/search/", {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_ranks_own_matches_and_follows_index_on_writes(self):
+        other = UserModel.objects.create(email="x@example.com")
+        TodoModel.objects.create(title="Buy milk", user_id=other)
+        best = TodoModel.objects.create(title="milk milk", user_id=self.user)
+        weak = TodoModel.objects.create(
+            title="Buy milk, bread, eggs and cheese", user_id=self.user
+        )
+        TodoModel.objects.create(title="Call mom", user_id=self.user)
+
+        response = self.search("MIL")
+        self.assertEqual(
+            [t["id"] for t in response.data["results"]], [best.pk, weak.pk]
+        )
+        self.assertEqual(response.data["results"][0]["user_id"]["name"], "Ali")
+        self.assertEqual(
+            [t["id"] for t in self.search("bread mil").data["results"]], [weak.pk]
+        )
+
+        bump_version(self.user.id)
+        TodoModel.objects.filter(pk=weak.pk).update(title="Buy tea")
+        best.delete()
+        self.assertEqual(self.search("milk").data["results"], [])
+        self.assertEqual(len(self.search("tea").data["results"]), 1)
+
+    @override_settings(TODO_PAGE_SIZE=2)
+    def test_pages_with_cursor(self):
+        todos = self.create_todos(5)
+        ids = []
+        url = "/todos/search/?q=todo"
+        while url:
+            response = self.client.get(url)
+            ids.extend(t["id"] for t in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(sorted(ids), [todo.pk for todo in todos])
+
+    def test_query_without_words_is_rejected(self):
+        response = self.client.get("/todos/search/", {"q": '"*:'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("q", response.data["details"])
+
+    def test_rebuild_command_restores_index(self):
+        todo = TodoModel.objects.create(title="Pay rent", user_id=self.user)
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO todos_fts (todos_fts) VALUES ('delete-all')")
+        self.assertEqual(self.search("rent").data["results"], [])
+
+        bump_version(self.user.id)
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(
+            [t["id"] for t in self.search("rent").data["results"]], [todo.pk]
+        )
+
+
+class TodoStatsTests(TodoApiTestCase):
+    def stats(self):
+        response = self.client.get("/todos/stats/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counters_follow_every_write_path(self):
+        now = timezone.now()
+        past = (now - datetime.timedelta(days=3)).isoformat()
+        self.assertEqual(
+            self.stats(), {"total": 0, "finished": 0, "urgent": 0, "overdue": 0}
+        )
+        self.client.post(
+            "/todos/create/bulk/",
+            [
+                {"title": "Old", "deadline": past, "is_urgent": True},
+                {"title": "Late", "deadline": (now - datetime.timedelta(minutes=1))},
+                {"title": "Soon", "deadline": (now + datetime.timedelta(days=1))},
+            ],
+            content_type="application/json",
+        )
+        old, late, soon = TodoModel.objects.order_by("id")
+        self.assertEqual(
+            self.stats(), {"total": 3, "finished": 0, "urgent": 1, "overdue": 2}
+        )
+
+        self.client.patch(f"/todos/{old.pk}/finish/")
+        self.client.put(
+            f"/todos/{soon.pk}/edit/",
+            {"deadline": past},
+            content_type="application/json",
+        )
+        self.assertEqual(
+            self.stats(), {"total": 3, "finished": 1, "urgent": 1, "overdue": 2}
+        )
+
+        self.client.patch(
+            "/todos/bulk/finish/",
+            {"ids": [late.pk]},
+            content_type="application/json",
+        )
+        self.client.delete(f"/todos/{old.pk}/delete/")
+        self.assertEqual(
+            self.stats(), {"total": 2, "finished": 1, "urgent": 0, "overdue": 1}
+        )
+
+        out = StringIO()
+        call_command("reconcile_todo_stats", "--dry-run", stdout=out)
+        self.assertIn("found drift in 0", out.getvalue())
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.create_todos(3)
+        TodoStatsModel.objects.filter(user_id=self.user).update(total=10)
+        TodoDeadlineBucketModel.objects.filter(user_id=self.user).delete()
+
+        out = StringIO()
+        call_command("reconcile_todo_stats", "--batch-size", "1", stdout=out)
+        self.assertIn(
+            f"user {self.user.pk}: counters (10, 0, 0) != (3, 0, 0)", out.getvalue()
+        )
+        self.assertIn("deadline buckets", out.getvalue())
+
+        out = StringIO()
+        call_command("reconcile_todo_stats", stdout=out)
+        self.assertIn("fixed drift in 0", out.getvalue())
+        self.assertEqual(self.stats()["total"], 3)
+
+
+class SeedCommandTests(TodoApiTestCase):
+    def test_seeded_rows_go_through_the_triggers(self):
+        out = StringIO()
+        call_command("seed", "--users=20", "--todos=10", "--chunk-size=50", stdout=out)
+        self.assertIn("Created 20 users", out.getvalue())
+        seeded = TodoModel.objects.exclude(user_id=self.user)
+        self.assertGreater(seeded.count(), 0)
+        self.assertFalse(seeded.filter(change_seq=0).exists())
+        self.assertEqual(
+            TodoStatsModel.objects.aggregate(total=Sum("total"))["total"],
+            seeded.count(),
+        )
+
+        out = StringIO()
+        call_command("reconcile_todo_stats", "--dry-run", stdout=out)
+        self.assertIn("found drift in 0", out.getvalue())
+
+
+class TodoSyncTests(TodoApiTestCase):
+    def sync(self, cursor=None, **params):
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = self.client.get("/todos/sync/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_since_cursor(self):
+        first, second, third = self.create_todos(3)
+        full = self.sync(page_size=2)
+        self.assertEqual([t["title"] for t in full["todos"]], ["Todo 0", "Todo 1"])
+        self.assertEqual((full["has_more"], full["reset"]), (True, False))
+        rest = self.sync(full["cursor"], page_size=2)
+        self.assertEqual([t["id"] for t in rest["todos"]], [third.pk])
+        self.assertFalse(rest["has_more"])
+        self.assertEqual(self.sync(rest["cursor"])["todos"], [])
+
+        self.client.patch(f"/todos/{second.pk}/finish/")
+        self.client.delete(f"/todos/{first.pk}/delete/")
+        self.client.delete(f"/todos/{third.pk}/delete/")
+        changes = self.sync(rest["cursor"])
+        self.assertEqual(
+            [(t["id"], t["is_finished"]) for t in changes["todos"]],
+            [(second.pk, True)],
+        )
+        self.assertEqual(changes["deleted"], [first.pk, third.pk])
+        self.assertEqual(self.sync(changes["cursor"])["deleted"], [])
+        # A fresh client gets no tombstones.
+        self.assertEqual(self.sync()["deleted"], [])
+
+    def test_change_to_latest_todo_is_synced(self):
+        response = self.client.post(
+            "/todos/create/", {"title": "Only"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+        cursor = self.sync()["cursor"]
+        todo = TodoModel.objects.get()
+        self.client.patch(f"/todos/{todo.pk}/finish/")
+        changes = self.sync(cursor)
+        self.assertEqual(
+            [(t["id"], t["is_finished"]) for t in changes["todos"]], [(todo.pk, True)]
+        )
+        self.assertNotEqual(changes["cursor"], cursor)
+
+    def test_compacted_cursor_resets(self):
+        (todo,) = self.create_todos(1)
+        cursor = self.sync()["cursor"]
+        self.client.delete(f"/todos/{todo.pk}/delete/")
+        self.assertEqual(TodoTombstoneModel.objects.count(), 1)
+
+        call_command("compact_tombstones", "--days", "1", stdout=StringIO())
+        self.assertEqual(TodoTombstoneModel.objects.count(), 1)
+        out = StringIO()
+        call_command("compact_tombstones", "--days", "-1", stdout=out)
+        self.assertIn("default: removed 1 tombstones", out.getvalue())
+
+        changes = self.sync(cursor)
+        self.assertEqual(changes["reset"], True)
+        self.assertEqual((changes["todos"], changes["deleted"]), ([], []))
+        self.assertEqual(self.sync(changes["cursor"])["reset"], False)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/todos/sync/", {"cursor": "nope"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_query_count_scales_with_changes(self):
+        self.create_todos(50)
+        cursor = self.sync()["cursor"]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.sync(cursor)["todos"], [])
+        # Clock, changed todos, tombstones; each a bounded range scan.
+        selects = [q["sql"] for q in queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 3)
+        self.assertIn("LIMIT 51", selects[1])
+
+
+class AsyncTodoViewTests(TodoApiTestCase):
+    """The async views answer exactly like the DRF views they replace."""
+
+    async def call(self, view, method, url, data=None, **kwargs):
+        extra = {} if method == "get" else {"content_type": "application/json"}
+        request = getattr(AsyncRequestFactory(), method)(
+            url,
+            data or {},
+            headers={"Authorization": self.client.defaults["HTTP_AUTHORIZATION"]},
+            **extra,
+        )
+        response = await view.as_view()(request, **kwargs)
+        return response.status_code, json.loads(response.content)
+
+    def sync_call(self, method, url, data=None):
+        response = getattr(self.client, method)(
+            url, data, content_type="application/json"
+        )
+        return response.status_code, response.json()
+
+    async def test_matches_sync_views(self):
+        todos = await sync_to_async(self.create_todos)(3)
+        pk = todos[0].pk
+        list_view = async_views.AsyncTodoListView
+        retrieve_view = async_views.AsyncTodoRetrieveView
+        for view, url, kwargs in [
+            (list_view, "/todos/todolist/", {}),
+            (list_view, "/todos/todolist/?compact=1&ordering=-deadline", {}),
+            (list_view, "/todos/todolist/?page_size=x", {}),
+            (retrieve_view, f"/todos/todolist/{pk}/", {"pk": pk}),
+            (retrieve_view, "/todos/todolist/0/", {"pk": 0}),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    await self.call(view, "get", url, **kwargs),
+                    await sync_to_async(self.sync_call)("get", url),
+                )
+
+    async def test_stream_is_async(self):
+        await sync_to_async(self.create_todos)(5)
+        for query in ("", "&compact=true&ordering=-deadline"):
+            with self.subTest(query=query):
+                request = AsyncRequestFactory().get(
+                    f"/todos/todolist/?stream=true{query}",
+                    headers={
+                        "Authorization": self.client.defaults["HTTP_AUTHORIZATION"]
+                    },
+                )
+                response = await async_views.AsyncTodoListView.as_view()(request)
+                self.assertTrue(response.is_async)
+                content = b"".join([part async for part in response])
+                paged = await sync_to_async(self.client.get)(
+                    f"/todos/todolist/?page_size=100{query}"
+                )
+                self.assertEqual(content, paged.content)
+
+    async def test_writes(self):
+        status, body = await self.call(
+            async_views.AsyncTodoCreateView, "post", "/", {"title": "Async"}
+        )
+        self.assertEqual((status, body["title"]), (201, "Async"))
+        todo = await TodoModel.objects.aget(title="Async")
+
+        self.assertEqual(
+            await self.call(async_views.AsyncTodoCreateView, "post", "/", {}),
+            (
+                400,
+                {
+                    "error": "Mistake on serializer",
+                    "details": {"title": ["This field is required."]},
+                },
+            ),
+        )
+        self.assertEqual(
+            await self.call(
+                async_views.AsyncIsFinishedSetTrueView, "patch", "/", pk=todo.pk
+            ),
+            (200, {"message": "Todo is finished"}),
+        )
+        self.assertEqual(
+            await self.call(
+                async_views.AsyncEditTodoView, "put", "/", {"title": "New"}, pk=todo.pk
+            ),
+            (200, {"message": "Edited"}),
+        )
+        await todo.arefresh_from_db()
+        self.assertEqual((todo.title, todo.is_finished), ("New", True))
+        self.assertEqual(
+            await self.call(async_views.AsyncDeleteView, "delete", "/", pk=todo.pk),
+            (200, {"message": "Deleted successfully"}),
+        )
+        self.assertEqual(
+            (await self.call(async_views.AsyncDeleteView, "delete", "/", pk=todo.pk))[
+                0
+            ],
+            404,
+        )
+
+    async def test_authentication_errors_match_drf(self):
+        request = AsyncRequestFactory().get("/todos/todolist/")
+        response = await async_views.AsyncTodoListView.as_view()(request)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            json.loads(response.content),
+            {"detail": "Authorization header must contain two space-delimited values"},
+        )
+
+
+@override_settings(TODO_EVENTS_BROKER="todos.events.LocalBroker")
+class TodoEventTests(TodoApiTestCase):
+    def setUp(self):
+        super().setUp()
+        events.reset_broker()
+        self.addCleanup(events.reset_broker)
+
+    def create_via_api(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/todos/create/", {"title": title})
+        return TodoModel.objects.get(title=title).pk
+
+    @override_settings(TODO_EVENTS_LOG_SIZE=3)
+    def test_local_replay(self):
+        broker = events.LocalBroker()
+        for user_id in (1, 2, 1, 1):
+            broker.publish(user_id, "create", [user_id])
+        self.assertEqual([e.id for e in broker.replay(1, 1)], [3, 4])
+        self.assertEqual(broker.replay(1, 4), [])
+        # Event 1 left the log; event 5 is from before a restart.
+        self.assertIsNone(broker.replay(1, 0))
+        self.assertIsNone(broker.replay(1, 5))
+
+    def test_database_replay(self):
+        broker = events.DatabaseBroker()
+        broker.publish(self.user.id, "create", [7])
+        broker.publish(0, "create", [8])
+        broker.publish(self.user.id, "delete", [7])
+        first = TodoEventModel.objects.order_by("id").first().id
+        replayed = broker.replay(self.user.id, first - 1)
+        self.assertEqual(
+            [(e.action, e.ids) for e in replayed], [("create", [7]), ("delete", [7])]
+        )
+        self.assertEqual(len(broker.replay(self.user.id, first)), 1)
+        TodoEventModel.objects.filter(id=first).delete()
+        self.assertIsNone(broker.replay(self.user.id, first - 1))
+
+    async def test_stream(self):
+        missed = await sync_to_async(self.create_via_api)("Missed")
+        epoch = events.get_broker().epoch
+        request = AsyncRequestFactory().get(
+            "/todos/events/",
+            headers={
+                "Authorization": self.client.defaults["HTTP_AUTHORIZATION"],
+                "Last-Event-ID": f"{epoch}-0",
+            },
+        )
+        response = await async_views.TodoEventsView.as_view()(request)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        try:
+            self.assertEqual(
+                (await anext(stream)).decode(),
+                f'id: {epoch}-1\nevent: create\ndata: {{"action": "create", "ids": '
+                f"[{missed}]}}\n\n",
+            )
+            todo = await sync_to_async(self.create_via_api)("Live")
+            self.assertIn(f'"ids": [{todo}]', (await anext(stream)).decode())
+            # A client disconnecting cancels the wait for the next event.
+            waiting = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+        finally:
+            await stream.aclose()
+        self.assertEqual(events.get_broker().subscriptions, {})
+
+    async def test_stream_reset(self):
+        await sync_to_async(self.create_via_api)("Before")
+        before_restart = events.get_broker().epoch
+        events.reset_broker()
+        await sync_to_async(self.create_via_api)("After")
+        # Event 1 exists again, but the client's event 1 was another one.
+        for last_event_id in ("41", f"{before_restart}-1", f"{before_restart}-0"):
+            request = AsyncRequestFactory().get(
+                "/todos/events/",
+                headers={
+                    "Authorization": self.client.defaults["HTTP_AUTHORIZATION"],
+                    "Last-Event-ID": last_event_id,
+                },
+            )
+            response = await async_views.TodoEventsView.as_view()(request)
+            stream = aiter(response.streaming_content)
+            try:
+                self.assertEqual(
+                    (await anext(stream)).decode(), async_views.RESET_EVENT
+                )
+            finally:
+                await stream.aclose()
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0, METRICS_DIR=None)
+class MetricsTests(TodoApiTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+
+    def test_server_timing(self):
+        self.create_todos(3)
+        response = self.client.get("/todos/todolist/")
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        for phase in ("auth", "serialize", "render", "total"):
+            self.assertRegex(timing, rf"{phase};dur=[\d.]+")
+
+        with override_settings(METRICS_SAMPLE_RATE=0):
+            response = self.client.get("/todos/todolist/")
+        self.assertNotIn("Server-Timing", response)
+
+    def test_exposition(self):
+        self.client.get("/todos/todolist/")
+        self.client.get("/todos/todolist/999/")
+        text = self.client.get("/metrics").content.decode()
+        self.assertIn(
+            'http_requests_total{route="todos/todolist/<int:pk>/",method="GET",'
+            'status="404"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{route="todos/todolist/",'
+            'method="GET",le="+Inf"} 1',
+            text,
+        )
+        self.assertRegex(
+            text,
+            r'http_request_phase_seconds_total\{route="todos/todolist/",'
+            r'phase="auth"\} [\d.e-]+',
+        )
+
+    def test_workers_are_added_up(self):
+        self.client.get("/todos/todolist/")
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                # Another worker's numbers, as it would have written them.
+                other = metrics.Registry()
+                other.observe("todos/todolist/", "GET", 200, 0.001)
+                other.pid = 0
+                other.flush()
+                text = self.client.get("/metrics").content.decode()
+        self.assertIn(
+            'http_requests_total{route="todos/todolist/",method="GET",status="200"} 2',
+            text,
+        )
+
+
+class ReplicaSelectionTests(TestCase):
+    @override_settings(
+        DATABASE_REPLICAS=["replica_1", "replica_2"],
+        DATABASE_REPLICA_SELECTION="round_robin",
+    )
+    def test_round_robin(self):
+        chosen = {replicas.choose_replica() for _ in range(4)}
+        self.assertEqual(chosen, {"replica_1", "replica_2"})
+
+    @override_settings(
+        DATABASE_REPLICAS=["replica_1", "replica_2"],
+        DATABASE_REPLICA_SELECTION="least_latency",
+    )
+    def test_least_latency(self):
+        self.addCleanup(replicas.latencies.clear)
+        replicas.record_latency("replica_1", 0.010)
+        self.assertEqual(replicas.choose_replica(), "replica_2")
+        replicas.record_latency("replica_2", 0.050)
+        self.assertEqual(replicas.choose_replica(), "replica_1")
+
+        # A stale average gets one probe, then the fastest wins again.
+        average, _ = replicas.latencies["replica_2"]
+        replicas.latencies["replica_2"] = (average, time.monotonic() - 60)
+        self.assertEqual(replicas.choose_replica(), "replica_2")
+        self.assertEqual(replicas.choose_replica(), "replica_1")
+
+
+# Replicas copy the primary, so they only serve todos when there are no shards.
+@unittest.skipUnless(
+    settings.DATABASE_REPLICAS, "set SQLITE_REPLICA_PATHS to test replica reads"
+)
+@override_settings(TODO_SHARDS=["default"])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = UserModel.objects.create(
+            name="Ali", surname="Valiyev", email="ali@example.com"
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        self.todo = TodoModel.objects.create(title="Synced", user_id=self.user)
+        replicas.sync_replicas()
+        # Creating the user made them sticky.
+        get_cache().clear()
+
+    def list_titles(self):
+        response = self.client.get("/todos/todolist/")
+        return [todo["title"] for todo in response.data["results"]]
+
+    def test_reads_go_to_replica_until_synced(self):
+        # Written behind the API's back: no signal, so the user is not sticky
+        # and the cached responses are not invalidated.
+        unsynced = TodoModel.objects.create(title="Unsynced", user_id=self.user)
+        self.assertEqual(self.list_titles(), ["Synced"])
+        response = self.client.get(f"/todos/todolist/{unsynced.pk}/")
+        self.assertEqual(response.status_code, 404)
+
+        replicas.sync_replicas()
+        get_cache().clear()
+        self.assertEqual(self.list_titles(), ["Synced", "Unsynced"])
+
+    def test_writer_reads_own_writes(self):
+        response = self.client.post("/todos/create/", {"title": "Mine"})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(replicas.is_sticky(self.user.id))
+        self.assertEqual(self.list_titles(), ["Synced", "Mine"])
+
+        # Once the window is over (the mark lives in the todos cache), the
+        # stale replica is read again.
+        get_cache().clear()
+        self.assertEqual(self.list_titles(), ["Synced"])
+
+    def test_profile_reads(self):
+        UserModel.objects.filter(pk=self.user.pk).update(name="Vali")
+        self.assertEqual(self.client.get("/users/myinfo/").data["name"], "Ali")
+
+    async def test_async_reads_are_timed(self):
+        self.addCleanup(replicas.latencies.clear)
+        replicas.latencies.clear()
+        request = AsyncRequestFactory().get(
+            "/todos/todolist/",
+            headers={"Authorization": self.client.defaults["HTTP_AUTHORIZATION"]},
+        )
+        response = await async_views.AsyncTodoListView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(settings.DATABASE_REPLICAS[0], replicas.latencies)
+
+
+@unittest.skipUnless(
+    len(settings.TODO_SHARDS) > 1, "set SQLITE_SHARD_PATHS to test sharding"
+)
+class TodoShardingTests(TransactionTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = UserModel.objects.create(name="Ali", email="ali@example.com")
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        self.source = shards.shard_for(self.user.id)
+        self.target = next(a for a in settings.TODO_SHARDS if a != self.source)
+
+    def create(self, title):
+        response = self.client.post("/todos/create/", {"title": title})
+        self.assertEqual(response.status_code, 201)
+
+    def rows_on(self, alias):
+        return list(
+            TodoModel.objects.using(alias)
+            .filter(user_id=self.user.id)
+            .order_by("id")
+            .values_list("id", "title", "created_at")
+        )
+
+    def titles(self):
+        response = self.client.get("/todos/todolist/")
+        return [todo["title"] for todo in response.data["results"]]
+
+    def test_todos_live_on_the_owning_shard(self):
+        self.create("One")
+        self.assertEqual(len(self.rows_on(self.source)), 1)
+        self.assertEqual(self.rows_on(self.target), [])
+        self.assertEqual(self.titles(), ["One"])
+        # Ids come from the shard's own range.
+        index = settings.TODO_SHARDS.index(self.source)
+        self.assertEqual(self.rows_on(self.source)[0][0] >> shards.ID_RANGE_BITS, index)
+
+    def test_rebalance_moves_rows_with_ids_and_timestamps(self):
+        for title in ("One", "Two", "Three"):
+            self.create(title)
+        self.client.post(
+            "/todos/bulk/delete/", {"ids": [self.rows_on(self.source)[1][0]]}
+        )
+        before = self.rows_on(self.source)
+
+        call_command(
+            "rebalance_todos",
+            f"--user={self.user.id}",
+            f"--to={self.target}",
+            "--chunk-size=1",
+            stdout=StringIO(),
+        )
+        self.assertEqual(shards.shard_for(self.user.id), self.target)
+        self.assertEqual(self.rows_on(self.target), before)
+        self.assertEqual(self.rows_on(self.source), [])
+
+        self.create("Four")
+        get_cache().clear()
+        self.assertEqual(self.titles(), ["One", "Three", "Four"])
+
+    def test_writes_are_refused_while_moving(self):
+        TodoShardModel.objects.create(user_id=self.user, alias=self.source, moving=True)
+        response = self.client.post("/todos/create/", {"title": "Late"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.rows_on(self.source), [])
+        self.assertEqual(self.titles(), [])
+
+    def test_deleting_the_user_deletes_sharded_todos(self):
+        self.create("One")
+        self.user.delete()
+        self.assertEqual(self.rows_on(self.source), [])
@@ -1,20 +1,57 @@
+from django.conf import settings
 from django.urls import path
 
 
 from .views import (
     TodoListView,
     TodoRetrieveView,
+    TodoSearchView,
+    TodoStatsView,
+    TodoSyncView,
     IsFinishedSetTrueView,
     TodoCreateView,
+    TodoBulkCreateView,
+    TodoImportView,
     DeleteApiView,
     EditTodoApiView,
+    BulkFinishApiView,
+    BulkDeleteApiView,
+    BulkEditApiView,
+    TodoExportCreateView,
+    TodoExportStatusView,
+    TodoExportDownloadView,
 )
 
+from .async_views import TodoEventsView
+
+if settings.ASYNC_VIEWS:
+    # Same routes and responses, without holding a thread per request.
+    from .async_views import (  # noqa: F811
+        AsyncTodoListView as TodoListView,
+        AsyncTodoRetrieveView as TodoRetrieveView,
+        AsyncIsFinishedSetTrueView as IsFinishedSetTrueView,
+        AsyncTodoCreateView as TodoCreateView,
+        AsyncDeleteView as DeleteApiView,
+        AsyncEditTodoView as EditTodoApiView,
+    )
+
 urlpatterns = [
     path("todolist/", TodoListView.as_view()),
     path("todolist/<int:pk>/", TodoRetrieveView.as_view()),
+    path("search/", TodoSearchView.as_view()),
+    path("stats/", TodoStatsView.as_view()),
+    path("events/", TodoEventsView.as_view()),
+    path("sync/", TodoSyncView.as_view()),
     path("<int:pk>/finish/", IsFinishedSetTrueView.as_view()),
     path("create/", TodoCreateView.as_view()),
+    path("create/bulk/", TodoBulkCreateView.as_view()),
+    path("create/import/", TodoImportView.as_view()),
     path("<int:pk>/delete/", DeleteApiView.as_view()),
     path("<int:pk>/edit/", EditTodoApiView.as_view()),
+    path("bulk/finish/", BulkFinishApiView.as_view()),
+    path("bulk/delete/", BulkDeleteApiView.as_view()),
+    path("bulk/edit/", BulkEditApiView.as_view()),
+    path("exports/", TodoExportCreateView.as_view()),
+    path("exports/<int:pk>/", TodoExportStatusView.as_view()),
+    path("exports/<int:pk>/download/", TodoExportDownloadView.as_view()),
 ]
@@ -1,71 +1,319 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
-from .models import TodoModel
+from .models import TodoModel, TodoExportModel
+from .exports import download_response
+from .fast_serializers import (
+    TodoCompactRowSerializer,
+    TodoRowSerializer,
+    TodoSyncRowSerializer,
+    UserProfileRowSerializer,
+)
+from .imports import import_todos
+from .cache import PerUserCacheMixin
+from .conditional import ConditionalGetMixin, make_etag
+from .pagination import KeysetPagination, SearchPagination
+from .search import TodoSearch
+from .signals import send_todos_changed
+from .stats import get_stats
+from .sync import changes_since
+from .streaming import JSONArrayStream
+from config.replicas import ReplicaReadMixin
 from users.authentication import CustomUserJWTAuthentication
 from .serializers import (
-    TodoModelSerializer,
     TodoRertrieveSerializer,
     TodoCreateSerizalizer,
     TodoEditSerializer,
+    TodoFilterSerializer,
+    TodoSearchSerializer,
+    TodoBulkActionSerializer,
+    TodoBulkEditSerializer,
+    TodoExportCreateSerializer,
+    TodoExportSerializer,
 )
 
 
-class TodoListView(APIView):
+def run_bulk_action(request, serializer, action, write):
+    """
+    Applies `write` to the authenticated user's todos selected by `serializer`.
+
+    The matching ids are read and written inside one transaction, so the
+    reported ids are exactly the rows `write` touched.
+    """
+    todos = serializer.filter_queryset(TodoModel.objects.for_user(request.user.id))
+    with transaction.atomic(using=todos.db):
+        affected = list(todos.order_by("pk").values_list("pk", flat=True))
+        if affected:
+            write(todos)
+            send_todos_changed(request.user.id, action, affected, using=todos.db)
+    found = set(affected)
+    requested = dict.fromkeys(serializer.validated_data.get("ids", []))
+    return {
+        "affected": affected,
+        "not_found": [pk for pk in requested if pk not in found],
+    }
+
+
+bulk_selection_properties = {
+    "ids": openapi.Schema(
+        type=openapi.TYPE_ARRAY,
+        items=openapi.Items(type=openapi.TYPE_INTEGER),
+        description="Todo IDlari",
+    ),
+    "is_finished": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+    "is_urgent": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+    "deadline_after": openapi.Schema(
+        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+    ),
+    "deadline_before": openapi.Schema(
+        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+    ),
+}
+
+bulk_responses = {
+    200: openapi.Response(
+        description="Amal bajarildi",
+        schema=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "affected": openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Items(type=openapi.TYPE_INTEGER),
+                ),
+                "not_found": openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Items(type=openapi.TYPE_INTEGER),
+                ),
+            },
+        ),
+    ),
+    400: openapi.Response(
+        description="Validatsiya xatosi",
+        schema=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "error": openapi.Schema(type=openapi.TYPE_STRING),
+                "details": openapi.Schema(type=openapi.TYPE_OBJECT),
+            },
+        ),
+    ),
+    401: openapi.Response(description="Token noto‘g‘ri yoki mavjud emas"),
+}
+
+
+class TodoListView(ReplicaReadMixin, PerUserCacheMixin, ConditionalGetMixin, APIView):
     authentication_classes = [CustomUserJWTAuthentication]
+    honor_if_modified_since = False
 
     @swagger_auto_schema(
         operation_summary="Foydalanuvchining barcha todolarini olish",
         operation_description="Bu endpoint login bo‘lgan foydalanuvchining "
-        "barcha todolarini qaytaradi."
-        "Har bir todo elementda sarlavha, tavsif va tugallanganlik holati bo'ladi.",
+        "todolarini sahifalab qaytaradi. "
+        "Keyingi sahifa `next` havolasidagi `cursor` orqali olinadi. "
+        "Natijalarni holati va muddati bo‘yicha filtrlash mumkin.",
+        manual_parameters=[
+            openapi.Parameter(
+                "is_finished",
+                openapi.IN_QUERY,
+                description="Faqat bajarilgan (`true`) yoki bajarilmagan (`false`)",
+                type=openapi.TYPE_BOOLEAN,
+            ),
+            openapi.Parameter(
+                "is_urgent",
+                openapi.IN_QUERY,
+                description="Faqat shoshilinch (`true`) yoki oddiy (`false`)",
+                type=openapi.TYPE_BOOLEAN,
+            ),
+            openapi.Parameter(
+                "deadline_after",
+                openapi.IN_QUERY,
+                description="Muddati shu vaqtdan keyin yoki teng bo‘lganlar",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATETIME,
+            ),
+            openapi.Parameter(
+                "deadline_before",
+                openapi.IN_QUERY,
+                description="Muddati shu vaqtdan oldin bo‘lganlar",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATETIME,
+            ),
+            openapi.Parameter(
+                "cursor",
+                openapi.IN_QUERY,
+                description="Oldingi javobdagi `next` havolasidan olingan kursor",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "page_size",
+                openapi.IN_QUERY,
+                description="Sahifadagi todolar soni (maksimal qiymat cheklangan)",
+                type=openapi.TYPE_INTEGER,
+            ),
+            openapi.Parameter(
+                "ordering",
+                openapi.IN_QUERY,
+                description="Saralash tartibi",
+                type=openapi.TYPE_STRING,
+                enum=list(KeysetPagination.orderings),
+            ),
+            openapi.Parameter(
+                "stream",
+                openapi.IN_QUERY,
+                description="`true` bo‘lsa, filtrga mos barcha todolar sahifalanmasdan "
+                "oqim (streaming) ko‘rinishida yuboriladi; `cursor` va `page_size` "
+                "e’tiborga olinmaydi",
+                type=openapi.TYPE_BOOLEAN,
+            ),
+            openapi.Parameter(
+                "compact",
+                openapi.IN_QUERY,
+                description="`true` bo‘lsa, egasi (`user`) javob boshida bir marta "
+                "yuboriladi va todolarda `user_id` takrorlanmaydi",
+                type=openapi.TYPE_BOOLEAN,
+            ),
+        ],
         responses={
             200: openapi.Response(
                 description="Foydalanuvchining todolari muvaffaqiyatli olindi",
                 schema=openapi.Schema(
-                    type=openapi.TYPE_ARRAY,
-                    items=openapi.Items(
-                        type=openapi.TYPE_OBJECT,
-                        properties={
-                            "id": openapi.Schema(
-                                type=openapi.TYPE_INTEGER, description="Todo IDsi"
-                            ),
-                            "title": openapi.Schema(
-                                type=openapi.TYPE_STRING, description="Todo sarlavhasi"
-                            ),
-                            "description": openapi.Schema(
-                                type=openapi.TYPE_STRING, description="Todo tavsifi"
-                            ),
-                            "is_completed": openapi.Schema(
-                                type=openapi.TYPE_BOOLEAN,
-                                description="Todo bajarilganmi",
-                            ),
-                            "created_at": openapi.Schema(
-                                type=openapi.FORMAT_DATETIME,
-                                description="Yaratilgan vaqt",
-                            ),
-                            "updated_at": openapi.Schema(
-                                type=openapi.FORMAT_DATETIME,
-                                description="Yangilangan vaqt",
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "next": openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            format=openapi.FORMAT_URI,
+                            description="Keyingi sahifa havolasi yoki null",
+                        ),
+                        "results": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "id": openapi.Schema(
+                                        type=openapi.TYPE_INTEGER,
+                                        description="Todo IDsi",
+                                    ),
+                                    "title": openapi.Schema(
+                                        type=openapi.TYPE_STRING,
+                                        description="Todo sarlavhasi",
+                                    ),
+                                    "created_at": openapi.Schema(
+                                        type=openapi.FORMAT_DATETIME,
+                                        description="Yaratilgan vaqt",
+                                    ),
+                                    "deadline": openapi.Schema(
+                                        type=openapi.FORMAT_DATETIME,
+                                        description="Muddat",
+                                    ),
+                                    "user_id": openapi.Schema(
+                                        type=openapi.TYPE_OBJECT,
+                                        description="Todo egasi (compact "
+                                        "rejimda yuborilmaydi)",
+                                    ),
+                                },
                             ),
-                        },
-                    ),
+                        ),
+                    },
                 ),
             ),
+            400: openapi.Response(
+                description="Noto‘g‘ri filtr, `page_size` yoki `ordering`"
+            ),
+            304: openapi.Response(
+                description="`If-None-Match` dagi ETag hali ham dolzarb"
+            ),
             401: openapi.Response(description="Token mavjud emas yoki noto‘g‘ri"),
+            404: openapi.Response(description="Kursor noto‘g‘ri"),
         },
     )
     def get(self, request):
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            return cached
+
         user = self.request.user
-        todos = TodoModel.objects.filter(user_id=user)
-        serializer = TodoModelSerializer(todos, many=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        compact = request.query_params.get("compact", "").lower() in ("1", "true")
+        # A plain dict, so absent booleans stay absent instead of becoming False.
+        filters = TodoFilterSerializer(data=request.query_params.dict())
+        if not filters.is_valid():
+            return Response(
+                {"error": "Mistake on serializer", "details": filters.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        todos = filters.filter_queryset(TodoModel.objects.for_user(user.id))
 
+        # The whole filtered set is summarised by one index-only aggregate;
+        # the owner's name is part of the tag because it is serialized too.
+        summary = todos.aggregate(last_modified=Max("updated_at"), count=Count("id"))
+        etag = make_etag(
+            user.id,
+            user.name,
+            user.surname,
+            summary["count"],
+            summary["last_modified"],
+            request.accepted_media_type,
+            request.get_full_path(),
+        )
+        not_modified = self.not_modified(request, etag, summary["last_modified"])
+        if not_modified is not None:
+            return not_modified
+
+        # Rows are read as tuples and serialized by the fast-path serializers,
+        # which render the same JSON as TodoModelSerializer and
+        # TodoCompactSerializer. Every row belongs to the requesting user, so
+        # the owner is taken from request.user instead of a join.
+        if compact:
+            serializer_class = TodoCompactRowSerializer
+        else:
+            serializer_class = partial(TodoRowSerializer, owner=user)
+        todos = todos.values_list(*TodoCompactRowSerializer.values_fields(), named=True)
+        paginator = KeysetPagination()
+
+        if request.query_params.get("stream", "").lower() in ("1", "true"):
+            return self.stream(request, paginator, todos, serializer_class, compact)
+
+        page = paginator.paginate_queryset(todos, request, view=self)
+        data = serializer_class(page, many=True).data
+
+        if compact:
+            # The owner is sent once instead of in every row.
+            return paginator.get_paginated_response(data, user=self.owner(user))
+
+        return paginator.get_paginated_response(data)
+
+    def owner(self, user):
+        return UserProfileRowSerializer((user.id, user.name, user.surname)).data
+
+    def stream(self, request, paginator, todos, serializer_class, compact):
+        todos = paginator.order_queryset(todos, paginator.get_ordering(request))
+        # The rows are read after the view has returned, so the database
+        # chosen for this request is pinned now.
+        todos = todos.using(todos.db)
+        envelope = {"next": None}
+        if compact:
+            envelope["user"] = self.owner(request.user)
+        stream = JSONArrayStream(
+            todos,
+            serializer_class,
+            chunk_size=settings.TODO_STREAM_CHUNK_SIZE,
+            envelope=envelope,
+        )
+        return StreamingHttpResponse(stream, content_type="application/json")
 
-class TodoRetrieveView(APIView):
+
+class TodoRetrieveView(
+    ReplicaReadMixin, PerUserCacheMixin, ConditionalGetMixin, APIView
+):
     authentication_classes = [CustomUserJWTAuthentication]
 
     @swagger_auto_schema(
@@ -106,6 +354,10 @@ Agar todo topilmasa yoki foydalanuvchiga tegishli bo‘lmasa, 404 xato qaytarila
                     },
                 ),
             ),
+            304: openapi.Response(
+                description="`If-None-Match` yoki `If-Modified-Since` bo‘yicha "
+                "todo o‘zgarmagan"
+            ),
             404: openapi.Response(
                 description="Todo topilmadi yoki sizga tegishli emas",
                 schema=openapi.Schema(
@@ -122,9 +374,17 @@ Agar todo topilmasa yoki foydalanuvchiga tegishli bo‘lmasa, 404 xato qaytarila
         },
     )
     def get(self, request, pk):
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            return cached
+
         user_id = self.request.user
         try:
-            todo = TodoModel.objects.get(pk=pk, user_id=user_id)
+            todo = TodoModel.objects.for_user(user_id).get(pk=pk)
+            etag = make_etag(todo.pk, todo.updated_at, request.accepted_media_type)
+            not_modified = self.not_modified(request, etag, todo.updated_at)
+            if not_modified is not None:
+                return not_modified
             serializer = TodoRertrieveSerializer(todo)
             return Response(data=serializer.data, status=status.HTTP_200_OK)
         except TodoModel.DoesNotExist:
@@ -134,6 +394,177 @@ Agar todo topilmasa yoki foydalanuvchiga tegishli bo‘lmasa, 404 xato qaytarila
             )
 
 
+class TodoSearchView(ReplicaReadMixin, PerUserCacheMixin, APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Todolarni sarlavha bo‘yicha qidirish",
+        operation_description="Foydalanuvchining todolari orasidan sarlavhasida "
+        "`q` dagi barcha so‘zlar (so‘z boshi bo‘yicha) uchraganlarini qaytaradi. "
+        "Natijalar mosligi bo‘yicha (bm25) saralanadi va `cursor` orqali "
+        "sahifalanadi.",
+        manual_parameters=[
+            openapi.Parameter(
+                "q",
+                openapi.IN_QUERY,
+                description="Qidiruv matni",
+                type=openapi.TYPE_STRING,
+                required=True,
+            ),
+            openapi.Parameter(
+                "cursor",
+                openapi.IN_QUERY,
+                description="Oldingi javobdagi `next` havolasidan olingan kursor",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "page_size",
+                openapi.IN_QUERY,
+                description="Sahifadagi todolar soni (maksimal qiymat cheklangan)",
+                type=openapi.TYPE_INTEGER,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Topilgan todolar, eng mosi birinchi",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "next": openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            format=openapi.FORMAT_URI,
+                            description="Keyingi sahifa havolasi yoki null",
+                        ),
+                        "results": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_OBJECT),
+                        ),
+                    },
+                ),
+            ),
+            400: openapi.Response(description="`q` bo‘sh yoki so‘z yo‘q"),
+            401: openapi.Response(description="Token mavjud emas yoki noto‘g‘ri"),
+            404: openapi.Response(description="Kursor noto‘g‘ri"),
+        },
+    )
+    def get(self, request):
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            return cached
+
+        user = request.user
+        serializer = TodoSearchSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                {"error": "Mistake on serializer", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        todos = TodoModel.objects.for_user(user.id)
+        search = TodoSearch(user.id, serializer.validated_data["q"], todos.db)
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(search, request, view=self)
+
+        # The index only yields ids; the rows are read in one query and put
+        # back in rank order.
+        ids = [pk for pk, rank in page]
+        rows = todos.filter(pk__in=ids).values_list(
+            *TodoCompactRowSerializer.values_fields(), named=True
+        )
+        by_id = {row.id: row for row in rows}
+        rows = [by_id[pk] for pk in ids if pk in by_id]
+        data = TodoRowSerializer(rows, many=True, owner=user).data
+        return paginator.get_paginated_response(data)
+
+
+class TodoStatsView(ReplicaReadMixin, APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Todolar statistikasi",
+        operation_description="Foydalanuvchining jami, bajarilgan, shoshilinch "
+        "va muddati o‘tgan (bajarilmagan) todolari soni. Hisoblagichlar har bir "
+        "yozishda yangilanadi, shuning uchun todolar soniga bog‘liq emas.",
+        responses={
+            200: openapi.Response(
+                description="Statistika",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "total": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "finished": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "urgent": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "overdue": openapi.Schema(type=openapi.TYPE_INTEGER),
+                    },
+                ),
+            ),
+            401: openapi.Response(description="Token mavjud emas yoki noto‘g‘ri"),
+        },
+    )
+    def get(self, request):
+        return Response(get_stats(request.user.id), status=status.HTTP_200_OK)
+
+
+class TodoSyncView(ReplicaReadMixin, APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="O‘zgarishlarni sinxronlash",
+        operation_description="Oflayn mijozlar uchun: oldingi javobdagi `cursor` "
+        "dan keyin yaratilgan, o‘zgartirilgan (`todos`) va o‘chirilgan "
+        "(`deleted`) todolarni eskisidan boshlab qaytaradi. `cursor` siz so‘rov "
+        "barcha todolarni beradi. `has_more` true bo‘lsa, yangi `cursor` bilan "
+        "yana so‘raladi. `reset` true bo‘lsa, kursor eskirgan: mijoz saqlagan "
+        "todolarini o‘chirib, javobdagilar bilan boshlashi kerak.",
+        manual_parameters=[
+            openapi.Parameter(
+                "cursor",
+                openapi.IN_QUERY,
+                description="Oldingi javobdagi `cursor`",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "page_size",
+                openapi.IN_QUERY,
+                description="Javobdagi o‘zgarishlar soni (maksimal qiymat cheklangan)",
+                type=openapi.TYPE_INTEGER,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="O‘zgarishlar",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "todos": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_OBJECT),
+                        ),
+                        "deleted": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_INTEGER),
+                        ),
+                        "cursor": openapi.Schema(type=openapi.TYPE_STRING),
+                        "has_more": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        "reset": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    },
+                ),
+            ),
+            400: openapi.Response(description="`page_size` noto‘g‘ri"),
+            401: openapi.Response(description="Token mavjud emas yoki noto‘g‘ri"),
+            404: openapi.Response(description="Kursor noto‘g‘ri"),
+        },
+    )
+    def get(self, request):
+        changes = changes_since(
+            request.user.id,
+            request.query_params.get("cursor"),
+            KeysetPagination().get_page_size(request),
+            TodoSyncRowSerializer.values_fields(),
+        )
+        changes["todos"] = TodoSyncRowSerializer(changes["todos"], many=True).data
+        return Response(changes, status=status.HTTP_200_OK)
+
+
 class IsFinishedSetTrueView(APIView):
     authentication_classes = [CustomUserJWTAuthentication]
 
@@ -171,19 +602,16 @@ Faqat foydalanuvchining o‘ziga tegishli todo-larga ruxsat beriladi.
         },
     )
     def patch(self, request, pk):
-        user_id = self.request.user
-        try:
-            todo = TodoModel.objects.get(pk=pk, user_id=user_id)
-            todo.is_finished = True
-            todo.save()
-            return Response(
-                data={"message": "Todo is finished"}, status=status.HTTP_200_OK
-            )
-        except TodoModel.DoesNotExist:
+        user_id = self.request.user.id
+        todos = TodoModel.objects.for_user(user_id).filter(pk=pk)
+        updated = todos.update(is_finished=True, updated_at=timezone.now())
+        if not updated:
             return Response(
                 data={"error": "Todo does not exist or unauthorized"},
                 status=status.HTTP_404_NOT_FOUND,
             )
+        send_todos_changed(user_id, "finish", [pk], using=todos.db)
+        return Response(data={"message": "Todo is finished"}, status=status.HTTP_200_OK)
 
 
 class TodoCreateView(APIView):
@@ -241,7 +669,8 @@ Kerakli maydonlar: `title`, `description` (ixtiyoriy), `is_finished` (default: F
         )
 
         if serializer.is_valid():
-            serializer.save()
+            todo = serializer.save()
+            send_todos_changed(request.user.id, "create", [todo.pk])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(
@@ -250,6 +679,143 @@ Kerakli maydonlar: `title`, `description` (ixtiyoriy), `is_finished` (default: F
         )
 
 
+class TodoBulkCreateView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Bir nechta todoni bitta so‘rovda yaratish",
+        operation_description="""
+Oflayn yaratilgan todolarni sinxronlash uchun. So‘rov tanasi todolar ro‘yxatidan
+iborat, har bir element `todos/create/` bilan bir xil maydonlarga ega.
+Barcha elementlar bitta tranzaksiyada saqlanadi: biror element xato bo‘lsa,
+hech narsa yaratilmaydi va `details` da har bir element uchun xatolar qaytariladi.
+Javobdagi `ids` kiritilgan tartibda qaytariladi.
+        """,
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Items(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "title": openapi.Schema(type=openapi.TYPE_STRING),
+                    "deadline": openapi.Schema(
+                        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+                    ),
+                    "is_urgent": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                },
+            ),
+        ),
+        responses={
+            201: openapi.Response(
+                description="Todolar muvaffaqiyatli yaratildi",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "ids": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_INTEGER),
+                        )
+                    },
+                ),
+            ),
+            400: openapi.Response(
+                description="Validatsiya xatosi",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "error": openapi.Schema(
+                            type=openapi.TYPE_STRING, example="Mistake on serializer"
+                        ),
+                        "details": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(type=openapi.TYPE_OBJECT),
+                        ),
+                    },
+                ),
+            ),
+            401: openapi.Response(description="Token noto‘g‘ri yoki mavjud emas"),
+        },
+    )
+    def post(self, request):
+        serializer = TodoCreateSerizalizer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.TODO_BULK_MAX_ITEMS,
+            context={"request": request},
+        )
+
+        if serializer.is_valid():
+            todos = serializer.save()
+            send_todos_changed(request.user.id, "create", [todo.pk for todo in todos])
+            return Response(
+                {"ids": [todo.pk for todo in todos]}, status=status.HTTP_201_CREATED
+            )
+
+        return Response(
+            {"error": "Mistake on serializer", "details": serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class TodoImportView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Todolarni NDJSON fayldan import qilish",
+        operation_description="""
+Boshqa ilovalardan ko‘chish uchun. So‘rov tanasi NDJSON: har bir qatorda
+`todos/create/` bilan bir xil maydonlarga ega bitta JSON obyekt.
+`Content-Encoding: gzip` bilan siqilgan tana ham qabul qilinadi.
+Tana oqim sifatida qatorma-qator o‘qiladi va todolar
+`TODO_IMPORT_CHUNK_SIZE` tadan alohida tranzaksiyalarda saqlanadi, shuning uchun
+xato qatorlar qolganlarini to‘xtatmaydi. Javobda xato qatorlar raqami bilan
+qaytariladi (dastlabki `TODO_IMPORT_MAX_ERRORS` tasi).
+        """,
+        request_body=openapi.Schema(
+            type=openapi.TYPE_STRING,
+            format=openapi.FORMAT_BINARY,
+            description="application/x-ndjson",
+        ),
+        responses={
+            200: openapi.Response(
+                description="Import yakunlandi",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "lines": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "created": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "failed": openapi.Schema(type=openapi.TYPE_INTEGER),
+                        "errors": openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            items=openapi.Items(
+                                type=openapi.TYPE_OBJECT,
+                                properties={
+                                    "line": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                    "errors": openapi.Schema(type=openapi.TYPE_OBJECT),
+                                },
+                            ),
+                        ),
+                    },
+                ),
+            ),
+            400: openapi.Response(
+                description="gzip tana buzilgan; `details` da saqlangan qism"
+            ),
+            401: openapi.Response(description="Token noto‘g‘ri yoki mavjud emas"),
+        },
+    )
+    def post(self, request):
+        summary, error = import_todos(request)
+
+        if error is None:
+            return Response(data=summary, status=status.HTTP_200_OK)
+
+        return Response(
+            data={"error": error, "details": summary},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
 class DeleteApiView(APIView):
     authentication_classes = [CustomUserJWTAuthentication]
 
@@ -290,19 +856,19 @@ Agar todo mavjud bo‘lmasa yoki boshqa foydalanuvchiga tegishli bo‘lsa, 404 q
     def delete(self, request, pk):
         user_id = request.user.id
 
-        try:
-            todo = TodoModel.objects.get(user_id=user_id, pk=pk)
-            todo.delete()
-            return Response(
-                data={"message": "Deleted successfully"}, status=status.HTTP_200_OK
-            )
-        except TodoModel.DoesNotExist:
+        todos = TodoModel.objects.for_user(user_id).filter(pk=pk)
+        deleted, _ = todos.delete()
+        if not deleted:
             return Response(
                 data={
                     "error": "Does not exist or the object does not belong to the user"
                 },
                 status=status.HTTP_404_NOT_FOUND,
             )
+        send_todos_changed(user_id, "delete", [pk], using=todos.db)
+        return Response(
+            data={"message": "Deleted successfully"}, status=status.HTTP_200_OK
+        )
 
 
 class EditTodoApiView(APIView):
@@ -355,24 +921,222 @@ Ushbu endpoint orqali foydalanuvchi o'ziga tegishli todo yozuvini yangilashi mum
     )
     def put(self, request, pk):
         user_id = request.user.id
+        todos = TodoModel.objects.for_user(user_id).filter(pk=pk)
+        not_found = {
+            "error": "Does not exist or the object does not belong to the user"
+        }
+
+        serializer = TodoEditSerializer(data=request.data, partial=True)
+
+        if not serializer.is_valid():
+            # A missing todo still wins over a bad body, as it always has.
+            if not todos.exists():
+                return Response(data=not_found, status=status.HTTP_404_NOT_FOUND)
+            return Response(
+                data={"error": "Mistake on serializer", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if serializer.validated_data:
+            found = todos.update(**serializer.validated_data, updated_at=timezone.now())
+        else:
+            found = todos.exists()
+        if not found:
+            return Response(data=not_found, status=status.HTTP_404_NOT_FOUND)
+        send_todos_changed(user_id, "edit", [pk], using=todos.db)
+        return Response(data={"message": "Edited"}, status=status.HTTP_200_OK)
+
+
+class BulkFinishApiView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Bir nechta todoni bajarilgan deb belgilash",
+        operation_description="""
+Todolar `ids` ro‘yxati yoki filtrlar (`is_finished`, `is_urgent`,
+`deadline_after`, `deadline_before`) orqali tanlanadi. Ikkalasi berilsa,
+ikkala shartga mos todolar belgilanadi.
+        """,
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT, properties=bulk_selection_properties
+        ),
+        responses=bulk_responses,
+    )
+    def patch(self, request):
+        serializer = TodoBulkActionSerializer(data=request.data)
+
+        if serializer.is_valid():
+            result = run_bulk_action(
+                request,
+                serializer,
+                "finish",
+                lambda todos: todos.update(is_finished=True, updated_at=timezone.now()),
+            )
+            return Response(data=result, status=status.HTTP_200_OK)
+
+        return Response(
+            data={"error": "Mistake on serializer", "details": serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
 
+class BulkDeleteApiView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Bir nechta todoni o‘chirish",
+        operation_description="""
+Todolar `ids` ro‘yxati yoki filtrlar orqali tanlanadi, masalan
+`{"is_finished": true, "deadline_before": "..."}` muddati o‘tgan
+bajarilgan todolarni o‘chiradi.
+        """,
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT, properties=bulk_selection_properties
+        ),
+        responses=bulk_responses,
+    )
+    def post(self, request):
+        serializer = TodoBulkActionSerializer(data=request.data)
+
+        if serializer.is_valid():
+            result = run_bulk_action(
+                request, serializer, "delete", lambda todos: todos.delete()
+            )
+            return Response(data=result, status=status.HTTP_200_OK)
+
+        return Response(
+            data={"error": "Mistake on serializer", "details": serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class BulkEditApiView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Bir nechta todoni tahrirlash",
+        operation_description="""
+Tanlangan todolarning barchasiga bir xil `title` va/yoki `deadline` qo‘yiladi.
+Todolar `ids` ro‘yxati yoki filtrlar orqali tanlanadi.
+        """,
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                **bulk_selection_properties,
+                "title": openapi.Schema(type=openapi.TYPE_STRING),
+                "deadline": openapi.Schema(
+                    type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+                ),
+            },
+        ),
+        responses=bulk_responses,
+    )
+    def put(self, request):
+        serializer = TodoBulkEditSerializer(data=request.data)
+
+        if serializer.is_valid():
+            changes = {**serializer.get_changes(), "updated_at": timezone.now()}
+            result = run_bulk_action(
+                request, serializer, "edit", lambda todos: todos.update(**changes)
+            )
+            return Response(data=result, status=status.HTTP_200_OK)
+
+        return Response(
+            data={"error": "Mistake on serializer", "details": serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class TodoExportCreateView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Todolarni faylga eksport qilishni navbatga qo‘yish",
+        operation_description="""
+Foydalanuvchining barcha todolari fon jarayonida (`manage.py run_exports`)
+CSV yoki NDJSON faylga yoziladi, `gzip=true` bo‘lsa siqiladi.
+Holatini `todos/exports/<id>/` orqali kuzatish mumkin.
+        """,
+        request_body=TodoExportCreateSerializer,
+        responses={
+            202: openapi.Response(
+                description="Eksport navbatga qo‘yildi", schema=TodoExportSerializer
+            ),
+            400: openapi.Response(description="Validatsiya xatosi"),
+            401: openapi.Response(description="Token noto‘g‘ri yoki mavjud emas"),
+        },
+    )
+    def post(self, request):
+        serializer = TodoExportCreateSerializer(data=request.data)
+
+        if serializer.is_valid():
+            export = serializer.save(user_id_id=request.user.id)
+            return Response(
+                TodoExportSerializer(export).data, status=status.HTTP_202_ACCEPTED
+            )
+
+        return Response(
+            {"error": "Mistake on serializer", "details": serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class TodoExportStatusView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Eksport holatini olish",
+        responses={
+            200: openapi.Response(
+                description="Eksport holati", schema=TodoExportSerializer
+            ),
+            404: openapi.Response(description="Eksport topilmadi"),
+            401: openapi.Response(description="Token noto‘g‘ri yoki mavjud emas"),
+        },
+    )
+    def get(self, request, pk):
         try:
-            todo = TodoModel.objects.get(user_id=user_id, pk=pk)
-        except TodoModel.DoesNotExist:
+            export = TodoExportModel.objects.get(pk=pk, user_id=request.user.id)
+        except TodoExportModel.DoesNotExist:
             return Response(
-                data={
-                    "error": "Does not exist or the object does not belong to the user"
-                },
+                data={"error": "Does not exist or not authenticated"},
                 status=status.HTTP_404_NOT_FOUND,
             )
+        return Response(
+            data=TodoExportSerializer(export).data, status=status.HTTP_200_OK
+        )
 
-        serializer = TodoEditSerializer(instance=todo, data=request.data, partial=True)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(data={"message": "Edited"}, status=status.HTTP_200_OK)
-        else:
+class TodoExportDownloadView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Tayyor eksport faylini yuklab olish",
+        operation_description="""
+`Range: bytes=<start>-` sarlavhasi bilan uzilgan yuklab olishni davom ettirish
+mumkin (206 Partial Content). `If-Range` da oldingi `ETag` yuborilsa, fayl
+o‘zgargan holda butun fayl qaytariladi.
+        """,
+        responses={
+            200: openapi.Response(description="Butun fayl"),
+            206: openapi.Response(description="Faylning so‘ralgan qismi"),
+            404: openapi.Response(description="Eksport topilmadi"),
+            409: openapi.Response(description="Eksport hali tayyor emas"),
+            416: openapi.Response(description="So‘ralgan oraliq fayldan tashqarida"),
+            401: openapi.Response(description="Token noto‘g‘ri yoki mavjud emas"),
+        },
+    )
+    def get(self, request, pk):
+        try:
+            export = TodoExportModel.objects.get(pk=pk, user_id=request.user.id)
+        except TodoExportModel.DoesNotExist:
             return Response(
-                data={"error": "Mistake on serializer", "details": serializer.errors},
-                status=status.HTTP_400_BAD_REQUEST,
+                data={"error": "Does not exist or not authenticated"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if export.status != TodoExportModel.DONE:
+            return Response(
+                data={"error": "Export is not ready", "status": export.status},
+                status=status.HTTP_409_CONFLICT,
             )
+        return download_response(request, export)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 
-from .models import UserModel
+from .models import UserModel, EmailOutboxModel
 
 
 class UserModelAdmin(admin.ModelAdmin):
@@ -10,3 +10,11 @@ class UserModelAdmin(admin.ModelAdmin):
 
 
 admin.site.register(UserModel, UserModelAdmin)
+
+
+class EmailOutboxModelAdmin(admin.ModelAdmin):
+    list_display = ["subject", "recipients", "status", "attempts", "next_attempt_at"]
+    list_filter = ["status"]
+
+
+admin.site.register(EmailOutboxModel, EmailOutboxModelAdmin)
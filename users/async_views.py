@@ -0,0 +1,19 @@
+"""Async version of `MyInfoView`, served when `settings.ASYNC_VIEWS` is set."""
+
+from rest_framework import status
+
+
+from config.async_views import AsyncAPIView, render
+from .models import UserModel
+from .serializers import MyInfoSerializer
+
+
+class AsyncMyInfoView(AsyncAPIView):
+    replica_reads = True
+
+    async def get(self, request):
+        try:
+            user = await UserModel.objects.aget(id=request.user.id)
+        except UserModel.DoesNotExist:
+            return render({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        return render(MyInfoSerializer(instance=user).data)
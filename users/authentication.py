@@ -1,14 +1,49 @@
+import copy
+import hashlib
+import time
+
+from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
-from rest_framework_simplejwt.tokens import UntypedToken
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 
 
+from config.metrics import timed
+from .cache import token_cache, user_cache
 from .models import UserModel
+from .tokens import (
+    TOKEN_VERSION_CLAIM,
+    aget_token_version,
+    get_token_version,
+    user_from_claims,
+)
 
 
 class CustomUserJWTAuthentication(BaseAuthentication):
+    """
+    Authenticates `Authorization: Bearer <access token>`.
+
+    `authenticate()` serves DRF views; `aauthenticate()` does the same for
+    the async views in `config.async_views` without blocking the event loop.
+    """
+
     def authenticate(self, request):
+        with timed("auth"):
+            payload = self.get_validated_payload(self.get_raw_token(request))
+            if TOKEN_VERSION_CLAIM in payload:
+                return (self.get_claims_user(payload), None)
+            # Tokens issued before claims were added still load the user.
+            return (self.get_user(payload["id"]), None)
+
+    async def aauthenticate(self, request):
+        with timed("auth"):
+            payload = self.get_validated_payload(self.get_raw_token(request))
+            if TOKEN_VERSION_CLAIM in payload:
+                return (await self.aget_claims_user(payload), None)
+            return (await self.aget_user(payload["id"]), None)
+
+    def get_raw_token(self, request):
         auth_header = request.headers.get("Authorization")
         if not auth_header:
             raise exceptions.AuthenticationFailed(
@@ -21,14 +56,59 @@ class CustomUserJWTAuthentication(BaseAuthentication):
             raise exceptions.AuthenticationFailed(
                 "Authorization header must contain two space-delimited values"
             )
-        try:
-            UntypedToken(token)
-        except (InvalidToken, TokenError) as e:
-            raise exceptions.AuthenticationFailed(f"Token invalid: {e}")
-        user_id = UntypedToken(token)["id"]
-        try:
-            students = UserModel.objects.get(id=user_id)
-        except UserModel.DoesNotExist:
+        return token
+
+    def get_validated_payload(self, token):
+        # The signature is checked once per token; afterwards the payload is
+        # served from the cache until the token's own "exp".
+        digest = hashlib.sha256(token.encode()).digest()
+        payload = token_cache.get(digest)
+        if payload is None:
+            try:
+                payload = AccessToken(token).payload
+            except (InvalidToken, TokenError) as e:
+                raise exceptions.AuthenticationFailed(f"Token invalid: {e}")
+            token_cache.set(digest, payload, expires_at=payload["exp"])
+        return payload
+
+    def get_user(self, user_id):
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = UserModel.objects.get(id=user_id)
+            except UserModel.DoesNotExist:
+                raise exceptions.AuthenticationFailed("User not found")
+            user_cache.set(
+                user_id, user, expires_at=time.time() + settings.AUTH_USER_CACHE_TTL
+            )
+        # Views get their own copy so nothing they change leaks into the cache.
+        return copy.copy(user)
+
+    async def aget_user(self, user_id):
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await UserModel.objects.aget(id=user_id)
+            except UserModel.DoesNotExist:
+                raise exceptions.AuthenticationFailed("User not found")
+            user_cache.set(
+                user_id, user, expires_at=time.time() + settings.AUTH_USER_CACHE_TTL
+            )
+        return copy.copy(user)
+
+    def get_claims_user(self, payload):
+        # The only lookup left: the version, which is served from the cache.
+        version = get_token_version(payload["id"])
+        if version is None:
             raise exceptions.AuthenticationFailed("User not found")
+        if version != payload[TOKEN_VERSION_CLAIM]:
+            raise exceptions.AuthenticationFailed("Token revoked")
+        return user_from_claims(payload)
 
-        return (students, None)
+    async def aget_claims_user(self, payload):
+        version = await aget_token_version(payload["id"])
+        if version is None:
+            raise exceptions.AuthenticationFailed("User not found")
+        if version != payload[TOKEN_VERSION_CLAIM]:
+            raise exceptions.AuthenticationFailed("Token revoked")
+        return user_from_claims(payload)
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU mapping whose entries can carry an expiry.
+
+    Entries are stored with an absolute unix timestamp after which they are
+    treated as missing. Hits and misses are counted so the size can be tuned.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+# Verified JWT payloads keyed by the SHA-256 digest of the raw token.
+token_cache = LRUCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+# UserModel snapshots keyed by id, dropped by users.signals on save/delete.
+user_cache = LRUCache(settings.AUTH_USER_CACHE_SIZE)
+
+
+def cache_stats():
+    return {"token": token_cache.stats(), "user": user_cache.stats()}
@@ -0,0 +1,133 @@
+import datetime
+import time
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import EmailOutboxModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver pending EmailOutboxModel messages over one SMTP connection per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--max-attempts", type=int, default=settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new messages instead of exiting when idle.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls when --loop is set.",
+        )
+
+    def handle(self, *args, **options):
+        self.max_attempts = options["max_attempts"]
+        while True:
+            sent = failed = 0
+            while True:
+                batch_sent, batch_failed = self.send_batch(options["batch_size"])
+                sent += batch_sent
+                failed += batch_failed
+                if batch_sent + batch_failed < options["batch_size"]:
+                    break
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} message(s), {failed} failed attempt(s)")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def send_batch(self, batch_size):
+        ids = list(
+            self.due()
+            .order_by("next_attempt_at", "id")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+        messages = self.claim(ids)
+        if not messages:
+            return 0, 0
+
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            for message in messages:
+                self.retry_later(message, e)
+            return 0, len(messages)
+
+        sent = failed = 0
+        try:
+            for message in messages:
+                email = EmailMessage(
+                    subject=message.subject,
+                    body=message.message,
+                    from_email=message.from_email,
+                    to=message.recipients,
+                    connection=connection,
+                )
+                try:
+                    email.send()
+                except Exception as e:
+                    self.retry_later(message, e)
+                    failed += 1
+                else:
+                    message.status = EmailOutboxModel.SENT
+                    message.attempts += 1
+                    message.sent_at = timezone.now()
+                    message.save(update_fields=["status", "attempts", "sent_at"])
+                    sent += 1
+        finally:
+            connection.close()
+        return sent, failed
+
+    def due(self):
+        return EmailOutboxModel.objects.filter(
+            status=EmailOutboxModel.PENDING, next_attempt_at__lte=timezone.now()
+        )
+
+    def claim(self, ids):
+        """
+        Claims the messages of `ids` that are still due and returns them.
+
+        Claiming is a conditional UPDATE, so concurrent workers never send
+        the same message twice. It moves the next attempt past the claim
+        timeout, so the messages of a worker that died are retried then.
+        """
+        token = uuid.uuid4().hex
+        self.due().filter(pk__in=ids).update(
+            claimed_by=token,
+            next_attempt_at=timezone.now()
+            + datetime.timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT),
+        )
+        return list(
+            EmailOutboxModel.objects.filter(claimed_by=token).order_by(
+                "next_attempt_at", "id"
+            )
+        )
+
+    def retry_later(self, message, error):
+        message.attempts += 1
+        message.last_error = f"{type(error).__name__}: {error}"
+        if message.attempts >= self.max_attempts:
+            message.status = EmailOutboxModel.FAILED
+        else:
+            delay = settings.EMAIL_OUTBOX_RETRY_BACKOFF * 2 ** (message.attempts - 1)
+            message.next_attempt_at = timezone.now() + datetime.timedelta(seconds=delay)
+        message.save(
+            update_fields=["attempts", "last_error", "status", "next_attempt_at"]
+        )
@@ -1,6 +1,8 @@
 import random
+from django.conf import settings
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 
 def validate_password(value: str):
@@ -32,6 +34,8 @@ class UserModel(models.Model):
     image = models.ImageField(upload_to="user/", null=True, blank=True, default="")
     otp = models.CharField(max_length=5, default=create_otp())
     is_active = models.BooleanField(default=False)
+    # Copied into every token; bumping it revokes all of the user's tokens.
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = ["email"]
 
@@ -42,3 +46,70 @@ class UserModel(models.Model):
 
     def __str__(self):
         return self.name + " " + self.surname
+
+
+class EmailOutboxModel(models.Model):
+    """
+    Outgoing email waiting for the `send_outbox` worker.
+
+    Rows are written in the same transaction as whatever triggered the mail,
+    so a message is never lost and never sent for a rolled-back change.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # The send_outbox run that last claimed the message.
+    claimed_by = models.CharField(max_length=32, blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "email_outbox"
+        verbose_name = "Xat"
+        verbose_name_plural = "Yuborilmagan xatlar"
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="email_outbox_due_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+    @classmethod
+    def enqueue(cls, subject, message, recipient_list, from_email=None):
+        return cls.objects.create(
+            subject=subject,
+            message=message,
+            from_email=from_email or settings.EMAIL_HOST_USER,
+            recipients=list(recipient_list),
+        )
+
+
+class UsedRefreshTokenModel(models.Model):
+    """
+    A refresh token already exchanged at /users/token/refresh/. Kept until
+    the token expires, after which it is rejected anyway.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "used_refresh_tokens"
+        verbose_name = "Ishlatilgan token"
+        verbose_name_plural = "Ishlatilgan tokenlar"
+
+    def __str__(self):
+        return self.jti
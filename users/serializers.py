@@ -1,4 +1,4 @@
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import CharField, ModelSerializer, Serializer
 
 
 from .models import UserModel
@@ -35,3 +35,7 @@ class VerifyStudent(ModelSerializer):
     class Meta:
         model = UserModel
         fields = ["otp"]
+
+
+class RefreshTokenSerializer(Serializer):
+    refresh_token = CharField()
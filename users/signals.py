@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+from config import replicas
+from .cache import user_cache
+from .models import UserModel
+from .tokens import forget_token_version
+
+
+@receiver(post_save, sender=UserModel)
+@receiver(post_delete, sender=UserModel)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.pop(instance.pk)
+    forget_token_version(instance.pk)
+
+
+@receiver(post_save, sender=UserModel)
+def stick_to_primary(sender, instance, **kwargs):
+    replicas.mark_sticky(instance.pk)
@@ -0,0 +1,250 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .async_views import AsyncMyInfoView
+from .authentication import CustomUserJWTAuthentication
+from .cache import token_cache, user_cache
+from .management.commands import send_outbox
+from .models import EmailOutboxModel, UserModel
+from .tokens import (
+    UserRefreshToken,
+    forget_token_version,
+    get_cache,
+    revoke_tokens,
+)
+
+
+# Deleting a user also deletes their todos; keep that on the primary.
+@override_settings(TODO_SHARDS=["default"])
+class CustomUserJWTAuthenticationCacheTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        user_cache.clear()
+        self.user = UserModel.objects.create(name="Ali", email="ali@example.com")
+        token = RefreshToken.for_user(self.user).access_token
+        self.request = APIRequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.auth = CustomUserJWTAuthentication()
+
+    def test_steady_state_needs_no_query(self):
+        with self.assertNumQueries(1):
+            self.auth.authenticate(self.request)
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate(self.request)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token_cache.stats()["hits"], 1)
+        self.assertEqual(user_cache.stats()["hits"], 1)
+
+    def test_save_and_delete_invalidate_user(self):
+        self.auth.authenticate(self.request)
+        self.user.name = "Vali"
+        self.user.save()
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate(self.request)
+        self.assertEqual(user.name, "Vali")
+
+        self.user.delete()
+        with self.assertRaisesMessage(AuthenticationFailed, "User not found"):
+            self.auth.authenticate(self.request)
+
+    def test_invalid_token_is_rejected(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION="Bearer abc.def.ghi")
+        with self.assertRaisesMessage(AuthenticationFailed, "Token invalid"):
+            self.auth.authenticate(request)
+        self.assertEqual(token_cache.stats()["size"], 0)
+
+    def test_refresh_token_is_not_an_access_token(self):
+        token = RefreshToken.for_user(self.user)
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        with self.assertRaisesMessage(AuthenticationFailed, "wrong type"):
+            self.auth.authenticate(request)
+
+
+@override_settings(TODO_SHARDS=["default"])
+class ClaimsTokenTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        get_cache().clear()
+        self.user = UserModel.objects.create(
+            name="Ali", surname="Valiyev", email="ali@example.com", is_active=True
+        )
+        self.refresh = UserRefreshToken.for_user(self.user)
+        self.auth = CustomUserJWTAuthentication()
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.auth.authenticate(request)[0]
+
+    def test_user_is_built_from_claims(self):
+        access = self.refresh.access_token
+        with self.assertNumQueries(1):
+            self.authenticate(access)
+        with self.assertNumQueries(0):
+            user = self.authenticate(access)
+        self.assertIsInstance(user, UserModel)
+        self.assertEqual(
+            (user.pk, user.name, user.surname, user.is_active),
+            (self.user.pk, "Ali", "Valiyev", True),
+        )
+        # Fields outside the token are loaded on demand.
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "ali@example.com")
+
+    def test_cache_stats_are_published(self):
+        access = self.refresh.access_token
+        self.authenticate(access)
+        self.authenticate(access)
+        text = self.client.get("/metrics").content.decode()
+        self.assertIn('auth_cache_hits{cache="token"} 1', text)
+        self.assertIn('auth_cache_misses{cache="token"} 1', text)
+        self.assertIn('auth_cache_entries{cache="token"} 1', text)
+
+    def test_logout_revokes_tokens(self):
+        access = self.refresh.access_token
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/users/logout/", **headers)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertRaisesMessage(AuthenticationFailed, "Token revoked"):
+            self.authenticate(access)
+        response = self.client.post(
+            "/users/token/refresh/", {"refresh_token": str(self.refresh)}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "Token revoked"})
+
+    def test_refresh_issues_tokens_with_current_claims(self):
+        self.user.name = "Vali"
+        self.user.save()
+        response = self.client.post(
+            "/users/token/refresh/", {"refresh_token": str(self.refresh)}
+        )
+        self.assertEqual(response.status_code, 200)
+        user = self.authenticate(response.json()["access_token"])
+        self.assertEqual(user.name, "Vali")
+
+    def test_refresh_token_is_single_use(self):
+        response = self.client.post(
+            "/users/token/refresh/", {"refresh_token": str(self.refresh)}
+        )
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()["refresh_token"]
+
+        response = self.client.post(
+            "/users/token/refresh/", {"refresh_token": str(self.refresh)}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "Token already used"})
+        response = self.client.post("/users/token/refresh/", {"refresh_token": rotated})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_myinfo_uses_claims(self):
+        request = AsyncRequestFactory().get(
+            "/users/myinfo/",
+            headers={"Authorization": f"Bearer {self.refresh.access_token}"},
+        )
+        response = await AsyncMyInfoView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["email"], "ali@example.com")
+
+        await sync_to_async(revoke_tokens)(self.user.pk)
+        await sync_to_async(forget_token_version)(self.user.pk)
+        response = await AsyncMyInfoView.as_view()(request)
+        self.assertEqual(
+            (response.status_code, json.loads(response.content)),
+            (403, {"detail": "Token revoked"}),
+        )
+
+    def test_deleted_user_is_rejected(self):
+        access = self.refresh.access_token
+        self.user.delete()
+        with self.assertRaisesMessage(AuthenticationFailed, "User not found"):
+            self.authenticate(access)
+
+
+class EmailOutboxTests(TestCase):
+    def register(self):
+        return self.client.post(
+            "/users/create/",
+            {
+                "name": "Ali",
+                "surname": "Valiyev",
+                "age": 20,
+                "email": "ali@example.com",
+                "password": "secret123",
+            },
+        )
+
+    def test_registration_queues_otp(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+
+        message = EmailOutboxModel.objects.get()
+        self.assertEqual(message.recipients, ["ali@example.com"])
+        self.assertIn(UserModel.objects.get().otp, message.message)
+
+        call_command("send_outbox", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["ali@example.com"])
+        message.refresh_from_db()
+        self.assertEqual(message.status, EmailOutboxModel.SENT)
+
+    def test_concurrent_runs_send_once(self):
+        message = EmailOutboxModel.enqueue("Subject", "Body", ["a@example.com"])
+        command = send_outbox.Command()
+        command.max_attempts = 5
+        claim = command.claim
+
+        def racing_claim(ids):
+            # Another run claims the same messages first.
+            self.assertEqual(len(send_outbox.Command().claim(ids)), 1)
+            return claim(ids)
+
+        with mock.patch.object(command, "claim", racing_claim):
+            self.assertEqual(command.send_batch(10), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+        # That run died; the message is retried once its claim times out.
+        call_command("send_outbox", stdout=StringIO())
+        self.assertEqual(mail.outbox, [])
+        EmailOutboxModel.objects.update(next_attempt_at=timezone.now())
+        call_command("send_outbox", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        message.refresh_from_db()
+        self.assertEqual(message.status, EmailOutboxModel.SENT)
+
+    @override_settings(EMAIL_OUTBOX_RETRY_BACKOFF=60)
+    def test_failures_back_off_then_give_up(self):
+        message = EmailOutboxModel.enqueue("Subject", "Body", ["a@example.com"])
+        send = "django.core.mail.backends.locmem.EmailBackend.send_messages"
+        with mock.patch(send, side_effect=OSError("SMTP down")):
+            call_command("send_outbox", "--max-attempts=2", stdout=StringIO())
+            message.refresh_from_db()
+            self.assertEqual(message.status, EmailOutboxModel.PENDING)
+            self.assertEqual(message.attempts, 1)
+            self.assertEqual(message.last_error, "OSError: SMTP down")
+            self.assertGreater(message.next_attempt_at, timezone.now())
+
+            # Not due yet, so nothing is retried.
+            call_command("send_outbox", "--max-attempts=2", stdout=StringIO())
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, 1)
+
+            EmailOutboxModel.objects.update(next_attempt_at=timezone.now())
+            call_command("send_outbox", "--max-attempts=2", stdout=StringIO())
+            message.refresh_from_db()
+            self.assertEqual(message.status, EmailOutboxModel.FAILED)
+        self.assertEqual(mail.outbox, [])
@@ -0,0 +1,132 @@
+"""
+Access tokens that carry the claims the views need.
+
+Besides the user id, tokens issued by `UserRefreshToken` hold the user's
+name, surname, `is_active` and `token_version`. `CustomUserJWTAuthentication`
+builds `request.user` from those claims instead of loading the row, and only
+checks the version against the `AUTH_TOKEN_VERSION_CACHE_ALIAS` cache.
+Bumping the version with `revoke_tokens()` invalidates every token issued
+before. Refresh tokens are single use: `consume_refresh_token()` records
+each one exchanged for new tokens.
+
+Claims are a snapshot: a renamed user keeps the old name in `request.user`
+until their access token is refreshed, which the short access lifetime
+bounds.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+from .models import UsedRefreshTokenModel, UserModel
+
+
+TOKEN_VERSION_CLAIM = "ver"
+
+# In the order of the model's fields, as `Model.from_db()` expects.
+CLAIM_FIELDS = ["name", "surname", "is_active"]
+
+
+class UserRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        # Claims are copied to the access token by `access_token`.
+        return token
+
+
+def get_cache():
+    return caches[settings.AUTH_TOKEN_VERSION_CACHE_ALIAS]
+
+
+def version_key(user_id):
+    return f"users:token_version:{user_id}"
+
+
+def get_token_version(user_id):
+    """The user's current token version, or None if the user is gone."""
+    cache = get_cache()
+    version = cache.get(version_key(user_id))
+    if version is None:
+        version = (
+            UserModel.objects.filter(pk=user_id)
+            .values_list("token_version", flat=True)
+            .first()
+        )
+        if version is not None:
+            cache.set(
+                version_key(user_id),
+                version,
+                settings.AUTH_TOKEN_VERSION_CACHE_TIMEOUT,
+            )
+    return version
+
+
+async def aget_token_version(user_id):
+    cache = get_cache()
+    version = await cache.aget(version_key(user_id))
+    if version is None:
+        version = await (
+            UserModel.objects.filter(pk=user_id)
+            .values_list("token_version", flat=True)
+            .afirst()
+        )
+        if version is not None:
+            await cache.aset(
+                version_key(user_id),
+                version,
+                settings.AUTH_TOKEN_VERSION_CACHE_TIMEOUT,
+            )
+    return version
+
+
+def forget_token_version(user_id):
+    get_cache().delete(version_key(user_id))
+
+
+def revoke_tokens(user_id):
+    """Invalidates every access and refresh token issued to the user."""
+    UserModel.objects.filter(pk=user_id).update(token_version=F("token_version") + 1)
+    transaction.on_commit(lambda: forget_token_version(user_id))
+
+
+def consume_refresh_token(token):
+    """
+    Marks a refresh token as used. Returns False if it already was, including
+    when a concurrent request with the same token got there first.
+    """
+    expires_at = datetime.datetime.fromtimestamp(token["exp"], tz=datetime.timezone.utc)
+    try:
+        with transaction.atomic():
+            UsedRefreshTokenModel.objects.create(
+                jti=token[api_settings.JTI_CLAIM], expires_at=expires_at
+            )
+    except IntegrityError:
+        return False
+    UsedRefreshTokenModel.objects.filter(expires_at__lt=timezone.now()).delete()
+    return True
+
+
+def user_from_claims(payload):
+    """
+    A `UserModel` instance built from the token's claims. Fields that are not
+    in the token are deferred, so reading one loads it from the database and
+    `save()` only writes the fields taken from the claims.
+    """
+    field_names = ["id", *CLAIM_FIELDS, "token_version"]
+    values = [
+        payload[api_settings.USER_ID_CLAIM],
+        *(payload[field] for field in CLAIM_FIELDS),
+        payload[TOKEN_VERSION_CLAIM],
+    ]
+    return UserModel.from_db("default", field_names, values)
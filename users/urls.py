@@ -1,11 +1,24 @@
+from django.conf import settings
 from django.urls import path
 
 
-from .views import LoginView, MyInfoView, UserCreateView, VerifyUserView
+from .views import (
+    LoginView,
+    LogoutView,
+    MyInfoView,
+    TokenRefreshView,
+    UserCreateView,
+    VerifyUserView,
+)
+
+if settings.ASYNC_VIEWS:
+    from .async_views import AsyncMyInfoView as MyInfoView  # noqa: F811
 
 
 urlpatterns = [
     path("login/", LoginView.as_view()),
+    path("logout/", LogoutView.as_view()),
+    path("token/refresh/", TokenRefreshView.as_view()),
     path("myinfo/", MyInfoView.as_view()),
     path("create/", UserCreateView.as_view()),
     path("verify/", VerifyUserView.as_view()),
@@ -1,22 +1,29 @@
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.views import APIView
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
 
 
-from .models import UserModel
+from config.replicas import ReplicaReadMixin
+from .models import UserModel, EmailOutboxModel
 from .authentication import CustomUserJWTAuthentication
 from .serializers import (
     LoginSerializer,
     MyInfoSerializer,
+    RefreshTokenSerializer,
     UserCreateSerializer,
     VerifyStudent,
 )
+from .tokens import (
+    TOKEN_VERSION_CLAIM,
+    UserRefreshToken,
+    consume_refresh_token,
+    revoke_tokens,
+)
 
 
 class LoginView(GenericAPIView):
@@ -83,7 +90,7 @@ Agar maʼlumotlar noto‘g‘ri bo‘lsa, 401 yoki 400 xato kodi qaytariladi.
                     status=status.HTTP_401_UNAUTHORIZED,
                 )
 
-            refresh_token = RefreshToken.for_user(user)
+            refresh_token = UserRefreshToken.for_user(user)
             access_token = refresh_token.access_token
 
             return Response(
@@ -99,7 +106,7 @@ Agar maʼlumotlar noto‘g‘ri bo‘lsa, 401 yoki 400 xato kodi qaytariladi.
         )
 
 
-class MyInfoView(APIView):
+class MyInfoView(ReplicaReadMixin, APIView):
     authentication_classes = [CustomUserJWTAuthentication]
 
     @swagger_auto_schema(
@@ -194,20 +201,20 @@ Shuningdek, JWT tokenlar (`access` va `refresh`) qaytariladi.
         )
 
         if serializer.is_valid():
-            serializer.save()
-            user = serializer.instance
-            otp = user.otp
-            email = user.email
-
-            send_mail(
-                subject="Verification Code",
-                message=f"Your verification code is: {otp}",
-                from_email=settings.EMAIL_HOST_USER,
-                recipient_list=[email],
-                fail_silently=False,
-            )
+            # The OTP mail is delivered by `manage.py send_outbox`.
+            with transaction.atomic():
+                serializer.save()
+                user = serializer.instance
+                otp = user.otp
+                email = user.email
 
-            refresh_token = RefreshToken.for_user(user)
+                EmailOutboxModel.enqueue(
+                    subject="Verification Code",
+                    message=f"Your verification code is: {otp}",
+                    recipient_list=[email],
+                )
+
+            refresh_token = UserRefreshToken.for_user(user)
             access_token = refresh_token.access_token
 
             return Response(
@@ -286,3 +293,114 @@ Agar noto‘g‘ri kiritilsa, foydalanuvchi o‘chiriladi.
             return Response(
                 {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
             )
+
+
+class TokenRefreshView(APIView):
+
+    @swagger_auto_schema(
+        operation_summary="Tokenlarni yangilash",
+        operation_description="""
+`refresh_token` orqali yangi `access_token` va `refresh_token` olinadi.
+Yangi tokenlar foydalanuvchining joriy maʼlumotlari bilan chiqariladi.
+Agar token bekor qilingan bo‘lsa (masalan, logout'dan keyin), 401 qaytariladi.
+Har bir `refresh_token` faqat bir marta ishlatiladi: uni qayta yuborish ham
+401 qaytaradi, shuning uchun javobdagi yangi `refresh_token` saqlanishi kerak.
+        """,
+        request_body=RefreshTokenSerializer,
+        responses={
+            200: openapi.Response(
+                description="Yangi tokenlar qaytarildi",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "refresh_token": openapi.Schema(type=openapi.TYPE_STRING),
+                        "access_token": openapi.Schema(type=openapi.TYPE_STRING),
+                    },
+                ),
+            ),
+            400: openapi.Response(description="Validatsiya xatosi"),
+            401: openapi.Response(
+                description="Token noto‘g‘ri, bekor qilingan yoki ishlatilgan",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "error": openapi.Schema(
+                            type=openapi.TYPE_STRING, example="Token revoked"
+                        )
+                    },
+                ),
+            ),
+        },
+    )
+    def post(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": "Mistake on serializer", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            token = UserRefreshToken(serializer.validated_data["refresh_token"])
+        except TokenError as e:
+            return Response(
+                {"error": f"Token invalid: {e}"}, status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        # Refreshing reads the user, so the new tokens carry current claims.
+        user = UserModel.objects.filter(pk=token["id"]).first()
+        if user is None:
+            return Response(
+                {"error": "User not found"}, status=status.HTTP_401_UNAUTHORIZED
+            )
+        # Refresh tokens from before versioning count as version 0.
+        if token.get(TOKEN_VERSION_CLAIM, 0) != user.token_version:
+            return Response(
+                {"error": "Token revoked"}, status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        # Rotation: the token just sent cannot be exchanged again.
+        if not consume_refresh_token(token):
+            return Response(
+                {"error": "Token already used"}, status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        refresh_token = UserRefreshToken.for_user(user)
+        access_token = refresh_token.access_token
+
+        return Response(
+            {
+                "refresh_token": str(refresh_token),
+                "access_token": str(access_token),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class LogoutView(APIView):
+    authentication_classes = [CustomUserJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Barcha qurilmalardan chiqish",
+        operation_description="""
+Foydalanuvchiga berilgan barcha `access_token` va `refresh_token`lar bekor
+qilinadi. Qayta kirish uchun login qilish kerak.
+        """,
+        responses={
+            200: openapi.Response(
+                description="Tokenlar bekor qilindi",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "message": openapi.Schema(
+                            type=openapi.TYPE_STRING, example="Logged out"
+                        )
+                    },
+                ),
+            ),
+            401: openapi.Response(description="Token noto‘g‘ri yoki mavjud emas"),
+        },
+    )
+    def post(self, request):
+        revoke_tokens(request.user.id)
+        return Response({"message": "Logged out"}, status=status.HTTP_200_OK)